@@ -0,0 +1,184 @@
+"""
+What-if allocation simulator.
+
+Pending applications, the applicants and residence capacity are copied once into
+compact array-backed structures (a Snapshot). Each ranking strategy - distance,
+gpa, random lottery with a given seed - then runs against the same snapshot in
+its own worker process and returns a summary. Nothing is written to
+`applications`; the admin compares the summaries before committing a real run.
+
+The worker processes are spawned once, on the first large simulation, and
+reused by every later one.
+"""
+import multiprocessing
+import os
+import random
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+STRATEGIES = ('distance', 'gpa', 'random')
+GENDER_CODES = {'male': 0, 'female': 1, 'other': 2}
+GENDER_NAMES = ('male', 'female', 'other')
+# Below this many applicants handing the snapshot to the workers costs more than the runs themselves
+PARALLEL_THRESHOLD = 2000
+POOL_WORKERS = int(os.getenv('ALLOCATION_WORKERS', '0')) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class Snapshot:
+    """Column-oriented copy of the allocation inputs.
+
+    Students are indexed 0..n-1; student i's choices are
+    choices[offsets[i]:offsets[i + 1]] (residence indexes in preference order).
+    """
+
+    __slots__ = ('student_ids', 'gender', 'year', 'gpa', 'distance', 'offsets', 'choices',
+                 'residence_ids', 'residence_labels', 'capacity')
+
+    def __init__(self, rows: dict):
+        self.residence_ids = array('i')
+        self.residence_labels = []
+        self.capacity = array('i')
+        residence_index = {}
+        for rid, name, block, available, accepted in rows['residences']:
+            residence_index[rid] = len(self.residence_ids)
+            self.residence_ids.append(rid)
+            self.residence_labels.append(f"{name} - {block}" if block else name)
+            self.capacity.append(max(0, int(available or 0) - int(accepted or 0)))
+
+        attributes = {row[0]: row for row in rows['students']}
+        self.student_ids = array('i')
+        self.gender = array('b')
+        self.year = array('b')
+        self.gpa = array('d')
+        self.distance = array('d')
+        self.offsets = array('i', [0])
+        self.choices = array('i')
+        current = None
+        for student_id, residence_id in rows['applications']:
+            if residence_id not in residence_index or student_id not in attributes:
+                continue
+            if student_id != current:
+                if current is not None:
+                    self.offsets.append(len(self.choices))
+                current = student_id
+                _, gender, year, gpa, distance = attributes[student_id]
+                self.student_ids.append(student_id)
+                self.gender.append(GENDER_CODES.get((gender or 'other').lower(), 2))
+                self.year.append(int(year or 0))
+                self.gpa.append(float(gpa or 0))
+                self.distance.append(float(distance or 0))
+            self.choices.append(residence_index[residence_id])
+        if current is not None:
+            self.offsets.append(len(self.choices))
+
+    def __len__(self):
+        return len(self.student_ids)
+
+
+def rank(snapshot: Snapshot, strategy: str, seed: int | None = None) -> list:
+    """Student indexes in allocation order for one strategy."""
+    order = list(range(len(snapshot)))
+    if strategy == 'distance':
+        # Farthest first
+        order.sort(key=snapshot.distance.__getitem__, reverse=True)
+    elif strategy == 'gpa':
+        # Highest first
+        order.sort(key=snapshot.gpa.__getitem__, reverse=True)
+    elif strategy == 'random':
+        random.Random(seed).shuffle(order)
+    else:
+        raise ValueError(f"Unknown allocation strategy: {strategy}")
+    return order
+
+
+def run_strategy(snapshot: Snapshot, strategy: str, seed: int | None = None) -> dict:
+    """Allocate each student to their first choice with space left and summarise the outcome."""
+    remaining = array('i', snapshot.capacity)
+    placed_per_residence = array('i', bytes(4 * len(remaining)))
+    placed_by_year, unplaced_by_year = {}, {}
+    placed_by_gender, unplaced_by_gender = {}, {}
+
+    for i in rank(snapshot, strategy, seed):
+        year = snapshot.year[i]
+        gender = GENDER_NAMES[snapshot.gender[i]]
+        for r in snapshot.choices[snapshot.offsets[i]:snapshot.offsets[i + 1]]:
+            if remaining[r] > 0:
+                remaining[r] -= 1
+                placed_per_residence[r] += 1
+                placed_by_year[year] = placed_by_year.get(year, 0) + 1
+                placed_by_gender[gender] = placed_by_gender.get(gender, 0) + 1
+                break
+        else:
+            unplaced_by_year[year] = unplaced_by_year.get(year, 0) + 1
+            unplaced_by_gender[gender] = unplaced_by_gender.get(gender, 0) + 1
+
+    residences = []
+    for r, capacity in enumerate(snapshot.capacity):
+        residences.append({
+            'residence_id': snapshot.residence_ids[r],
+            'residence': snapshot.residence_labels[r],
+            'capacity': capacity,
+            'placed': placed_per_residence[r],
+            'fill_rate': round(placed_per_residence[r] / capacity, 3) if capacity else None
+        })
+    placed = sum(placed_by_year.values())
+    return {
+        'strategy': strategy,
+        'seed': seed,
+        'applicants': len(snapshot),
+        'placed': placed,
+        'unplaced': len(snapshot) - placed,
+        'residences': residences,
+        'placed_by_year': placed_by_year,
+        'unplaced_by_year': unplaced_by_year,
+        'placed_by_gender': placed_by_gender,
+        'unplaced_by_gender': unplaced_by_gender
+    }
+
+
+def _worker_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: the app calls this from request threads while its log, mail, event
+            # and pool threads may hold locks that a forked child would inherit locked forever
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def simulate(snapshot: Snapshot, strategies=STRATEGIES, lottery_seeds=(), workers: int | None = None) -> list:
+    """
+    Run every strategy (plus one random run per lottery seed) against the snapshot.
+    Runs go to the shared worker pool when the snapshot is large enough to pay for it;
+    workers=1 runs them in the calling process.
+    """
+    runs = [(s, None) for s in strategies if s != 'random']
+    if 'random' in strategies or lottery_seeds:
+        runs += [('random', seed) for seed in (lottery_seeds or [None])]
+    for strategy, _ in runs:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown allocation strategy: {strategy}")
+
+    if len(runs) < 2 or len(snapshot) < PARALLEL_THRESHOLD or workers == 1:
+        return [run_strategy(snapshot, s, seed) for s, seed in runs]
+    pool = _worker_pool()
+    try:
+        futures = [pool.submit(run_strategy, snapshot, s, seed) for s, seed in runs]
+        return [f.result() for f in futures]
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); the next simulation starts a fresh pool
+        _discard_pool(pool)
+        raise
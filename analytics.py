@@ -0,0 +1,76 @@
+"""
+Demand-vs-capacity analytics.
+
+`residence_demand` holds one counter per (intake cycle, residence, dimension,
+value): total applicants, choice rank, gender, year of study and distance/GPA
+buckets. The counters are bumped from the application event log as 'submitted'
+events are written (see Database.record_application_events), so the admin
+analytics API reads the current cycle's few hundred pre-aggregated rows instead
+of grouping `applications`.
+"""
+
+DISTANCE_BUCKETS = (5, 10, 20, 50, 100)  # km upper bounds, last bucket is open-ended
+GPA_BUCKETS = (2.0, 2.5, 3.0, 3.5)
+
+
+def _bucket(value, bounds, fmt) -> str:
+    if value is None:
+        return 'unknown'
+    value = float(value)
+    lower = 0
+    for upper in bounds:
+        if value < upper:
+            return f"{fmt(lower)}-{fmt(upper)}"
+        lower = upper
+    return f"{fmt(lower)}+"
+
+
+def demand_dimensions(choice_rank: int, gender, year_of_study, gpa, distance) -> list:
+    """The (dimension, value) counters one submitted application contributes to."""
+    return [
+        ('total', 'all'),
+        ('choice', str(choice_rank) if choice_rank and choice_rank <= 2 else '3+'),
+        ('gender', (gender or 'other').lower()),
+        ('year', str(year_of_study) if year_of_study else 'unknown'),
+        ('distance', _bucket(distance, DISTANCE_BUCKETS, lambda v: f"{v:g}")),
+        ('gpa', _bucket(gpa, GPA_BUCKETS, lambda v: f"{v:.1f}")),
+    ]
+
+
+def build_demand_report(rows: list) -> list:
+    """
+    rows: residences LEFT JOIN residence_demand, one row per counter
+    (id, residence_name, block, residence_type, available_rooms, dimension, dim_value, applicants)
+    Returns one entry per residence with oversubscription and per-dimension breakdowns.
+    """
+    report = {}
+    for rid, name, block, res_type, rooms, dimension, value, applicants in rows:
+        entry = report.get(rid)
+        if entry is None:
+            entry = report[rid] = {
+                'residence_id': rid, 'residence_name': name, 'block': block,
+                'residence_type': res_type, 'available_rooms': rooms or 0, 'applicants': 0,
+                'oversubscription': None, 'first_choice': 0, 'second_choice': 0,
+                'by_gender': {}, 'by_year': {}, 'distance': {}, 'gpa': {}
+            }
+        if dimension is None:
+            continue
+        applicants = int(applicants or 0)
+        if dimension == 'total':
+            entry['applicants'] = applicants
+        elif dimension == 'choice':
+            if value == '1':
+                entry['first_choice'] = applicants
+            elif value == '2':
+                entry['second_choice'] = applicants
+        elif dimension == 'gender':
+            entry['by_gender'][value] = applicants
+        elif dimension == 'year':
+            entry['by_year'][value] = applicants
+        else:
+            entry[dimension][value] = applicants
+
+    for entry in report.values():
+        if entry['available_rooms']:
+            entry['oversubscription'] = round(entry['applicants'] / entry['available_rooms'], 2)
+    return sorted(report.values(), key=lambda e: (e['oversubscription'] is None, -(e['oversubscription'] or 0)))
@@ -1,33 +1,118 @@
+import startup
+startup.begin()
+
 from flask import Flask, request, jsonify, render_template, session, redirect, url_for, send_from_directory, send_file, make_response
 from flask_cors import CORS
-from database import Database
+from storage import open_storage
+from resilience import DatabaseUnavailable
+from student_import import import_students
+from idempotency import idempotent
+from eligibility import filter_eligible
+from allocation import Snapshot, STRATEGIES, simulate
+from events import ApplicationEventLog
+from analytics import build_demand_report
+from search import StudentSearchIndex
+from notifications import Notifier
+from rowset import FastJSONProvider
+from assets import install as install_assets
+from images import install as install_images, is_derivable
+from compression import CompressionMiddleware
+from pagecache import install as install_page_cache
+from profiler import MAX_SECONDS as PROFILE_MAX_SECONDS, MemorySnapshots, StackSampler, install as install_profiler
+import logs
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
 import os
 from dotenv import load_dotenv
 import io
-import smtplib
-from email.mime.text import MIMEText
-
-try:
-    # Optional dependency used for PDF generation
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet
-    REPORTLAB_AVAILABLE = True
-except Exception:
-    REPORTLAB_AVAILABLE = False
+import hashlib
+import logging
+import threading
+import time
 
 load_dotenv()
+# JSON log records go through a bounded queue to a writer thread; request threads never wait on stdout
+logs.setup()
+log = logging.getLogger('app')
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key')
+# orjson-backed when available; jsonify(RowSet) streams the list endpoints
+app.json = FastJSONProvider(app)
 CORS(app)
+# Fingerprinted css/js/Assets served from memory ahead of Flask; templates use asset_url()
+# (raster images under Assets/ go to serve_assets for format/width negotiation)
+asset_manifest = install_assets(app, defer=is_derivable)
+image_pipeline = install_images(app, asset_manifest)
+# Anonymous pages (@page_cache.page) are rendered once and served from memory with precompressed variants
+page_cache = install_page_cache(app, asset_manifest)
+# gzip/brotli for JSON and HTML (assets arrive already encoded and pass through)
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+# Request id, route and timings on every record, plus one sampled `request` record per request
+logs.install(app)
+# Admin-only stack sampling (timed, or per request with X-Profile) and tracemalloc snapshots; idle until used
+sampler = StackSampler()
+memory_snapshots = MemorySnapshots()
+install_profiler(app, sampler, lambda: session.get('user_type') == 'admin')
+
+db = open_storage()  # DB_BACKEND: mysql, sqlite or memory
+db.warm_up()
+event_log = ApplicationEventLog(db)
+# Compiled email templates; sends are queued, coalesced per student and delivered off the request thread
+notifier = Notifier()
+search_index = StudentSearchIndex()
+startup.mark('app and database objects created')
+
+def _build_search_index():
+    try:
+        documents = db.get_search_documents()
+    except Exception as e:
+        log.exception("search index build error")
+        documents = None
+    if documents is None:
+        log.error("search index build failed; using FULLTEXT fallback")
+        return
+    search_index.build(*documents)
+    log.info("search index ready", extra={'students': len(documents[0])})
+
+threading.Thread(target=_build_search_index, name='search-index-build', daemon=True).start()
+
+STATIC_ENDPOINTS = {'serve_css', 'serve_js', 'serve_assets'}
+
+@app.before_request
+def track_session_writes():
+    if request.endpoint in STATIC_ENDPOINTS:
+        return  # touching the session would add Vary: Cookie to cacheable files
+    # Reads stick to the primary for a few seconds after this session writes
+    db.begin_request(session.get('last_write_at'))
+    if session.get('user_type') == 'student':
+        logs.bind(student_id=session.get('user_id'))
 
-db = Database()
+@app.after_request
+def remember_session_writes(response):
+    if db.end_request():
+        session['last_write_at'] = time.time()
+    return response
+
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(err):
+    # The circuit breaker is open (or just tripped): fail fast and tell clients when to retry
+    retry_after = max(1, int(round(err.retry_after)))
+    if request.path.startswith('/api/'):
+        response = make_response(jsonify({'error': 'Service temporarily unavailable, please retry shortly', 'retry_after': retry_after}), 503)
+    else:
+        response = make_response('Service temporarily unavailable, please retry shortly', 503)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.route('/api/health', methods=['GET'])
+def api_health():
+    status = db.health()
+    return jsonify(status), 503 if status['status'] == 'unavailable' else 200
 
 # ----------------- STATIC FILE ROUTES -----------------
+# Files in the asset manifest never reach these; they cover files added after start-up
 @app.route('/css/<path:filename>')
 def serve_css(filename):
     return send_from_directory('css', filename)
@@ -38,18 +123,28 @@ def serve_js(filename):
 
 @app.route('/Assets/<path:filename>')
 def serve_assets(filename):
+    # Images in the manifest are resized/re-encoded per ?w= and Accept (AVIF/WebP) from the derivative cache
+    asset, fingerprinted = asset_manifest.lookup('/Assets/' + filename)
+    if asset is not None and is_derivable(asset.path):
+        try:
+            return image_pipeline.respond(asset.path.split('/', 1)[1], fingerprinted)
+        except (OSError, ValueError) as e:
+            log.error("image derivative error", extra={'file': filename, 'error': str(e)})
     return send_from_directory('Assets', filename)
 
 # ----------------- MAIN ROUTES -----------------
 @app.route('/')
+@page_cache.page
 def home():
     return render_template('index.html')
 
 @app.route('/login')
+@page_cache.page
 def login_page():
     return render_template('login.html')
 
 @app.route('/resetpassword.html')
+@page_cache.page
 def reset_password_page():
     return render_template('resetpassword.html')
 
@@ -89,10 +184,9 @@ def dashboard():
     if 'user_id' not in session or session['user_type'] != 'student':
         return redirect(url_for('login_page'))
     
-    student = db.get_student_by_id(session['user_id'])
-    applications = db.get_student_applications(session['user_id'])
+    summary = db.get_student_summary(session['user_id']) or {'student': None, 'applications': []}
     
-    response = make_response(render_template('Dashboard.html', student=student, applications=applications))
+    response = make_response(render_template('Dashboard.html', student=summary['student'], applications=summary['applications']))
     # Prevent caching of protected pages
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
     response.headers['Pragma'] = 'no-cache'
@@ -119,6 +213,119 @@ def get_students():
     students = db.get_all_students()
     return jsonify(students)
 
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def _page_args() -> tuple:
+    """(limit, before) for the keyset-paged admin lists: ?limit=50&before=<id of the last row shown>."""
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    return limit, request.args.get('before', type=int)
+
+def _id_list_arg(name: str):
+    """?student_ids=1,2,3 as a list of ints (at most MAX_PAGE_SIZE), or None when absent."""
+    raw = request.args.get(name)
+    if raw is None:
+        return None
+    return [int(i) for i in raw.split(',') if i.strip().isdigit()][:MAX_PAGE_SIZE]
+
+@app.route('/api/students/page', methods=['GET'])
+def api_students_page():
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    limit, before = _page_args()
+    rows = list(db.get_students_page(limit, before, request.args.get('program') or None, _id_list_arg('student_ids')))
+    page = {'students': rows, 'next_before': rows[-1]['id'] if len(rows) == limit else None}
+    if before is None:
+        page['facets'] = db.get_student_facets()
+    return jsonify(page)
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    term = (request.args.get('q') or '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    if not term:
+        return jsonify({'results': [], 'source': None, 'took_ms': 0})
+    started = time.perf_counter()
+    if search_index.ready:
+        results, source = search_index.search(term, limit), 'index'
+        # The index has no status; read it for the hits so it is as current as the table
+        if results:
+            statuses = {row['id']: row['status'] for row in db.get_students_page(
+                len(results), student_ids=[r['id'] for r in results])}
+            results = [dict(r, status=statuses.get(r['id'])) for r in results]
+    else:
+        results, source = db.search_students_fulltext(term, limit), 'fulltext'
+    return jsonify({'results': results, 'source': source, 'took_ms': round((time.perf_counter() - started) * 1000, 3)})
+
+@app.route('/api/students/<int:student_id>/summary', methods=['GET'])
+def api_student_summary(student_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    # Students can only view their own; admin can view any
+    if session.get('user_type') != 'admin' and session.get('user_id') != student_id:
+        return jsonify({'error': 'Forbidden'}), 403
+    summary = db.get_student_summary(student_id)
+    if not summary:
+        return jsonify({'error': 'Student not found'}), 404
+    return jsonify(summary)
+
+# ----------------- BULK STUDENT IMPORT -----------------
+IMPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'imports')
+
+# Import jobs by id (in production, use Redis or database)
+import_jobs = {}
+
+def _run_student_import(job_id: str, path: str, batch_size: int):
+    def report(stats):
+        import_jobs[job_id].update(stats)
+    try:
+        stats = import_students(path, batch_size=batch_size, progress=report)
+        import_jobs[job_id].update(stats)
+        import_jobs[job_id]['status'] = 'completed' if stats['completed'] else 'failed'
+        if stats['imported']:
+            _build_search_index()
+    except Exception as e:
+        log.exception("student import failed", extra={'job_id': job_id})
+        import_jobs[job_id].update({'status': 'failed', 'error': str(e)})
+
+@app.route('/api/students/import', methods=['POST'])
+def api_import_students():
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'A CSV or XLSX file is required'}), 400
+    ext = os.path.splitext(upload.filename)[1].lower()
+    if ext not in ('.csv', '.xlsx', '.xlsm'):
+        return jsonify({'error': 'Unsupported file type'}), 400
+    batch_size = request.form.get('batch_size', type=int) or 1000
+
+    # Uploads are stored by content hash so re-uploading the same file resumes its checkpoint
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    content = upload.read()
+    job_id = hashlib.sha256(content).hexdigest()[:16]
+    path = os.path.join(IMPORT_DIR, f"{job_id}{ext}")
+    if not os.path.exists(path):
+        with open(path, 'wb') as handle:
+            handle.write(content)
+
+    if import_jobs.get(job_id, {}).get('status') == 'running':
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'running'}), 202
+    import_jobs[job_id] = {'status': 'running', 'filename': upload.filename}
+    threading.Thread(target=_run_student_import, args=(job_id, path, batch_size), daemon=True).start()
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'running'}), 202
+
+@app.route('/api/students/import/<job_id>', methods=['GET'])
+def api_import_students_status(job_id):
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    job = import_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify(dict(job, job_id=job_id))
+
 # ----------------- APPLICATION ROUTES (legacy UI redirect) -----------------
 @app.route('/api/apply', methods=['POST'])
 def apply_for_housing():
@@ -217,20 +424,43 @@ def api_residences():
     rows = db.get_residences(on_campus_bool, res_type)
     return jsonify(rows)
 
+@app.route('/api/residences/eligible', methods=['GET'])
+def api_eligible_residences():
+    if 'user_id' not in session or session.get('user_type') != 'student':
+        return jsonify({'error': 'Unauthorized'}), 401
+    student = db.get_student_by_id(session['user_id'])
+    if not student:
+        return jsonify({'error': 'Student not found'}), 404
+    on_campus = request.args.get('on_campus')
+    on_campus_bool = None
+    if on_campus is not None:
+        on_campus_bool = on_campus.lower() in ('1','true','yes','on')
+    rows = db.get_residences(on_campus_bool, request.args.get('type'))
+    return jsonify(filter_eligible(student, rows))
+
 @app.route('/api/offcampus/sync', methods=['POST'])
 def api_offcampus_sync():
     if 'user_id' not in session or session['user_type'] != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
     data = request.get_json() or {}
     names = data.get('residence_names') or []
-    created = []
-    for name in names:
-        rid = db.upsert_residence(name, '', False, 'offcamp', 10, '')
-        if rid:
-            created.append(rid)
+    # Full catalogue entries (capacity, restrictions) refresh existing rows
+    catalogue = data.get('residences') or []
+    if not isinstance(names, list) or not isinstance(catalogue, list):
+        return jsonify({'error': 'Invalid residence list'}), 400
+    rows = [{'residence_name': name, 'on_campus': False, 'residence_type': 'offcamp', 'available_rooms': 10}
+            for name in names if isinstance(name, str)]
+    created = db.bulk_upsert_residences(rows) if rows else []
+    if catalogue:
+        entries = [r for r in catalogue if isinstance(r, dict)]
+        updated = db.bulk_upsert_residences(entries, update_existing=True)
+        created = None if created is None or updated is None else created + updated
+    if created is None:
+        return jsonify({'error': 'Failed to sync residences'}), 500
     return jsonify({'success': True, 'ids': created})
 
 @app.route('/api/applications', methods=['POST'])
+@idempotent
 def api_create_applications():
     if 'user_id' not in session or session['user_type'] != 'student':
         return jsonify({'error': 'Unauthorized'}), 401
@@ -256,25 +486,28 @@ def api_create_applications():
 
     success, error, created_ids = db.create_applications_with_validation(student_id, normalized)
     if not success:
-        print(f"/api/applications create failed: student={student_id} error={error}")
+        log.warning("application create failed", extra={'error': error})
         return jsonify({'error': error}), 400
+    for app_id in created_ids:
+        event_log.record('submitted', app_id)
+    student = db.get_student_by_id(student_id)
+    if student:
+        # Index the residences as stored, not as typed: selections may be ids or loosely formatted names
+        search_index.upsert_student(student, db.get_student_applications(student_id) or [])
     
     # Send application submitted email
     try:
-        student = db.get_student_by_id(student_id)
         if student:
             residence_names = [sel.get('residence_name', '') for sel in normalized]
-            application_date = datetime.now().strftime('%B %d, %Y')
-            send_application_submitted_email(
-                f"{student['first_name']} {student['last_name']}", 
-                residence_names, 
-                application_date, 
-                student['email']
-            )
+            notifier.notify(student['email'], 'submitted', {
+                'student_name': f"{student['first_name']} {student['last_name']}",
+                'residence_names': residence_names,
+                'application_date': datetime.now().strftime('%B %d, %Y')
+            })
     except Exception as e:
-        print(f"Failed to send application submitted email: {e}")
+        log.error("email notification failed", extra={'kind': 'submitted', 'error': str(e)})
     
-    print(f"/api/applications created: student={student_id} ids={created_ids}")
+    log.info("applications created", extra={'application_ids': created_ids, 'sample': logs.SUCCESS_SAMPLE_RATE})
     return jsonify({'success': True, 'application_ids': created_ids}), 201
 
 @app.route('/api/applications/<int:student_id>', methods=['GET'])
@@ -298,10 +531,25 @@ def api_get_my_applications():
 def api_get_all_applications():
     if 'user_id' not in session or session['user_type'] != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
-    apps = db.get_all_applications()
+    # ?cycle=2025 lists a past intake (read from the live table and its archive)
+    apps = db.get_all_applications(request.args.get('cycle', type=int))
     return jsonify(apps)
 
+@app.route('/api/applications/page', methods=['GET'])
+def api_applications_page():
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    limit, before = _page_args()
+    cycle = request.args.get('cycle', type=int)
+    rows = list(db.get_applications_page(limit, before, request.args.get('status') or None,
+                                         _id_list_arg('student_ids'), cycle))
+    page = {'applications': rows, 'next_before': rows[-1]['id'] if len(rows) == limit else None}
+    if before is None:
+        page['counts'] = db.count_applications_by_status(cycle)
+    return jsonify(page)
+
 @app.route('/api/applications/<int:app_id>/approve', methods=['POST'])
+@idempotent
 def api_approve_application(app_id):
     if 'user_id' not in session or session['user_type'] != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
@@ -311,22 +559,22 @@ def api_approve_application(app_id):
     updated = db.update_application_status(app_id, 'Approved')
     if not updated:
         return jsonify({'error': 'Failed to update'}), 500
+    event_log.record('approved', app_id)
     
     # Send approval email
     try:
-        application_date = details['apply_date'].strftime('%B %d, %Y') if details['apply_date'] else 'N/A'
-        send_application_approved_email(
-            f"{details['first_name']} {details['last_name']}",
-            details['residence_name'],
-            application_date,
-            details['email']
-        )
+        notifier.notify(details['email'], 'approved', {
+            'student_name': f"{details['first_name']} {details['last_name']}",
+            'residence_name': details['residence_name'],
+            'application_date': details['apply_date'].strftime('%B %d, %Y') if details['apply_date'] else 'N/A'
+        })
     except Exception as e:
-        print(f"Failed to send approval email: {e}")
+        log.error("email notification failed", extra={'kind': 'approved', 'application_id': app_id, 'error': str(e)})
     
     return jsonify({'success': True})
 
 @app.route('/api/applications/<int:app_id>/reject', methods=['POST'])
+@idempotent
 def api_reject_application(app_id):
     if 'user_id' not in session or session['user_type'] != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
@@ -336,24 +584,26 @@ def api_reject_application(app_id):
     updated = db.update_application_status(app_id, 'Rejected')
     if not updated:
         return jsonify({'error': 'Failed to update'}), 500
+    event_log.record('rejected', app_id)
     
     # Send rejection email
     try:
-        send_application_rejected_email(
-            f"{details['first_name']} {details['last_name']}",
-            details['residence_name'],
-            details['email']
-        )
+        notifier.notify(details['email'], 'rejected', {
+            'student_name': f"{details['first_name']} {details['last_name']}",
+            'residence_name': details['residence_name']
+        })
     except Exception as e:
-        print(f"Failed to send rejection email: {e}")
+        log.error("email notification failed", extra={'kind': 'rejected', 'application_id': app_id, 'error': str(e)})
     
     return jsonify({'success': True})
 
 @app.route('/api/applications/<int:app_id>/accept', methods=['POST'])
+@idempotent
 def api_accept_offer(app_id):
     if 'user_id' not in session or session['user_type'] != 'student':
         return jsonify({'error': 'Unauthorized'}), 401
-    details = db.get_application_with_details(app_id)
+    # The status check decides the write, so it must not come from the read cache or a replica
+    details = db.get_application_with_details(app_id, fresh=True)
     if not details:
         return jsonify({'error': 'Application not found'}), 404
     # Students can accept only their own offers
@@ -369,25 +619,27 @@ def api_accept_offer(app_id):
     updated = db.update_application_status(app_id, 'Accepted', room_number)
     if not updated:
         return jsonify({'error': 'Failed to update'}), 500
+    event_log.record('accepted', app_id)
     
     # Send offer accepted email
     try:
-        send_offer_accepted_email(
-            f"{details['first_name']} {details['last_name']}",
-            details['residence_name'],
-            room_number or '',
-            details['email']
-        )
+        notifier.notify(details['email'], 'offer_accepted', {
+            'student_name': f"{details['first_name']} {details['last_name']}",
+            'residence_name': details['residence_name'],
+            'room_number': room_number or ''
+        })
     except Exception as e:
-        print(f"Failed to send offer accepted email: {e}")
+        log.error("email notification failed", extra={'kind': 'offer_accepted', 'application_id': app_id, 'error': str(e)})
     
     return jsonify({'success': True, 'room_number': room_number})
 
 @app.route('/api/applications/<int:app_id>/reject_offer', methods=['POST'])
+@idempotent
 def api_reject_offer(app_id):
     if 'user_id' not in session or session['user_type'] != 'student':
         return jsonify({'error': 'Unauthorized'}), 401
-    details = db.get_application_with_details(app_id)
+    # The status check decides the write, so it must not come from the read cache or a replica
+    details = db.get_application_with_details(app_id, fresh=True)
     if not details:
         return jsonify({'error': 'Application not found'}), 404
     if details['student_id'] != session['user_id']:
@@ -397,42 +649,39 @@ def api_reject_offer(app_id):
     updated = db.update_application_status(app_id, 'Rejected')
     if not updated:
         return jsonify({'error': 'Failed to update'}), 500
+    event_log.record('declined', app_id)
     
     # Send offer rejected email
     try:
-        send_offer_rejected_email(
-            f"{details['first_name']} {details['last_name']}",
-            details['residence_name'],
-            details['email']
-        )
+        notifier.notify(details['email'], 'offer_rejected', {
+            'student_name': f"{details['first_name']} {details['last_name']}",
+            'residence_name': details['residence_name']
+        })
     except Exception as e:
-        print(f"Failed to send offer rejected email: {e}")
+        log.error("email notification failed", extra={'kind': 'offer_rejected', 'application_id': app_id, 'error': str(e)})
     
     return jsonify({'success': True})
 
+@lru_cache(maxsize=1)
+def _reportlab():
+    """reportlab is optional and slow to import, so it is only loaded when the first PDF is requested."""
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib import colors
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+        from reportlab.lib.styles import getSampleStyleSheet
+    except ImportError:
+        return None
+    return A4, colors, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, getSampleStyleSheet
+
 @app.route('/api/offcampus/<int:residence_id>/accepted/pdf', methods=['GET'])
 def api_offcampus_pdf(residence_id):
     if 'user_id' not in session or session['user_type'] != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
-    # Lazily import reportlab if it wasn't available at startup
-    global REPORTLAB_AVAILABLE, A4, colors, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, getSampleStyleSheet
-    if not REPORTLAB_AVAILABLE:
-        try:
-            from reportlab.lib.pagesizes import A4 as _A4
-            from reportlab.lib import colors as _colors
-            from reportlab.platypus import SimpleDocTemplate as _SimpleDocTemplate, Paragraph as _Paragraph, Spacer as _Spacer, Table as _Table, TableStyle as _TableStyle
-            from reportlab.lib.styles import getSampleStyleSheet as _getSampleStyleSheet
-            A4 = _A4
-            colors = _colors
-            SimpleDocTemplate = _SimpleDocTemplate
-            Paragraph = _Paragraph
-            Spacer = _Spacer
-            Table = _Table
-            TableStyle = _TableStyle
-            getSampleStyleSheet = _getSampleStyleSheet
-            REPORTLAB_AVAILABLE = True
-        except Exception:
-            return jsonify({'error': 'PDF generation library not installed'}), 500
+    reportlab = _reportlab()
+    if reportlab is None:
+        return jsonify({'error': 'PDF generation library not installed'}), 500
+    A4, colors, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, getSampleStyleSheet = reportlab
     res = db.get_residence_by_id(residence_id)
     if not res or res['on_campus'] != 0:
         return jsonify({'error': 'Residence not found or not off-campus'}), 404
@@ -467,18 +716,6 @@ def api_offcampus_pdf(residence_id):
 def api_residences_stats():
     if 'user_id' not in session or session['user_type'] != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
-    # Ensure known off-campus residences exist (from OffCampus.html)
-    default_off = [
-        'M Sherly Sibasa',
-        'Muthathe Residence',
-        'Simeka Heights',
-        'Maphula Residence',
-        'Emlanjeni Residence',
-        'Grand Royale',
-        '589 Residence'
-    ]
-    for name in default_off:
-        db.upsert_residence(name, '', False, 'offcamp', 10, 'none')
     rows = db.get_residences(None, None)
     out = []
     for r in rows:
@@ -495,213 +732,75 @@ def api_residences_stats():
         })
     return jsonify(out)
 
-def send_email(to_email: str, subject: str, message: str):
-    smtp_host = os.getenv('SMTP_HOST')
-    smtp_port = int(os.getenv('SMTP_PORT', '587'))
-    smtp_user = os.getenv('SMTP_USER')
-    smtp_pass = os.getenv('SMTP_PASS')
-    smtp_from = os.getenv('SMTP_FROM', smtp_user or 'no-reply@example.com')
-    if not smtp_host or not smtp_user or not smtp_pass:
-        # Fallback to console if SMTP not configured
-        print(f"📧 Email to {to_email}: {subject} -> {message}")
-        return
+@app.route('/api/analytics/trends', methods=['GET'])
+def api_application_trends():
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('hour', 'day'):
+        return jsonify({'error': 'granularity must be hour or day'}), 400
+    days = request.args.get('days', 30, type=int)
+    since = datetime.now() - timedelta(days=days)
+    rows = db.get_application_trends(granularity, since, request.args.get('residence_id', type=int))
+    return jsonify(rows)
+
+@app.route('/api/analytics/demand', methods=['GET'])
+def api_demand_analytics():
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    rows = db.get_demand_rows()
+    if rows is None:
+        return jsonify({'error': 'Failed to load demand analytics'}), 500
+    return jsonify(build_demand_report(rows))
+
+@app.route('/api/analytics/demand/rebuild', methods=['POST'])
+def api_rebuild_demand_analytics():
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not db.rebuild_demand_aggregates():
+        return jsonify({'error': 'Failed to rebuild demand analytics'}), 500
+    return jsonify({'success': True})
+
+@app.route('/api/allocation/simulate', methods=['POST'])
+def api_allocation_simulate():
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    data = request.get_json() or {}
+    strategies = data.get('strategies') or list(STRATEGIES)
+    seeds = data.get('lottery_seeds') or []
+    if not isinstance(strategies, list) or not isinstance(seeds, list):
+        return jsonify({'error': 'strategies and lottery_seeds must be lists'}), 400
+    rows = db.get_allocation_snapshot()
+    if rows is None:
+        return jsonify({'error': 'Failed to read allocation snapshot'}), 500
     try:
-        msg = MIMEText(message, 'html')  # Use HTML format for better formatting
-        msg['Subject'] = subject
-        msg['From'] = smtp_from
-        msg['To'] = to_email
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_pass)
-            server.sendmail(smtp_from, [to_email], msg.as_string())
-    except Exception as e:
-        print(f"❌ Failed to send email to {to_email}: {e}")
+        results = simulate(Snapshot(rows), strategies, [int(seed) for seed in seeds])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True, 'results': results})
 
-def send_application_submitted_email(student_name: str, residence_names: list, application_date: str, to_email: str):
-    """Send email when application is successfully submitted"""
-    residence_list = ", ".join(residence_names)
-    subject = "Your Accommodation Application Has Been Successfully Submitted 🎉"
-    
-    message = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <h2 style="color: #2c5aa0;">🎉 Congratulations! Your Accommodation Application Has Been Submitted</h2>
-        
-        <p>Dear <strong>{student_name}</strong>,</p>
-        
-        <p>Thank you for applying for accommodation at <strong>University of Venda</strong>! 🎓</p>
-        
-        <p>We're happy to confirm that your application for <strong>{residence_list}</strong> has been successfully submitted on <strong>{application_date}</strong>.</p>
-        
-        <h3 style="color: #2c5aa0;">Here's what happens next:</h3>
-        <ul>
-            <li>Our team will review your application carefully.</li>
-            <li>You can track your application status anytime on the "My Applications" page in your student portal.</li>
-            <li>We'll notify you via email as soon as a decision has been made.</li>
-        </ul>
-        
-        <p>We appreciate your interest in joining our student housing community and look forward to the possibility of welcoming you soon.</p>
-        
-        <p>If you have any questions or need help, feel free to reach out to us at <strong>Student.Housing@univen.ac.za</strong> or <strong>+27 15 962 9218</strong>.</p>
-        
-        <p style="margin-top: 30px;">
-            <strong>Warm regards,</strong><br>
-            <strong>University Housing Team</strong><br>
-            <strong>University of Venda</strong>
-        </p>
-    </body>
-    </html>
-    """
-    
-    send_email(to_email, subject, message)
-
-def send_application_approved_email(student_name: str, residence_name: str, application_date: str, to_email: str):
-    """Send email when application is approved"""
-    subject = "🎉 Congratulations! Your Accommodation Application Has Been Approved"
-    
-    message = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <h2 style="color: #2c5aa0;">🎉 Congratulations! Your Accommodation Application Has Been Approved</h2>
-        
-        <p>Dear <strong>{student_name}</strong>,</p>
-        
-        <p>We are delighted to inform you that your application for accommodation at <strong>{residence_name}</strong> has been approved! 🎉</p>
-        
-        <h3 style="color: #2c5aa0;">Here are the details of your application:</h3>
-        <ul>
-            <li><strong>Residence:</strong> {residence_name}</li>
-            <li><strong>Application Date:</strong> {application_date}</li>
-            <li><strong>Status:</strong> <span style="color: green; font-weight: bold;">Approved</span></li>
-        </ul>
-        
-        <h3 style="color: #2c5aa0;">What's next?</h3>
-        <ul>
-            <li>Please log in to your student portal under "My Applications" to review the details of your offer.</li>
-            <li>You will have the option to accept or reject the offer.</li>
-            <li>If you accept, you will receive your room number and final move-in instructions.</li>
-            <li>If you reject, your spot will be offered to another student on the waiting list.</li>
-        </ul>
-        
-        <p>We are excited to welcome you to our student housing community and look forward to having you as part of the family!</p>
-        
-        <p>If you have any questions or need assistance, please do not hesitate to reach out to us at <strong>Student.Housing@univen.ac.za</strong> or <strong>+27 15 962 9218</strong>.</p>
-        
-        <p style="margin-top: 30px;">
-            <strong>Warm regards,</strong><br>
-            <strong>University Housing Team</strong><br>
-            <strong>University of Venda</strong>
-        </p>
-    </body>
-    </html>
-    """
-    
-    send_email(to_email, subject, message)
-
-def send_application_rejected_email(student_name: str, residence_name: str, to_email: str):
-    """Send email when application is rejected"""
-    subject = "Update on Your Accommodation Application"
-    
-    message = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <h2 style="color: #2c5aa0;">Update on Your Accommodation Application</h2>
-        
-        <p>Dear <strong>{student_name}</strong>,</p>
-        
-        <p>Thank you for your interest in accommodation at <strong>University of Venda</strong>.</p>
-        
-        <p>After careful consideration, we regret to inform you that your application for <strong>{residence_name}</strong> has not been successful this time. We understand this may be disappointing, and we want to assure you that this decision was made based on limited availability and high demand for spaces.</p>
-        
-        <h3 style="color: #2c5aa0;">We encourage you to:</h3>
-        <ul>
-            <li>Check the student portal for other available residences you may wish to apply for.</li>
-            <li>Stay updated on future openings as cancellations and new opportunities may arise.</li>
-        </ul>
-        
-        <p>We truly appreciate your interest and wish you the very best with your studies and housing search. If you have any questions or need assistance exploring other options, please contact us at <strong>Student.Housing@univen.ac.za</strong> or <strong>+27 15 962 9218</strong>.</p>
-        
-        <p style="margin-top: 30px;">
-            <strong>Warm regards,</strong><br>
-            <strong>University Housing Team</strong><br>
-            <strong>University of Venda</strong>
-        </p>
-    </body>
-    </html>
-    """
-    
-    send_email(to_email, subject, message)
-
-def send_offer_accepted_email(student_name: str, residence_name: str, room_number: str, to_email: str):
-    """Send email when student accepts an offer"""
-    subject = "Room Assigned" if room_number else "Offer Accepted"
-    
-    room_info = f"<p><strong>Your room number is: {room_number}</strong></p>" if room_number else ""
-    
-    message = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <h2 style="color: #2c5aa0;">🎉 Congratulations! Your Accommodation Offer Has Been Accepted</h2>
-        
-        <p>Dear <strong>{student_name}</strong>,</p>
-        
-        <p>We are thrilled to confirm that you have successfully accepted your accommodation offer for <strong>{residence_name}</strong>! 🎉</p>
-        
-        {room_info}
-        
-        <h3 style="color: #2c5aa0;">Next Steps:</h3>
-        <ul>
-            <li>You will receive final move-in instructions via email within the next few days.</li>
-            <li>Please ensure all required documentation is ready for your move-in date.</li>
-            <li>If you have any questions about your accommodation, please contact us immediately.</li>
-        </ul>
-        
-        <p>Welcome to our student housing community! We look forward to having you as part of our family.</p>
-        
-        <p>If you have any questions or need assistance, please do not hesitate to reach out to us at <strong>Student.Housing@univen.ac.za</strong> or <strong>+27 15 962 9218</strong>.</p>
-        
-        <p style="margin-top: 30px;">
-            <strong>Warm regards,</strong><br>
-            <strong>University Housing Team</strong><br>
-            <strong>University of Venda</strong>
-        </p>
-    </body>
-    </html>
-    """
-    
-    send_email(to_email, subject, message)
-
-def send_offer_rejected_email(student_name: str, residence_name: str, to_email: str):
-    """Send email when student rejects an offer"""
-    subject = "Offer Rejected"
-    
-    message = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <h2 style="color: #2c5aa0;">Accommodation Offer Rejected</h2>
-        
-        <p>Dear <strong>{student_name}</strong>,</p>
-        
-        <p>We have received your decision to reject the accommodation offer for <strong>{residence_name}</strong>.</p>
-        
-        <p>We understand that circumstances change and respect your decision. Your spot will now be offered to another student on the waiting list.</p>
-        
-        <p>If you change your mind or would like to apply for other available residences, please log in to your student portal and submit a new application.</p>
-        
-        <p>We wish you the best with your studies and housing search.</p>
-        
-        <p>If you have any questions or need assistance, please do not hesitate to reach out to us at <strong>Student.Housing@univen.ac.za</strong> or <strong>+27 15 962 9218</strong>.</p>
-        
-        <p style="margin-top: 30px;">
-            <strong>Warm regards,</strong><br>
-            <strong>University Housing Team</strong><br>
-            <strong>University of Venda</strong>
-        </p>
-    </body>
-    </html>
-    """
-    
-    send_email(to_email, subject, message)
+# ----------------- NOTIFICATIONS -----------------
+CAMPAIGN_STATUSES = ('Pending', 'Approved', 'Rejected', 'Accepted')
+
+@app.route('/api/notifications/campaigns', methods=['POST'])
+def api_start_campaign():
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    payload = request.get_json() or {}
+    statuses = payload.get('statuses') or ['Pending', 'Approved']
+    if not isinstance(statuses, list) or any(s not in CAMPAIGN_STATUSES for s in statuses):
+        return jsonify({'error': f"statuses must be a list of {', '.join(CAMPAIGN_STATUSES)}"}), 400
+    campaign_id = notifier.start_campaign(db, statuses, payload.get('subject'), payload.get('message'))
+    return jsonify({'success': True, 'campaign_id': campaign_id, 'status': 'running'}), 202
+
+@app.route('/api/notifications/campaigns/<campaign_id>', methods=['GET'])
+def api_campaign_status(campaign_id):
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    campaign = notifier.campaigns.get(campaign_id)
+    if not campaign:
+        return jsonify({'error': 'Campaign not found'}), 404
+    return jsonify(dict(campaign, campaign_id=campaign_id))
 
 @app.route('/api/email/test', methods=['POST'])
 def api_email_test():
@@ -710,11 +809,102 @@ def api_email_test():
     payload = request.get_json() or {}
     to_email = payload.get('to') or os.getenv('SMTP_FROM') or 'test@example.com'
     try:
-        send_email(to_email, 'SMTP Test', 'This is a test email from Univen Housing Portal.')
+        notifier.notify(to_email, 'test', {}, digest=False)
         return jsonify({'success': True, 'to': to_email})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ----------------- PROFILING -----------------
+@app.route('/api/admin/profile', methods=['POST'])
+def api_start_profile():
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    payload = request.get_json(silent=True) or {}
+    seconds = payload.get('seconds', 10)
+    interval_ms = payload.get('interval_ms')
+    if not isinstance(seconds, (int, float)) or not 0 < seconds <= PROFILE_MAX_SECONDS:
+        return jsonify({'error': f"seconds must be between 0 and {PROFILE_MAX_SECONDS}"}), 400
+    if interval_ms is not None and (not isinstance(interval_ms, (int, float)) or not 1 <= interval_ms <= 1000):
+        return jsonify({'error': 'interval_ms must be between 1 and 1000'}), 400
+    if payload.get('reset'):
+        sampler.reset()
+    sampler.start(seconds, interval_ms / 1000 if interval_ms else None)
+    return jsonify(sampler.status()), 202
+
+@app.route('/api/admin/profile', methods=['GET'])
+def api_get_profile():
+    # Collapsed stacks (flamegraph.pl / speedscope input); ?format=json for the sampler status instead
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    if request.args.get('format') == 'json':
+        return jsonify(sampler.status())
+    response = make_response(sampler.stacks())
+    response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+    response.headers['X-Profile-Samples'] = str(sampler.status()['samples'])
+    return response
+
+@app.route('/api/admin/profile', methods=['DELETE'])
+def api_reset_profile():
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    sampler.stop()
+    sampler.reset()
+    return jsonify({'success': True})
+
+@app.route('/api/admin/memory/snapshots', methods=['POST'])
+def api_take_memory_snapshot():
+    # The first snapshot starts tracemalloc; allocations are traced from then on
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(memory_snapshots.take(request.args.get('limit', 10, type=int))), 201
+
+@app.route('/api/admin/memory/snapshots', methods=['GET'])
+def api_list_memory_snapshots():
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify({'tracing': memory_snapshots.tracing, 'snapshots': memory_snapshots.list()})
+
+@app.route('/api/admin/memory/diff', methods=['GET'])
+def api_diff_memory_snapshots():
+    # ?from=1&to=2[&limit=25][&group_by=traceback]: what grew between two snapshots
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    first = request.args.get('from', type=int)
+    second = request.args.get('to', type=int)
+    group_by = request.args.get('group_by', 'lineno')
+    if first is None or second is None or group_by not in ('lineno', 'traceback'):
+        return jsonify({'error': 'from and to snapshot ids are required; group_by is lineno or traceback'}), 400
+    try:
+        diff = memory_snapshots.diff(first, second, request.args.get('limit', 25, type=int), group_by)
+    except KeyError as e:
+        return jsonify({'error': f"Snapshot {e.args[0]} not found"}), 404
+    return jsonify({'from': first, 'to': second, 'diff': diff})
+
+@app.route('/api/admin/memory/snapshots', methods=['DELETE'])
+def api_stop_memory_tracing():
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    memory_snapshots.stop()
+    return jsonify({'success': True})
+
+# ----------------- READ CACHE -----------------
+@app.route('/api/admin/cache', methods=['GET'])
+def api_read_cache_stats():
+    # Hit/miss counts per cached storage method (READ_CACHE_SIZE=0 turns the cache off)
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    cache = getattr(db, 'cache', None)
+    return jsonify(cache.stats() if cache is not None else {'enabled': False})
+
+@app.route('/api/admin/cache', methods=['DELETE'])
+def api_clear_read_cache():
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    cache = getattr(db, 'cache', None)
+    if cache is not None:
+        cache.clear()
+    return jsonify({'success': True})
+
 # ----------------- PASSWORD RESET -----------------
 import secrets
 import time
@@ -768,25 +958,12 @@ def request_password_reset():
         'user_type': 'student' if student else 'admin'
     }
     
-    # Send OTP via email
+    # Send OTP via email (immediately, never held for a digest)
     try:
-        subject = "Password Reset Verification Code"
-        message = f"""
-        <html>
-        <body>
-            <h2>Password Reset Verification</h2>
-            <p>You have requested to reset your password. Use the following verification code:</p>
-            <h1 style="color: #007bff; font-size: 32px; text-align: center; margin: 20px 0;">{otp}</h1>
-            <p>This code will expire in 5 minutes.</p>
-            <p>If you did not request this password reset, please ignore this email.</p>
-            <p>Best regards,<br>University Housing Team</p>
-        </body>
-        </html>
-        """
-        send_email(email, subject, message)
+        notifier.notify(email, 'password_reset', {'otp': otp}, digest=False)
         return jsonify({'success': True, 'message': 'OTP sent to your email', 'actual_email': email})
     except Exception as e:
-        print(f"Failed to send password reset email: {e}")
+        log.error("email notification failed", extra={'kind': 'password_reset', 'error': str(e)})
         return jsonify({'error': 'Failed to send email. Please try again.'}), 500
 
 @app.route('/api/password-reset/verify', methods=['POST'])
@@ -840,7 +1017,7 @@ def verify_password_reset():
                 # For admin, we'd need to implement admin password update
                 return jsonify({'error': 'Admin password reset not implemented yet'}), 501
         except Exception as e:
-            print(f"Error updating password: {e}")
+            log.exception("password update failed")
             return jsonify({'error': 'Failed to update password'}), 500
     else:
         # Just verify OTP without changing password
@@ -852,6 +1029,10 @@ def logout():
     session.clear()
     return redirect(url_for('home'))
 
+startup.mark('routes registered')
+startup.finish()
+
 # ----------------- MAIN -----------------
 if __name__ == '__main__':
+    asset_manifest.watch = True  # re-fingerprint edited css/js without a restart
     app.run(debug=True, port=5000)
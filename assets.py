@@ -0,0 +1,236 @@
+"""
+Fingerprinted static assets.
+
+At start-up every file under css/, js/ and Assets/ is hashed into an in-memory
+manifest, and templates reference files through `asset_url('css/index.css')`,
+which returns a content-addressed URL such as `/css/index.3f9c2a1b7e.css`.
+AssetMiddleware answers those URLs straight from memory before Flask routing
+(no session, no before_request hooks) with `Cache-Control: immutable`, so a
+browser downloads each version of a file exactly once. Text assets are gzip
+(and brotli, when the `brotli` package is installed) compressed once on first
+request and chosen per Accept-Encoding, with `Vary: Accept-Encoding`.
+Un-fingerprinted paths are still served, with ETag revalidation.
+
+`python assets.py build [outdir]` writes the fingerprinted files, their .gz/.br
+variants and manifest.json for a front proxy to serve (e.g. nginx gzip_static).
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from urllib.parse import quote
+
+try:
+    import brotli
+    HAVE_BROTLI = True
+except ImportError:
+    brotli = None
+    HAVE_BROTLI = False
+
+from compression import accepted_encodings
+
+ASSET_DIRS = ('css', 'js', 'Assets')
+COMPRESSIBLE_TYPES = {'text/css', 'text/javascript', 'application/javascript', 'image/svg+xml',
+                      'application/json', 'text/plain', 'text/html'}
+MIN_COMPRESS_SIZE = 512  # bytes; smaller files are not worth a Content-Encoding
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+HASH_LENGTH = 10
+
+
+class Asset:
+    __slots__ = ('path', 'url', 'digest', 'mimetype', 'body', 'variants', 'compressible', 'mtime')
+
+    def __init__(self, path: str, body: bytes, mtime: float):
+        self.path = path
+        self.digest = hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+        stem, ext = os.path.splitext(path)
+        self.url = f"/{stem}.{self.digest}{ext}"
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.body = body
+        self.variants = {}  # 'br' / 'gzip' -> compressed body, filled on first use
+        self.compressible = self.mimetype in COMPRESSIBLE_TYPES and len(body) >= MIN_COMPRESS_SIZE
+        self.mtime = mtime
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+    def encoded(self, encoding: str) -> bytes:
+        body = self.variants.get(encoding)
+        if body is None:
+            if encoding == 'br':
+                body = brotli.compress(self.body, quality=11)
+            else:
+                body = gzip.compress(self.body, compresslevel=9, mtime=0)
+            # Keep the variant only if it actually saves bytes
+            self.variants[encoding] = body = body if len(body) < len(self.body) else self.body
+        return body
+
+
+class AssetManifest:
+    def __init__(self, root: str, dirs=ASSET_DIRS, watch: bool = False):
+        self.root = root
+        self.dirs = dirs
+        self.watch = watch          # re-hash changed files (debug mode)
+        self._by_path = {}          # 'css/index.css' -> Asset
+        self._by_url = {}           # '/css/index.3f9c2a1b7e.css' and '/css/index.css' -> Asset
+        self.version = 0            # bumped whenever a fingerprint may have changed
+        self._lock = threading.Lock()
+        self.build()
+
+    def build(self):
+        by_path = {}
+        for directory in self.dirs:
+            base = os.path.join(self.root, directory)
+            for dirpath, _, filenames in os.walk(base):
+                for filename in filenames:
+                    full = os.path.join(dirpath, filename)
+                    path = os.path.relpath(full, self.root).replace(os.sep, '/')
+                    asset = self._load(path)
+                    if asset is not None:
+                        by_path[path] = asset
+        by_url = {}
+        for path, asset in by_path.items():
+            by_url[asset.url] = asset
+            by_url['/' + path] = asset
+        with self._lock:
+            self._by_path, self._by_url = by_path, by_url
+            self.version += 1
+
+    def _load(self, path: str):
+        full = os.path.join(self.root, path)
+        try:
+            with open(full, 'rb') as handle:
+                return Asset(path, handle.read(), os.path.getmtime(full))
+        except OSError:
+            return None
+
+    def _refresh(self, asset: Asset) -> Asset:
+        try:
+            mtime = os.path.getmtime(os.path.join(self.root, asset.path))
+        except OSError:
+            return asset
+        if mtime == asset.mtime:
+            return asset
+        fresh = self._load(asset.path)
+        if fresh is None:
+            return asset
+        with self._lock:
+            self._by_path[asset.path] = fresh
+            self._by_url[fresh.url] = fresh
+            self._by_url['/' + asset.path] = fresh
+            self.version += 1
+        return fresh
+
+    def asset_url(self, path: str) -> str:
+        """Template helper: the fingerprinted URL for a file under css/, js/ or Assets/."""
+        path = path.lstrip('./').lstrip('/')
+        asset = self._by_path.get(path)
+        if asset is None:
+            return '/' + quote(path)
+        if self.watch:
+            asset = self._refresh(asset)
+        return quote(asset.url)
+
+    def lookup(self, url_path: str):
+        """Returns (asset, fingerprinted) for a request path, or (None, False)."""
+        asset = self._by_url.get(url_path)
+        if asset is None:
+            return None, False
+        fingerprinted = url_path == asset.url
+        if self.watch and not fingerprinted:
+            asset = self._refresh(asset)
+        return asset, fingerprinted
+
+    def write(self, outdir: str) -> dict:
+        """Write fingerprinted files plus .gz/.br variants and manifest.json under outdir."""
+        manifest = {}
+        for path, asset in sorted(self._by_path.items()):
+            target = os.path.join(outdir, asset.url.lstrip('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as handle:
+                handle.write(asset.body)
+            if asset.compressible:
+                encodings = [('gzip', '.gz')] + ([('br', '.br')] if HAVE_BROTLI else [])
+                for encoding, suffix in encodings:
+                    body = asset.encoded(encoding)
+                    if body is not asset.body:
+                        with open(target + suffix, 'wb') as handle:
+                            handle.write(body)
+            manifest[path] = asset.url
+        with open(os.path.join(outdir, 'manifest.json'), 'w') as handle:
+            json.dump(manifest, handle, indent=2, sort_keys=True)
+        return manifest
+
+
+class AssetMiddleware:
+    """Serve manifest assets from memory ahead of the Flask app; everything else passes through."""
+
+    def __init__(self, app, manifest: AssetManifest, defer=None):
+        self.app = app
+        self.manifest = manifest
+        self.defer = defer  # path -> True for assets a Flask route serves instead (e.g. negotiated images)
+
+    def __call__(self, environ, start_response):
+        method = environ.get('REQUEST_METHOD')
+        if method not in ('GET', 'HEAD'):
+            return self.app(environ, start_response)
+        asset, fingerprinted = self.manifest.lookup(environ.get('PATH_INFO', ''))
+        if asset is None or (self.defer and self.defer(asset.path)):
+            return self.app(environ, start_response)
+
+        headers = [
+            ('Content-Type', asset.mimetype + ('; charset=utf-8' if asset.mimetype.startswith('text/') else '')),
+            ('Cache-Control', IMMUTABLE if fingerprinted else REVALIDATE),
+            ('ETag', asset.etag),
+        ]
+        if asset.compressible:
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH', '')
+        if asset.etag in if_none_match or if_none_match.strip() == '*':
+            start_response('304 Not Modified', headers)
+            return [b'']
+
+        body = asset.body
+        if asset.compressible:
+            accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING'))
+            for encoding in (('br',) if HAVE_BROTLI else ()) + ('gzip',):
+                if encoding in accepted:
+                    encoded = asset.encoded(encoding)
+                    if encoded is not asset.body:
+                        body = encoded
+                        headers.append(('Content-Encoding', encoding))
+                    break
+        headers.append(('Content-Length', str(len(body))))
+        start_response('200 OK', headers)
+        return [b''] if method == 'HEAD' else [body]
+
+
+def install(app, root: str | None = None, defer=None) -> AssetManifest:
+    """Build the manifest, register the `asset_url` template helper and wrap app.wsgi_app."""
+    manifest = AssetManifest(root or app.root_path, watch=app.debug)
+    app.jinja_env.globals['asset_url'] = manifest.asset_url
+    app.wsgi_app = AssetMiddleware(app.wsgi_app, manifest, defer)
+    return manifest
+
+
+if __name__ == '__main__':
+    import sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    manifest = AssetManifest(here)
+    if len(sys.argv) > 1 and sys.argv[1] == 'build':
+        outdir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(here, 'build', 'static')
+        written = manifest.write(outdir)
+        print(f"Wrote {len(written)} assets to {outdir}")
+    else:
+        for path, asset in sorted(manifest._by_path.items()):
+            sizes = f"{len(asset.body):>9}"
+            if asset.compressible:
+                sizes += f"  gzip {len(asset.encoded('gzip')):>8}"
+                if HAVE_BROTLI:
+                    sizes += f"  br {len(asset.encoded('br')):>8}"
+            print(f"{asset.url:<50} {sizes}")
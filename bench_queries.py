@@ -0,0 +1,96 @@
+"""
+Micro-benchmark for the hot lookups in Database.PREPARED_STATEMENTS.
+
+Runs each read statement against the configured database (DB_* variables, see
+.env) three ways on one dedicated connection per mode:
+
+  pure/dict      pure-Python protocol, fresh cursor(dictionary=True) per call
+                 (what execute_query did for every query)
+  cext/dict      C extension, fresh cursor(dictionary=True) per call
+  cext/prepared  C extension, one prepared cursor per statement, re-executed
+
+Usage: python bench_queries.py [iterations]
+"""
+import sys
+import time
+
+import mysql.connector
+
+from database import HAVE_CEXT, Database
+from intake import current_cycle
+
+READ_STATEMENTS = ('student_by_number', 'student_by_id', 'residence_by_id', 'student_applications')
+
+
+def _connect(db: Database, use_pure: bool):
+    config = db._pool_config(db.host)
+    config['use_pure'] = use_pure
+    return mysql.connector.connect(**config)
+
+
+def _sample_params(connection) -> dict:
+    cursor = connection.cursor()
+    cursor.execute("SELECT id, student_number FROM students ORDER BY id LIMIT 200")
+    students = cursor.fetchall()
+    cursor.execute("SELECT id FROM residences ORDER BY id LIMIT 200")
+    residences = cursor.fetchall()
+    cursor.close()
+    if not students or not residences:
+        raise SystemExit("Need at least one student and one residence to benchmark against")
+    return {
+        'student_by_number': [(number,) for _, number in students],
+        'student_by_id': [(sid,) for sid, _ in students],
+        'residence_by_id': [(rid,) for (rid,) in residences],
+        'student_applications': [(sid, current_cycle()) for sid, _ in students],
+    }
+
+
+def _run_dict(connection, query, params, iterations):
+    for i in range(iterations):
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params[i % len(params)])
+        cursor.fetchall()
+        cursor.close()
+
+
+def _run_prepared(connection, query, params, iterations):
+    cursor = connection.cursor(prepared=True)
+    for i in range(iterations):
+        cursor.execute(query, params[i % len(params)])
+        columns = cursor.column_names
+        [dict(zip(columns, row)) for row in cursor.fetchall()]
+    cursor.close()
+
+
+def main(iterations: int = 5000):
+    db = Database()
+    modes = [('pure/dict', True, _run_dict)]
+    if HAVE_CEXT:
+        modes += [('cext/dict', False, _run_dict), ('cext/prepared', False, _run_prepared)]
+    else:
+        print("C extension not available; only the pure-Python path can be measured")
+        modes += [('pure/prepared', True, _run_prepared)]
+
+    connections = {label: _connect(db, use_pure) for label, use_pure, _ in modes}
+    params = _sample_params(next(iter(connections.values())))
+
+    print(f"{iterations} executions per statement")
+    for name in READ_STATEMENTS:
+        query = Database.PREPARED_STATEMENTS[name]
+        timings = []
+        for label, _, run in modes:
+            run(connections[label], query, params[name], min(iterations, 100))  # warm up
+            started = time.perf_counter()
+            run(connections[label], query, params[name], iterations)
+            timings.append((label, (time.perf_counter() - started) / iterations * 1e6))
+        baseline = timings[0][1]
+        print(f"{name}:")
+        for label, micros in timings:
+            print(f"  {label:<14} {micros:8.1f} us/query  x{baseline / micros:.2f}")
+
+    for connection in connections.values():
+        connection.close()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -1,15 +1,50 @@
 import mysql.connector
-from mysql.connector import Error, pooling
+from mysql.connector import Error, errorcode, pooling
 from werkzeug.security import generate_password_hash
 import os
+import re
 from dotenv import load_dotenv
+from events import EVENT_TYPES
+from analytics import demand_dimensions
+from rowset import RowSet
+from storage import Storage, page_filters
+from resilience import CircuitBreaker, DatabaseUnavailable
+from intake import CYCLE_START_MONTH, current_cycle, partition_clause, partition_name
 from datetime import datetime
+import logging
+import logs
+import itertools
+import random
 import threading
 import time
+import weakref
 
 load_dotenv()
 
-class Database:
+# The C extension parses packets and converts rows in C; fall back to pure Python if it is not built
+HAVE_CEXT = getattr(mysql.connector, 'HAVE_CEXT', False)
+
+# Pools have no public way to close their idle connections, so the private method is used and
+# checked here at import: mysql-connector-python is pinned in requirements.txt for that reason
+if not callable(getattr(pooling.MySQLConnectionPool, '_remove_connections', None)):
+    raise ImportError("mysql-connector-python lacks MySQLConnectionPool._remove_connections; "
+                      "install the version pinned in requirements.txt")
+
+log = logging.getLogger('database')
+
+READ_STATEMENT = re.compile(r"\s*(?:select|show|explain|describe|desc)\b", re.IGNORECASE)
+LOCKING_READ = re.compile(r"\bfor\s+(?:update|share)\b|\block\s+in\s+share\s+mode\b", re.IGNORECASE)
+
+
+def statement_intent(query: str) -> str:
+    """'read' for a plain SELECT/SHOW (replica-safe), 'write' for anything else, including locking reads."""
+    if READ_STATEMENT.match(query) and not LOCKING_READ.search(query):
+        return 'read'
+    return 'write'
+
+
+class Database(Storage):
+    name = 'mysql'
     _instance = None
     _lock = threading.Lock()
     
@@ -20,56 +55,264 @@ class Database:
                     cls._instance = super(Database, cls).__new__(cls)
         return cls._instance
 
+    # Reads from a session go to the primary for this long after it writes
+    STICKY_SECONDS = 5
+    # Replicas further behind than this are skipped
+    MAX_REPLICA_LAG = 2
+    LAG_CHECK_INTERVAL = 5
+    POOL_SIZE = 32  # Maximum allowed pool size
+    # Errors that mean the server is unreachable or not the writable primary any more (failover)
+    CONNECTION_ERRORS = {
+        errorcode.CR_CONNECTION_ERROR, errorcode.CR_CONN_HOST_ERROR, errorcode.CR_UNKNOWN_HOST,
+        errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST, errorcode.CR_SERVER_LOST_EXTENDED,
+        errorcode.ER_CON_COUNT_ERROR, errorcode.ER_SERVER_SHUTDOWN, errorcode.ER_OPTION_PREVENTS_STATEMENT
+    }
+
     def __init__(self):
         if hasattr(self, 'initialized'):
             return
-            
+        super().__init__()
+
         self.host = os.getenv('DB_HOST', 'localhost')
         self.user = os.getenv('DB_USER', 'root')
         self.password = os.getenv('DB_PASSWORD', '')
         self.database = os.getenv('DB_NAME', 'univen_accommodation')
+        # Comma-separated host[:port] list of read replicas, e.g. "10.0.0.5,10.0.0.6:3307"
+        self.replica_hosts = [h.strip() for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()]
+        self.replica_pool_size = int(os.getenv('DB_REPLICA_POOL_SIZE', '16'))
         self.pool = None
+        self.replica_pools = []
+        self._replica_lag = {}     # pool index -> (checked_at, lag seconds or None)
+        self._replica_lock = threading.Lock()
+        self._next_replica = itertools.count()  # next() is atomic, so no lock for round-robin
+        self._request = threading.local()
+        self._student_number_unique = False
+        self._residence_block_unique = False
+        self._prepared = weakref.WeakKeyDictionary()  # raw connection -> {statement name: prepared cursor}
+        self._prepared_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self.breaker = CircuitBreaker('Database')
         self.initialized = True
-        self._create_pool()
+        # The pool is created on first use, or ahead of it by warm_up()
+
+    def warm_up(self):
+        """Create the pool on a background thread so importing the app does not wait on MySQL."""
+        def build():
+            started = time.perf_counter()
+            if self._create_pool() is None:
+                self.breaker.record_failure('pool creation failed')
+            else:
+                log.info("database pool warm", extra={'duration_ms': round((time.perf_counter() - started) * 1000)})
+        threading.Thread(target=build, name='db-pool-warmup', daemon=True).start()
+
+    def _pool_config(self, host: str):
+        port = 3306
+        if ':' in host:
+            host, port = host.rsplit(':', 1)
+        return dict(
+            host=host,
+            port=int(port),
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            autocommit=True,
+            ssl_disabled=True,  # Disable SSL to avoid SSL errors
+            connection_timeout=10,
+            charset='utf8mb4',
+            use_unicode=True,
+            use_pure=not HAVE_CEXT
+        )
 
     def _create_pool(self):
-        """Create a connection pool for better performance and reliability"""
+        """Create a connection pool for better performance and reliability. Returns it, or None on failure."""
+        with self._pool_lock:
+            if self.pool is not None:
+                return self.pool
+            self._build_pool()
+        if not self.replica_pools and self.replica_hosts:
+            self._create_replica_pools()
+        return self.pool
+
+    def _build_pool(self):
+        # Open one connection so the pool is usable straight away; the rest are added in the background
         try:
-            self.pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool = mysql.connector.pooling.MySQLConnectionPool(
                 pool_name="mypool",
-                pool_size=32,  # Maximum allowed pool size
-                pool_reset_session=True,
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                autocommit=True,
-                ssl_disabled=True,  # Disable SSL to avoid SSL errors
-                connection_timeout=10,
-                charset='utf8mb4',
-                use_unicode=True
+                pool_size=self.POOL_SIZE,
+                # A session reset would deallocate the prepared statements cached on the connection
+                pool_reset_session=False
             )
-            print("✅ Database connection pool created successfully!")
+            pool.set_config(**self._pool_config(self.host))
+            pool.add_connection()
+            self.pool = pool
+            log.info("database connection pool created")
         except Error as err:
-            print(f"❌ Database pool creation error: {err}")
+            log.error("database pool creation error", extra={'error': str(err)})
             self.pool = None
+            return
+        threading.Thread(target=self._fill_pool, args=(pool,), name='db-pool-fill', daemon=True).start()
+
+    def _fill_pool(self, pool):
+        for _ in range(self.POOL_SIZE - 1):
+            if pool is not self.pool:
+                return  # dropped by the circuit breaker
+            try:
+                pool.add_connection()
+            except Error as err:
+                log.warning("database pool fill stopped", extra={'error': str(err)})
+                return
+
+    def _create_replica_pools(self):
+        pools = []
+        for index, host in enumerate(self.replica_hosts):
+            try:
+                pools.append(mysql.connector.pooling.MySQLConnectionPool(
+                    pool_name=f"replica{index}",
+                    pool_size=self.replica_pool_size,
+                    pool_reset_session=False,
+                    **self._pool_config(host)
+                ))
+                log.info("replica pool created", extra={'host': host})
+            except Error as err:
+                log.error("replica pool creation error", extra={'host': host, 'error': str(err)})
+        self.replica_pools = pools
+
+    # ---------------- READ/WRITE ROUTING ----------------
+    def begin_request(self, last_write_at: float | None = None):
+        """Start tracking a request; last_write_at is when this session last wrote (epoch seconds)."""
+        self._request.last_write_at = last_write_at or 0
+        self._request.wrote = False
 
-    def get_connection(self):
-        """Get a connection from the pool"""
+    def end_request(self) -> bool:
+        """Returns True if the request used the primary for writes."""
+        wrote = getattr(self._request, 'wrote', False)
+        self._request.wrote = False
+        self._request.last_write_at = 0
+        return wrote
+
+    def _reads_from_primary(self) -> bool:
+        if getattr(self._request, 'wrote', False):
+            return True
+        return time.time() - getattr(self._request, 'last_write_at', 0) < self.STICKY_SECONDS
+
+    def _lag_ok(self, index: int) -> bool:
+        now = time.time()
+        checked_at, lag = self._replica_lag.get(index, (0, None))
+        if now - checked_at >= self.LAG_CHECK_INTERVAL:
+            with self._replica_lock:
+                checked_at, lag = self._replica_lag.get(index, (0, None))
+                if now - checked_at >= self.LAG_CHECK_INTERVAL:
+                    lag = self._measure_replica_lag(index)
+                    self._replica_lag[index] = (now, lag)
+        return lag is not None and lag <= self.MAX_REPLICA_LAG
+
+    def _measure_replica_lag(self, index: int):
+        """Seconds behind the source, or None if replication is stopped or the replica is down."""
+        connection = None
+        cursor = None
         try:
-            if self.pool is None:
-                self._create_pool()
-            return self.pool.get_connection()
+            connection = self.replica_pools[index].get_connection()
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Error:
+                cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22
+            status = cursor.fetchone()
+            if not status:
+                return None
+            lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+            return None if lag is None else int(lag)
+        except Error as err:
+            log.warning("replica lag check failed", extra={'replica': index, 'error': str(err)})
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+
+    def _replica_connection(self):
+        count = len(self.replica_pools)
+        for _ in range(count):
+            index = next(self._next_replica) % count
+            if not self._lag_ok(index):
+                continue
+            try:
+                return self.replica_pools[index].get_connection()
+            except Error as err:
+                log.warning("replica connection error", extra={'replica': index, 'error': str(err)})
+                self._replica_lag[index] = (time.time(), None)
+        return None
+
+    def get_connection(self, intent: str):
+        """
+        Get a connection from the pool.
+        intent='read' may be served by a healthy replica unless this session wrote recently;
+        'primary' is a read that must see the primary; 'write' also makes this session's
+        following reads stick to the primary.
+        """
+        if intent == 'read' and self.replica_pools and not self._reads_from_primary():
+            connection = self._replica_connection()
+            if connection is not None:
+                return connection
+        # Fails fast with DatabaseUnavailable while the circuit is open
+        self.breaker.before_call()
+        pool = self.pool
+        if pool is None:
+            pool = self._create_pool()
+        if pool is None:
+            self.breaker.record_failure('pool creation failed')
+            raise DatabaseUnavailable("Database unavailable: pool creation failed", self.breaker.retry_after())
+        try:
+            connection = pool.get_connection()
         except Error as err:
-            print(f"❌ Error getting connection from pool: {err}")
+            if err.errno in self.CONNECTION_ERRORS:
+                self._connection_failed(err)
+                raise DatabaseUnavailable(f"Database unavailable: {err}", self.breaker.retry_after()) from err
+            # e.g. pool exhausted: the server itself is fine
+            self.breaker.record_success()
+            log.error("pool connection error", extra={'error': str(err)})
             return None
+        self.breaker.record_success()
+        if intent == 'write':
+            self._request.wrote = True
+        return connection
+
+    def _connection_failed(self, err):
+        """Count a connection-level failure; when it opens the circuit, drop the pool so the probe rebuilds it."""
+        if self.breaker.record_failure(err):
+            with self._pool_lock:
+                pool, self.pool = self.pool, None
+            if pool is not None:
+                pool._remove_connections()
+
+    def _query_failed(self, err):
+        if err.errno in self.CONNECTION_ERRORS:
+            self._connection_failed(err)
+
+    def health(self) -> dict:
+        """Breaker state plus a round trip to the primary (which doubles as the half-open probe)."""
+        status = {'status': 'ok', 'backend': self.name, 'database': None, 'replicas': []}
+        try:
+            if self.execute_query("SELECT 1", fetch_one=True, intent='primary') is None:
+                status['status'] = 'unavailable'
+        except DatabaseUnavailable:
+            status['status'] = 'unavailable'
+        status['database'] = self.breaker.snapshot()
+        for index in range(len(self.replica_pools)):
+            lag = self._replica_lag.get(index, (0, None))[1]
+            status['replicas'].append({'replica': index, 'lag': lag, 'healthy': lag is not None and lag <= self.MAX_REPLICA_LAG})
+        if status['status'] == 'ok' and self.replica_pools and not any(r['healthy'] for r in status['replicas']):
+            status['status'] = 'degraded'
+        return status
 
-    def execute_query(self, query, params=None, fetch_one=False, fetch_all=False):
-        """Execute a query with proper connection handling"""
+    def execute_query(self, query, params=None, fetch_one=False, fetch_all=False, intent=None):
+        """Execute a query with proper connection handling. intent defaults to statement_intent(query)."""
         connection = None
         cursor = None
+        started = time.perf_counter()
         try:
-            connection = self.get_connection()
+            connection = self.get_connection(intent or statement_intent(query))
             if connection is None:
                 return None
                 
@@ -85,36 +328,342 @@ class Database:
                 
             return result
         except Error as err:
-            print(f"❌ Database query error: {err}")
+            self._query_failed(err)
+            log.error("database query error", extra={'errno': err.errno, 'error': str(err)})
             return None
         finally:
             if cursor:
                 cursor.close()
             if connection:
                 connection.close()
+            logs.add_timing('db', time.perf_counter() - started)
+
+    def fetch_rowset(self, query, params=None, intent='read') -> RowSet | None:
+        """Run a SELECT and keep the result as tuples (see rowset.RowSet) instead of a dict per row."""
+        connection = None
+        cursor = None
+        started = time.perf_counter()
+        try:
+            connection = self.get_connection(intent)
+            if connection is None:
+                return None
+            cursor = connection.cursor()
+            cursor.execute(query, params or ())
+            rows = cursor.fetchall()
+            return RowSet(cursor.column_names, rows)
+        except Error as err:
+            self._query_failed(err)
+            log.error("database query error", extra={'errno': err.errno, 'error': str(err)})
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+            logs.add_timing('db', time.perf_counter() - started)
+
+    # Hot statements, prepared once per pooled connection and re-executed with new parameters
+    PREPARED_STATEMENTS = {
+        'student_by_number': "SELECT * FROM students WHERE student_number = %s",
+        'student_by_id': "SELECT * FROM students WHERE id = %s",
+        'residence_by_id': "SELECT * FROM residences WHERE id = %s",
+        'student_applications': """
+        SELECT a.id, r.residence_name, r.block, r.on_campus, a.status, a.apply_date AS applied_date, a.room_number
+        FROM applications a
+        JOIN residences r ON r.id = a.residence_id
+        WHERE a.student_id = %s AND a.intake_cycle = %s
+        ORDER BY a.apply_date DESC
+        """,
+        'application_status': "UPDATE applications SET status=%s WHERE id=%s AND intake_cycle=%s",
+        'application_status_room': "UPDATE applications SET status=%s, room_number=%s WHERE id=%s AND intake_cycle=%s",
+    }
+
+    def _prepared_cursor(self, connection, name: str, fresh: bool = False):
+        raw = getattr(connection, '_cnx', connection)  # the pooled wrapper is new on every checkout
+        with self._prepared_lock:
+            cursors = self._prepared.get(raw)
+            if cursors is None:
+                cursors = self._prepared[raw] = {}
+        cursor = cursors.get(name)
+        if cursor is None or fresh:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Error:
+                    pass
+            cursor = cursors[name] = connection.cursor(prepared=True)
+        return cursor
+
+    def execute_prepared(self, name: str, params=(), fetch_one=False, fetch_all=False, intent=None):
+        """
+        Like execute_query, for a statement registered in PREPARED_STATEMENTS.
+        The statement is prepared the first time a pooled connection runs it and only
+        parameters are sent after that; rows come back as dicts, as with execute_query.
+        """
+        query = self.PREPARED_STATEMENTS[name]
+        connection = None
+        started = time.perf_counter()
+        try:
+            connection = self.get_connection(intent or statement_intent(query))
+            if connection is None:
+                return None
+            cursor = self._prepared_cursor(connection, name)
+            try:
+                cursor.execute(query, params)
+            except Error as err:
+                if err.errno in (errorcode.ER_UNKNOWN_STMT_HANDLER, errorcode.CR_SERVER_LOST,
+                                 errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST_EXTENDED):
+                    # The connection was reset or reconnected and the statement is gone: prepare again
+                    cursor = self._prepared_cursor(connection, name, fresh=True)
+                    cursor.execute(query, params)
+                else:
+                    raise
+
+            if fetch_one or fetch_all:
+                columns = cursor.column_names
+                rows = cursor.fetchall()  # drain the result so the statement can be re-executed
+                if fetch_one:
+                    return dict(zip(columns, rows[0])) if rows else None
+                return [dict(zip(columns, row)) for row in rows]
+            return cursor.rowcount
+        except Error as err:
+            self._query_failed(err)
+            log.error("database query error", extra={'statement': name, 'errno': err.errno, 'error': str(err)})
+            return None
+        finally:
+            if connection:
+                connection.close()
+            # Per-request db_ms/db_calls on the request's log records
+            logs.add_timing('db', time.perf_counter() - started)
 
     def close_connection(self):
         """Close DB connection cleanly when done."""
         if self.pool:
-            self.pool.close()
-            print("🔒 Database connection pool closed.")
+            self.pool._remove_connections()
+            log.info("database connection pool closed")
+        for replica in self.replica_pools:
+            replica._remove_connections()
 
     # ---------------- STUDENT METHODS ----------------
     def get_student_by_number(self, student_number):
-        query = "SELECT * FROM students WHERE student_number = %s"
-        return self.execute_query(query, (student_number,), fetch_one=True)
+        return self.execute_prepared('student_by_number', (student_number,), fetch_one=True, intent='read')
 
     def get_student_by_id(self, student_id):
-        query = "SELECT * FROM students WHERE id = %s"
-        return self.execute_query(query, (student_id,), fetch_one=True)
+        return self.execute_prepared('student_by_id', (student_id,), fetch_one=True, intent='read')
+
+    def get_student_summary(self, student_id: int):
+        """
+        Profile (no password hash) plus current-cycle applications with residence details,
+        fetched in one round trip (cached per student by readcache.CachedStorage).
+        Returns {'student': {...}, 'applications': [...]} or None if the student does not exist.
+        """
+        profile = ", ".join(f"s.{col}" for col in self.SUMMARY_PROFILE_FIELDS)
+        query = f"""
+        SELECT {profile},
+               a.id AS application_id, a.status AS application_status, a.apply_date AS applied_date,
+               a.room_number AS application_room, r.id AS residence_id, r.residence_name, r.block,
+               r.on_campus, r.residence_type
+        FROM students s
+        LEFT JOIN applications a ON a.student_id = s.id AND a.intake_cycle = %s
+        LEFT JOIN residences r ON r.id = a.residence_id
+        WHERE s.id = %s
+        ORDER BY a.apply_date DESC
+        """
+        rows = self.execute_query(query, (current_cycle(), student_id), fetch_all=True, intent='read')
+        if not rows:
+            return None
+        summary = {
+            'student': {col: rows[0][col] for col in self.SUMMARY_PROFILE_FIELDS},
+            'applications': [
+                {
+                    'id': row['application_id'], 'residence_id': row['residence_id'],
+                    'residence_name': row['residence_name'], 'block': row['block'],
+                    'on_campus': row['on_campus'], 'residence_type': row['residence_type'],
+                    'status': row['application_status'], 'applied_date': row['applied_date'],
+                    'room_number': row['application_room']
+                }
+                for row in rows if row['application_id'] is not None
+            ]
+        }
+        return summary
+
+    def get_all_students(self) -> RowSet:
+        result = self.fetch_rowset("SELECT * FROM students")
+        return result if result is not None else RowSet((), [])
+
+    def get_students_page(self, limit: int, before_id: int | None = None, program: str | None = None,
+                          student_ids: list | None = None) -> RowSet:
+        where, params = page_filters('id', before_id, (('program', program),), 'id', student_ids, '%s')
+        result = self.fetch_rowset(f"SELECT {', '.join(self.SUMMARY_PROFILE_FIELDS)} FROM students {where} "
+                                   f"ORDER BY id DESC LIMIT %s", params + (limit,))
+        return result if result is not None else RowSet((), [])
 
-    def get_all_students(self):
-        query = "SELECT * FROM students"
-        result = self.execute_query(query, fetch_all=True)
+    def get_student_facets(self) -> dict:
+        total = self.execute_query("SELECT COUNT(*) AS n FROM students", fetch_one=True, intent='read')
+        programs = self.execute_query(
+            "SELECT DISTINCT program FROM students WHERE program IS NOT NULL ORDER BY program", fetch_all=True, intent='read'
+        )
+        return {'total': total['n'] if total else 0, 'programs': [row['program'] for row in programs or []]}
+
+    def search_students_fulltext(self, term: str, limit: int = 20):
+        """FULLTEXT fallback for admin search while the in-memory index is building."""
+        words = [w for w in re.split(r"[^0-9A-Za-z@.]+", term or '') if w]
+        if not words:
+            return []
+        query = """
+        SELECT s.id, s.student_number, s.first_name, s.last_name, s.email, s.program, s.status,
+               MATCH(s.student_number, s.first_name, s.last_name, s.email) AGAINST (%s IN BOOLEAN MODE) AS score
+        FROM students s
+        WHERE MATCH(s.student_number, s.first_name, s.last_name, s.email) AGAINST (%s IN BOOLEAN MODE)
+        ORDER BY score DESC
+        LIMIT %s
+        """
+        boolean_query = " ".join(f'+"{w}"*' if '@' in w or '.' in w else f"+{w}*" for w in words)
+        result = self.execute_query(query, (boolean_query, boolean_query, limit), fetch_all=True, intent='read')
         return result if result is not None else []
 
+    def get_search_documents(self):
+        """Students plus the residences they applied to, for building the admin search index."""
+        students = self.execute_query(
+            "SELECT id, student_number, first_name, last_name, email, program FROM students",
+            fetch_all=True, intent='read'
+        )
+        applications = self.execute_query(
+            """
+            SELECT a.student_id, r.residence_name, r.block
+            FROM applications a
+            JOIN residences r ON r.id = a.residence_id
+            WHERE a.intake_cycle = %s
+            """,
+            (current_cycle(),), fetch_all=True, intent='read'
+        )
+        if students is None or applications is None:
+            return None
+        return students, applications
+
+    def bulk_upsert_students(self, rows: list) -> int | None:
+        """
+        rows: list of tuples ordered as STUDENT_IMPORT_COLUMNS (password already hashed)
+        Writes the whole batch as one multi-row INSERT ... ON DUPLICATE KEY UPDATE.
+        Existing students keep their current password.
+        Returns the affected row count, or None on failure (including when the
+        unique key on student_number is missing, see migrate_unique_student_numbers).
+        """
+        if not rows:
+            return 0
+        if not self.student_number_is_unique():
+            log.error("student upsert refused: students.student_number has no unique key")
+            return None
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection('write')
+            if connection is None:
+                return None
+
+            cursor = connection.cursor()
+            columns = ", ".join(self.STUDENT_IMPORT_COLUMNS)
+            placeholders = "(" + ", ".join(["%s"] * len(self.STUDENT_IMPORT_COLUMNS)) + ")"
+            updates = ", ".join(
+                f"{col}=VALUES({col})" for col in self.STUDENT_IMPORT_COLUMNS
+                if col not in ('student_number', 'password')
+            )
+            query = (
+                f"INSERT INTO students ({columns}) VALUES "
+                + ", ".join([placeholders] * len(rows))
+                + f" ON DUPLICATE KEY UPDATE {updates}"
+            )
+            params = [value for row in rows for value in row]
+            cursor.execute(query, params)
+            connection.commit()
+            return cursor.rowcount
+        except Error as err:
+            log.error("student bulk upsert failed", extra={'error': str(err)})
+            if connection:
+                connection.rollback()
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+
+    def student_number_is_unique(self) -> bool:
+        """Whether students has a single-column unique key on student_number (the upsert's conflict target)."""
+        if self._student_number_unique:
+            return True
+        row = self.execute_query(
+            "SELECT COUNT(*) AS n FROM information_schema.STATISTICS s "
+            "WHERE s.TABLE_SCHEMA = %s AND s.TABLE_NAME = 'students' AND s.COLUMN_NAME = 'student_number' "
+            "AND s.NON_UNIQUE = 0 AND NOT EXISTS (SELECT 1 FROM information_schema.STATISTICS o "
+            "WHERE o.TABLE_SCHEMA = s.TABLE_SCHEMA AND o.TABLE_NAME = s.TABLE_NAME "
+            "AND o.INDEX_NAME = s.INDEX_NAME AND o.COLUMN_NAME <> 'student_number')",
+            (self.database,), fetch_one=True, intent='primary'  # a replica may not have the key yet
+        )
+        self._student_number_unique = bool(row and row['n'])  # once present it stays; absence is re-checked
+        return self._student_number_unique
+
+    def migrate_unique_student_numbers(self) -> bool:
+        """
+        Add the unique key on students.student_number to a database created before it existed.
+        Duplicate student numbers are merged into the oldest row first: applications move to it
+        (dropping any that would then collide), and the on-campus counters of the affected
+        students are deleted so they are re-seeded from applications. Safe to re-run.
+        """
+        if self.student_number_is_unique():
+            log.info("students.student_number already unique")
+            return True
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection('write')
+            if connection is None:
+                return False
+            cursor = connection.cursor()
+            connection.start_transaction()
+            cursor.execute("""
+            CREATE TEMPORARY TABLE student_duplicates AS
+            SELECT s.id AS duplicate_id, k.keeper_id
+            FROM students s
+            JOIN (SELECT student_number, MIN(id) AS keeper_id FROM students
+                  WHERE student_number IS NOT NULL GROUP BY student_number HAVING COUNT(*) > 1) k
+              ON k.student_number = s.student_number AND s.id <> k.keeper_id
+            """)
+            cursor.execute("SELECT COUNT(*) FROM student_duplicates")
+            duplicates = cursor.fetchone()[0]
+            if duplicates:
+                # A TEMPORARY table can only be referenced once per statement, hence two deletes
+                cursor.execute("DELETE l FROM student_application_limits l "
+                               "JOIN student_duplicates d ON d.duplicate_id = l.student_id")
+                cursor.execute("DELETE l FROM student_application_limits l "
+                               "JOIN (SELECT DISTINCT keeper_id FROM student_duplicates) d ON d.keeper_id = l.student_id")
+                cursor.execute("""
+                UPDATE IGNORE applications a JOIN student_duplicates d ON d.duplicate_id = a.student_id
+                SET a.student_id = d.keeper_id
+                """)
+                cursor.execute("DELETE a FROM applications a JOIN student_duplicates d ON d.duplicate_id = a.student_id")
+                cursor.execute("DELETE s FROM students s JOIN student_duplicates d ON d.duplicate_id = s.id")
+            cursor.execute("DROP TEMPORARY TABLE student_duplicates")
+            connection.commit()
+            log.info("duplicate students merged", extra={'removed': duplicates})
+        except Error as err:
+            log.error("student duplicate merge failed", extra={'error': str(err)})
+            if connection:
+                connection.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+        # DDL commits implicitly, so the key is added after the merge transaction
+        if self.execute_query("ALTER TABLE students ADD UNIQUE KEY uq_student_number (student_number)") is None:
+            log.error("migration stopped", extra={'statement': 'ADD UNIQUE KEY uq_student_number'})
+            return False
+        return self.student_number_is_unique()
+
     # ---------------- RESIDENCE METHODS ----------------
-    def get_residences(self, on_campus: bool | None = None, residence_type: str | None = None):
+    def get_residences(self, on_campus: bool | None = None, residence_type: str | None = None) -> RowSet:
         base = "SELECT * FROM residences"
         clauses = []
         params = []
@@ -128,37 +677,58 @@ class Database:
             base += " WHERE " + " AND ".join(clauses)
         base += " ORDER BY residence_name, block"
         
-        result = self.execute_query(base, tuple(params), fetch_all=True)
-        return result if result is not None else []
+        result = self.fetch_rowset(base, tuple(params))
+        return result if result is not None else RowSet((), [])
+
+    def bulk_upsert_residences(self, residences: list, update_existing: bool = False) -> list | None:
+        """
+        residences: list of dicts with residence_name and optional block, on_campus,
+        residence_type, available_rooms, restrictions.
+        Inserts all rows in one multi-row INSERT ... ON DUPLICATE KEY UPDATE against the
+        (residence_name, block) unique key. Existing rows are left untouched unless
+        update_existing is set, in which case capacity/type/restrictions are refreshed.
+        Returns the ids in input order (None for an invalid entry), or None on failure,
+        including when the unique key is missing (see migrate_unique_residence_blocks).
+        """
+        parsed = self._parse_residences(residences)
+        rows = [row for row in parsed if row is not None]
+        if not rows:
+            return [None] * len(parsed)
+        if not self.residence_block_is_unique():
+            log.error("residence upsert refused: residences has no unique key on (residence_name, block)")
+            return None
 
-    def upsert_residence(self, residence_name: str, block: str = "", on_campus: bool = False,
-                          residence_type: str = 'offcamp', available_rooms: int = 0,
-                          restrictions: str = '') -> int | None:
         connection = None
         cursor = None
         try:
-            connection = self.get_connection()
+            connection = self.get_connection('write')
             if connection is None:
                 return None
-                
+
             cursor = connection.cursor()
-            # Check if exists
+            if update_existing:
+                on_duplicate = ("on_campus=VALUES(on_campus), residence_type=VALUES(residence_type), "
+                                "available_rooms=VALUES(available_rooms), restrictions=VALUES(restrictions)")
+            else:
+                on_duplicate = "id=id"
             cursor.execute(
-                "SELECT id FROM residences WHERE residence_name=%s AND COALESCE(block,'')=%s",
-                (residence_name, block or '')
+                "INSERT INTO residences (residence_name, block, on_campus, residence_type, available_rooms, restrictions) VALUES "
+                + ", ".join(["(%s,%s,%s,%s,%s,%s)"] * len(rows))
+                + f" ON DUPLICATE KEY UPDATE {on_duplicate}",
+                [value for row in rows for value in row]
             )
-            row = cursor.fetchone()
-            if row:
-                return int(row[0])
+            keys = list(dict.fromkeys((row[0], row[1]) for row in rows))
             cursor.execute(
-                "INSERT INTO residences (residence_name, block, on_campus, residence_type, available_rooms, restrictions) VALUES (%s,%s,%s,%s,%s,%s)",
-                (residence_name, block or '', on_campus, residence_type, available_rooms, restrictions)
+                "SELECT id, residence_name, block FROM residences WHERE (residence_name, block) IN ("
+                + ", ".join(["(%s,%s)"] * len(keys)) + ")",
+                [value for key in keys for value in key]
             )
+            # Keys compare case-insensitively, matching the column collation
+            ids = {(name.lower(), block.lower()): int(rid) for rid, name, block in cursor.fetchall()}
             connection.commit()
-            rid = cursor.lastrowid
-            return int(rid)
+            return [ids.get((row[0].lower(), row[1].lower())) if row else None for row in parsed]
         except Error as err:
-            print(f"❌ Error upserting residence: {err}")
+            log.error("residence upsert failed", extra={'error': str(err)})
             return None
         finally:
             if cursor:
@@ -166,212 +736,614 @@ class Database:
             if connection:
                 connection.close()
 
-    def update_student_password(self, student_id, plain_password):
+    def residence_block_is_unique(self) -> bool:
+        """Whether residences has a unique key on exactly (residence_name, block), the upsert's conflict target."""
+        if self._residence_block_unique:
+            return True
+        row = self.execute_query(
+            "SELECT COUNT(*) AS n FROM (SELECT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'residences' AND NON_UNIQUE = 0 GROUP BY INDEX_NAME "
+            "HAVING COUNT(*) = 2 AND SUM(COLUMN_NAME IN ('residence_name', 'block')) = 2) k",
+            (self.database,), fetch_one=True, intent='primary'  # a replica may not have the key yet
+        )
+        self._residence_block_unique = bool(row and row['n'])  # once present it stays; absence is re-checked
+        return self._residence_block_unique
+
+    def migrate_unique_residence_blocks(self) -> bool:
+        """
+        Add the unique key on residences (residence_name, block) to a database created before it
+        existed. NULL blocks become '', then duplicate residences are merged into the oldest row:
+        applications, archived applications and events move to it (dropping applications that
+        would then collide), rollup counters are added to it, and the on-campus counters of the
+        affected students are deleted so they are re-seeded from applications. Safe to re-run.
+        """
+        if self.residence_block_is_unique():
+            log.info("residences (residence_name, block) already unique")
+            return True
         connection = None
         cursor = None
         try:
-            connection = self.get_connection()
+            connection = self.get_connection('write')
             if connection is None:
                 return False
-                
             cursor = connection.cursor()
-            hashed_password = generate_password_hash(plain_password)
-            query = "UPDATE students SET password = %s WHERE id = %s"
-            cursor.execute(query, (hashed_password, student_id))
+            connection.start_transaction()
+            cursor.execute("UPDATE residences SET block = '' WHERE block IS NULL")
+            cursor.execute("UPDATE residences SET residence_name = TRIM(residence_name), block = TRIM(block)")
+            cursor.execute("""
+            CREATE TEMPORARY TABLE residence_duplicates AS
+            SELECT r.id AS duplicate_id, k.keeper_id
+            FROM residences r
+            JOIN (SELECT residence_name, block, MIN(id) AS keeper_id FROM residences
+                  GROUP BY residence_name, block HAVING COUNT(*) > 1) k
+              ON k.residence_name = r.residence_name AND k.block = r.block AND r.id <> k.keeper_id
+            """)
+            cursor.execute("SELECT COUNT(*) FROM residence_duplicates")
+            duplicates = cursor.fetchone()[0]
+            # Older databases may predate some of the tables that reference residences
+            cursor.execute("SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s", (self.database,))
+            tables = {name for (name,) in cursor.fetchall()}
+            if duplicates:
+                if 'student_application_limits' in tables:
+                    cursor.execute("""
+                    DELETE l FROM student_application_limits l
+                    JOIN applications a ON a.student_id = l.student_id AND a.intake_cycle = l.intake_cycle
+                    JOIN residence_duplicates d ON d.duplicate_id = a.residence_id
+                    """)
+                for table in ('applications', 'applications_archive'):
+                    if table in tables:
+                        cursor.execute(f"""
+                        UPDATE IGNORE {table} a JOIN residence_duplicates d ON d.duplicate_id = a.residence_id
+                        SET a.residence_id = d.keeper_id
+                        """)
+                        cursor.execute(f"DELETE a FROM {table} a JOIN residence_duplicates d ON d.duplicate_id = a.residence_id")
+                if 'application_events' in tables:
+                    cursor.execute("""
+                    UPDATE application_events e JOIN residence_duplicates d ON d.duplicate_id = e.residence_id
+                    SET e.residence_id = d.keeper_id
+                    """)
+                counters = ('submitted', 'approved', 'rejected', 'accepted', 'declined')
+                for table in ('application_rollups_hourly', 'application_rollups_daily'):
+                    if table in tables:
+                        cursor.execute(
+                            f"INSERT INTO {table} (residence_id, bucket, {', '.join(counters)}) "
+                            f"SELECT d.keeper_id, t.bucket, {', '.join(f't.{c}' for c in counters)} "
+                            f"FROM {table} t JOIN residence_duplicates d ON d.duplicate_id = t.residence_id "
+                            "ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = {c} + VALUES({c})" for c in counters)
+                        )
+                        cursor.execute(f"DELETE t FROM {table} t JOIN residence_duplicates d ON d.duplicate_id = t.residence_id")
+                if 'residence_demand' in tables:
+                    cursor.execute("""
+                    INSERT INTO residence_demand (intake_cycle, residence_id, dimension, dim_value, applicants)
+                    SELECT t.intake_cycle, d.keeper_id, t.dimension, t.dim_value, t.applicants
+                    FROM residence_demand t JOIN residence_duplicates d ON d.duplicate_id = t.residence_id
+                    ON DUPLICATE KEY UPDATE applicants = applicants + VALUES(applicants)
+                    """)
+                    cursor.execute("DELETE t FROM residence_demand t JOIN residence_duplicates d ON d.duplicate_id = t.residence_id")
+                cursor.execute("DELETE r FROM residences r JOIN residence_duplicates d ON d.duplicate_id = r.id")
+            cursor.execute("DROP TEMPORARY TABLE residence_duplicates")
             connection.commit()
-            return True
+            log.info("duplicate residences merged", extra={'removed': duplicates})
         except Error as err:
-            print(f"❌ Error updating password: {err}")
+            log.error("residence duplicate merge failed", extra={'error': str(err)})
+            if connection:
+                connection.rollback()
             return False
         finally:
             if cursor:
                 cursor.close()
             if connection:
                 connection.close()
+        # DDL commits implicitly, so the key is added after the merge transaction
+        if self.execute_query("ALTER TABLE residences MODIFY block VARCHAR(100) NOT NULL DEFAULT '', "
+                              "ADD UNIQUE KEY uq_residence_block (residence_name, block)") is None:
+            log.error("migration stopped", extra={'statement': 'ADD UNIQUE KEY uq_residence_block'})
+            return False
+        # Merged counters can double-count a student's choice rank; recount the live cycle against the merged rows
+        self.rebuild_demand_aggregates()
+        return self.residence_block_is_unique()
 
-    # ---------------- APPLICATION METHODS ----------------
-    def find_residence(self, residence_name: str, block: str = ""):
+    def update_student_password(self, student_id, plain_password):
         connection = None
         cursor = None
         try:
-            connection = self.get_connection()
+            connection = self.get_connection('write')
             if connection is None:
-                return None
+                return False
                 
-            cursor = connection.cursor(dictionary=True)
-            normalized_block = (block or '').strip()
-            res = None
-            if normalized_block:
-                # Try exact block first
-                query = "SELECT * FROM residences WHERE residence_name = %s AND block = %s LIMIT 1"
-                cursor.execute(query, (residence_name.strip(), normalized_block))
-                res = cursor.fetchone()
-                if not res:
-                    # Normalize blocks like M5 -> M-5 or AWest -> A West
-                    alt_block = normalized_block
-                    # Insert dash between letter prefix and digits if missing, e.g., M5 -> M-5
-                    import re
-                    m = re.match(r"^([A-Za-z]+)[\s-]?([0-9]+)$", normalized_block)
-                    if m:
-                        alt_block = f"{m.group(1)}-{m.group(2)}"
-                    # Try with alt formatting
-                    query = "SELECT * FROM residences WHERE residence_name = %s AND block = %s LIMIT 1"
-                    cursor.execute(query, (residence_name.strip(), alt_block))
-                    res = cursor.fetchone()
-            if not res:
-                # Fallback to any block match by residence name only (for residences like 'F3' with empty block)
-                query = "SELECT * FROM residences WHERE residence_name = %s LIMIT 1"
-                cursor.execute(query, (residence_name.strip(),))
-                res = cursor.fetchone()
-            return res
+            cursor = connection.cursor()
+            hashed_password = generate_password_hash(plain_password)
+            query = "UPDATE students SET password = %s WHERE id = %s"
+            cursor.execute(query, (hashed_password, student_id))
+            connection.commit()
+            return True
         except Error as err:
-            print(f"❌ Error finding residence: {err}")
-            return None
+            log.error("password update failed", extra={'error': str(err)})
+            return False
         finally:
             if cursor:
                 cursor.close()
             if connection:
                 connection.close()
 
+    # ---------------- APPLICATION METHODS ----------------
+    def _residence_by_key(self, residence_name: str, block: str | None):
+        if block is None:
+            return self.execute_query("SELECT * FROM residences WHERE residence_name = %s LIMIT 1",
+                                      (residence_name,), fetch_one=True, intent='read')
+        return self.execute_query("SELECT * FROM residences WHERE residence_name = %s AND block = %s LIMIT 1",
+                                  (residence_name, block), fetch_one=True, intent='read')
+
     def get_residence_by_id(self, residence_id: int):
-        query = "SELECT * FROM residences WHERE id = %s"
-        return self.execute_query(query, (residence_id,), fetch_one=True)
+        return self.execute_prepared('residence_by_id', (residence_id,), fetch_one=True, intent='read')
+
+    # ---------------- APPLICATION METHODS ----------------
+    # Every read is scoped to one intake cycle (the current one unless given), so MySQL
+    # prunes `applications` to that cycle's partition.
+    @staticmethod
+    def _applications_source(cycle: int) -> tuple:
+        """FROM-clause source and params for a cycle: the live table, plus the archive for closed cycles."""
+        if cycle >= current_cycle():
+            return "applications", ()
+        # A closed cycle may be part-way through archival, so read both halves
+        return ("(SELECT * FROM applications WHERE intake_cycle = %s "
+                "UNION ALL SELECT * FROM applications_archive WHERE intake_cycle = %s)"), (cycle, cycle)
 
-    def count_accepted_for_residence(self, residence_id: int) -> int:
+    def count_accepted_for_residence(self, residence_id: int, intake_cycle: int | None = None) -> int:
         result = self.execute_query(
-            "SELECT COUNT(*) as count FROM applications WHERE residence_id=%s AND status='Accepted'",
-            (residence_id,),
-            fetch_one=True
+            "SELECT COUNT(*) as count FROM applications WHERE intake_cycle=%s AND residence_id=%s AND status='Accepted'",
+            (intake_cycle or current_cycle(), residence_id),
+            fetch_one=True, intent='read'
         )
         return int(result['count']) if result and result['count'] is not None else 0
 
-    def get_student_applications(self, student_id):
-        query = """
-        SELECT a.id, r.residence_name, r.block, r.on_campus, a.status, a.apply_date AS applied_date, a.room_number
-        FROM applications a
+    def get_student_applications(self, student_id, intake_cycle: int | None = None):
+        cycle = intake_cycle or current_cycle()
+        if cycle >= current_cycle():
+            result = self.execute_prepared('student_applications', (student_id, cycle), fetch_all=True, intent='read')
+        else:
+            source, params = self._applications_source(cycle)
+            query = f"""
+            SELECT a.id, r.residence_name, r.block, r.on_campus, a.status, a.apply_date AS applied_date, a.room_number
+            FROM {source} a
+            JOIN residences r ON r.id = a.residence_id
+            WHERE a.student_id = %s AND a.intake_cycle = %s
+            ORDER BY a.apply_date DESC
+            """
+            result = self.execute_query(query, params + (student_id, cycle), fetch_all=True, intent='read')
+        return result if result is not None else []
+
+    def get_all_applications(self, intake_cycle: int | None = None) -> RowSet:
+        cycle = intake_cycle or current_cycle()
+        source, params = self._applications_source(cycle)
+        query = f"""
+        SELECT a.id, a.intake_cycle, a.status, a.apply_date, a.room_number,
+               s.id AS student_id, s.student_number, s.first_name, s.last_name, s.email,
+               r.id AS residence_id, r.residence_name, r.block, r.on_campus
+        FROM {source} a
+        JOIN students s ON s.id = a.student_id
         JOIN residences r ON r.id = a.residence_id
-        WHERE a.student_id = %s
+        WHERE a.intake_cycle = %s
         ORDER BY a.apply_date DESC
         """
-        result = self.execute_query(query, (student_id,), fetch_all=True)
-        return result if result is not None else []
+        result = self.fetch_rowset(query, params + (cycle,))
+        return result if result is not None else RowSet((), [])
 
-    def get_all_applications(self):
-        query = """
-        SELECT a.id, a.status, a.apply_date, a.room_number,
+    def get_applications_page(self, limit: int, before_id: int | None = None, status: str | None = None,
+                              student_ids: list | None = None, intake_cycle: int | None = None) -> RowSet:
+        cycle = intake_cycle or current_cycle()
+        source, source_params = self._applications_source(cycle)
+        where, params = page_filters('a.id', before_id, (('a.intake_cycle', cycle), ('a.status', status)),
+                                      'a.student_id', student_ids, '%s')
+        query = f"""
+        SELECT a.id, a.intake_cycle, a.status, a.apply_date, a.room_number,
                s.id AS student_id, s.student_number, s.first_name, s.last_name, s.email,
                r.id AS residence_id, r.residence_name, r.block, r.on_campus
-        FROM applications a
+        FROM {source} a
         JOIN students s ON s.id = a.student_id
         JOIN residences r ON r.id = a.residence_id
-        ORDER BY a.apply_date DESC
+        {where}
+        ORDER BY a.id DESC
+        LIMIT %s
         """
-        result = self.execute_query(query, fetch_all=True)
-        return result if result is not None else []
+        result = self.fetch_rowset(query, source_params + params + (limit,))
+        return result if result is not None else RowSet((), [])
 
-    def count_existing_by_type(self, student_id: int):
+    def count_applications_by_status(self, intake_cycle: int | None = None) -> dict:
+        cycle = intake_cycle or current_cycle()
+        source, params = self._applications_source(cycle)
+        result = self.execute_query(
+            f"SELECT a.status, COUNT(*) AS n FROM {source} a WHERE a.intake_cycle = %s GROUP BY a.status",
+            params + (cycle,), fetch_all=True, intent='read'
+        )
+        return {row['status']: row['n'] for row in result or []}
+
+    def count_existing_by_type(self, student_id: int, intake_cycle: int | None = None):
         query = """
         SELECT r.on_campus AS on_campus, COUNT(*) AS cnt
         FROM applications a
         JOIN residences r ON r.id = a.residence_id
-        WHERE a.student_id = %s
+        WHERE a.intake_cycle = %s AND a.student_id = %s
         GROUP BY r.on_campus
         """
-        result = self.execute_query(query, (student_id,), fetch_all=True)
+        result = self.execute_query(query, (intake_cycle or current_cycle(), student_id), fetch_all=True, intent='read')
         counts = {True: 0, False: 0}
         if result:
             for row in result:
                 counts[row['on_campus']] = row['cnt']
         return counts
 
-    def create_applications_with_validation(self, student_id: int, selections: list):
+    TRANSACTION_RETRIES = 3
+    RETRYABLE_ERRORS = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+
+    def _insert_applications(self, student_id: int, cycle: int, residence_ids: list, on_campus: int):
         """
-        selections: list of dicts with either {residence_id} or {residence_name, block}
-        Returns (success: bool, error: str | None, created_ids: list[int])
+        The on-campus limit is enforced inside the insert transaction: the student's
+        row in student_application_limits is locked FOR UPDATE, so concurrent submits
+        from the same student serialise on that row while other students proceed.
+        The row is seeded from the student's applications only when it does not exist yet.
+        """
+        for attempt in range(self.TRANSACTION_RETRIES):
+            connection = None
+            cursor = None
+            try:
+                connection = self.get_connection('write')
+                if connection is None:
+                    return False, "Database connection failed", []
+
+                cursor = connection.cursor()
+                connection.start_transaction()
+                counter = self._lock_application_limit(cursor, student_id, cycle)
+                if counter is None:
+                    # First submit this cycle: seed the counter from existing applications, then lock it.
+                    # Only here does the COUNT(*) read (and share-lock) the student's applications range
+                    cursor.execute(
+                        """
+                        INSERT INTO student_application_limits (student_id, intake_cycle, on_campus_count)
+                        SELECT %s, %s, COUNT(*) FROM applications a
+                        JOIN residences r ON r.id = a.residence_id
+                        WHERE a.intake_cycle = %s AND a.student_id = %s AND r.on_campus = TRUE
+                        ON DUPLICATE KEY UPDATE student_id = student_id
+                        """,
+                        (student_id, cycle, cycle, student_id)
+                    )
+                    counter = self._lock_application_limit(cursor, student_id, cycle)
+                existing_on = int(counter)
+                if existing_on + on_campus > self.ON_CAMPUS_LIMIT:
+                    connection.rollback()
+                    return False, f"On-campus application limit exceeded (max {self.ON_CAMPUS_LIMIT})", []
+
+                created_ids = []
+                now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                for residence_id in residence_ids:
+                    cursor.execute(
+                        "INSERT INTO applications (intake_cycle, student_id, residence_id, status, apply_date) VALUES (%s, %s, %s, %s, %s)",
+                        (cycle, student_id, residence_id, 'Pending', now)
+                    )
+                    created_ids.append(cursor.lastrowid)
+                if on_campus:
+                    cursor.execute(
+                        "UPDATE student_application_limits SET on_campus_count = on_campus_count + %s "
+                        "WHERE student_id = %s AND intake_cycle = %s",
+                        (on_campus, student_id, cycle)
+                    )
+                connection.commit()
+                return True, None, created_ids
+            except Error as err:
+                if connection:
+                    connection.rollback()
+                if err.errno == errorcode.ER_DUP_ENTRY:
+                    return False, "Duplicate application for the same residence", []
+                if err.errno in self.RETRYABLE_ERRORS and attempt + 1 < self.TRANSACTION_RETRIES:
+                    # Back off briefly with jitter before retrying the whole transaction
+                    time.sleep(0.02 * (2 ** attempt) * (1 + random.random()))
+                    continue
+                log.error("application create failed", extra={'error': str(err)})
+                return False, "Internal error creating applications", []
+            finally:
+                if cursor:
+                    cursor.close()
+                if connection:
+                    connection.close()
+        return False, "Internal error creating applications", []
+
+    @staticmethod
+    def _lock_application_limit(cursor, student_id: int, cycle: int):
+        """The student's on-campus count for the cycle, row-locked until commit; None if no row yet."""
+        cursor.execute(
+            "SELECT on_campus_count FROM student_application_limits WHERE student_id = %s AND intake_cycle = %s FOR UPDATE",
+            (student_id, cycle)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def migrate_application_limits(self) -> bool:
+        """Create student_application_limits on a database from before it existed; counters seed on first submit."""
+        created = self.execute_query("""
+        CREATE TABLE IF NOT EXISTS student_application_limits (
+            student_id INT NOT NULL,
+            intake_cycle SMALLINT UNSIGNED NOT NULL,
+            on_campus_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, intake_cycle),
+            CONSTRAINT fk_limit_student FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+        )
+        """)
+        if created is None:
+            log.error("migration stopped", extra={'statement': 'CREATE TABLE student_application_limits'})
+            return False
+        return True
+
+    def migrate_demand_cycles(self) -> bool:
+        """
+        Key residence_demand on intake_cycle on a database from before it was: the old
+        counters mixed every cycle, so they are dropped and the current cycle is rebuilt.
+        """
+        column = self.execute_query(
+            "SELECT 1 AS present FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'residence_demand' AND COLUMN_NAME = 'intake_cycle'",
+            (self.database,), fetch_one=True, intent='primary'
+        )
+        if column:
+            return True
+        for statement in (
+            "DELETE FROM residence_demand",
+            "ALTER TABLE residence_demand ADD COLUMN intake_cycle SMALLINT UNSIGNED NOT NULL FIRST, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (intake_cycle, residence_id, dimension, dim_value)",
+        ):
+            if self.execute_query(statement) is None:
+                log.error("migration stopped", extra={'statement': statement})
+                return False
+        return self.rebuild_demand_aggregates()
+
+    def update_application_status(self, application_id: int, status: str, room_number: str = None,
+                                  intake_cycle: int | None = None):
+        cycle = intake_cycle or current_cycle()
+        if room_number is not None:
+            updated = self.execute_prepared('application_status_room', (status, room_number, application_id, cycle))
+        else:
+            updated = self.execute_prepared('application_status', (status, application_id, cycle))
+        return updated is not None
+
+    def get_application_with_details(self, application_id: int, intake_cycle: int | None = None, fresh: bool = False):
+        query = """
+        SELECT a.id, a.intake_cycle, a.status, a.apply_date, a.room_number,
+               s.id AS student_id, s.first_name, s.last_name, s.email, s.student_number,
+               r.id AS residence_id, r.residence_name, r.block, r.on_campus
+        FROM applications a
+        JOIN students s ON s.id = a.student_id
+        JOIN residences r ON r.id = a.residence_id
+        WHERE a.intake_cycle = %s AND a.id = %s
+        """
+        return self.execute_query(query, (intake_cycle or current_cycle(), application_id), fetch_one=True,
+                                  intent='primary' if fresh else 'read')
+
+    def get_accepted_offcampus_students(self, residence_id: int, intake_cycle: int | None = None):
+        query = """
+        SELECT s.id, s.first_name, s.last_name, s.email, s.student_number
+        FROM applications a
+        JOIN students s ON s.id = a.student_id
+        JOIN residences r ON r.id = a.residence_id
+        WHERE a.intake_cycle = %s AND a.status = 'Accepted' AND r.on_campus = FALSE AND r.id = %s
+        ORDER BY s.last_name, s.first_name
+        """
+        result = self.execute_query(query, (intake_cycle or current_cycle(), residence_id), fetch_all=True, intent='read')
+        return result if result is not None else []
+
+    def get_campaign_recipients(self, statuses: list, after_student_id: int = 0, limit: int = 500,
+                                intake_cycle: int | None = None):
+        """
+        The next `limit` students (by id, after after_student_id) with an application in one of
+        `statuses`, one row per matching application, ordered by student. Keyset-paged so a
+        campaign never holds more than one batch in memory.
+        """
+        if not statuses:
+            return []
+        cycle = intake_cycle or current_cycle()
+        in_statuses = ", ".join(["%s"] * len(statuses))
+        query = f"""
+        SELECT s.id AS student_id, s.first_name, s.last_name, s.email,
+               r.residence_name, r.block, a.status
+        FROM (
+            SELECT DISTINCT student_id FROM applications
+            WHERE intake_cycle = %s AND status IN ({in_statuses}) AND student_id > %s
+            ORDER BY student_id
+            LIMIT %s
+        ) batch
+        JOIN students s ON s.id = batch.student_id
+        JOIN applications a ON a.student_id = s.id AND a.intake_cycle = %s AND a.status IN ({in_statuses})
+        JOIN residences r ON r.id = a.residence_id
+        ORDER BY s.id, a.apply_date
+        """
+        params = (cycle, *statuses, after_student_id, limit, cycle, *statuses)
+        return self.execute_query(query, params, fetch_all=True, intent='read')
+
+    # ---------------- INTAKE CYCLE METHODS ----------------
+    APPLICATION_COLUMNS = ('id', 'intake_cycle', 'student_id', 'residence_id', 'status', 'apply_date', 'room_number')
+
+    def get_application_partitions(self, table: str = 'applications'):
+        """[{'name', 'cycle' (None for pmax), 'rows' (InnoDB estimate)}] in range order, or None on error."""
+        rows = self.execute_query(
+            """
+            SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound, TABLE_ROWS AS rows_estimate
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """,
+            (self.database, table), fetch_all=True, intent='primary'
+        )
+        if rows is None:
+            return None
+        return [{
+            'name': row['name'],
+            'cycle': None if row['bound'] == 'MAXVALUE' else int(row['bound']) - 1,
+            'rows': int(row['rows_estimate'] or 0)
+        } for row in rows]
+
+    def ensure_cycle_partition(self, cycle: int, table: str = 'applications') -> bool:
+        """Split pmax so every cycle up to `cycle` has its own partition (cheap while pmax is empty)."""
+        partitions = self.get_application_partitions(table)
+        if not partitions:
+            return False
+        last = max((p['cycle'] for p in partitions if p['cycle'] is not None), default=cycle - 1)
+        if cycle <= last:
+            return True
+        parts = ", ".join(f"PARTITION {partition_name(c)} VALUES LESS THAN ({c + 1})" for c in range(last + 1, cycle + 1))
+        result = self.execute_query(
+            f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO "
+            f"({parts}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+        )
+        return result is not None
+
+    def archive_application_batch(self, cycle: int, batch_size: int) -> int | None:
+        """
+        Move up to batch_size applications of a closed cycle into applications_archive
+        in one transaction. Returns how many were moved (0 when the cycle is empty).
         """
         connection = None
         cursor = None
         try:
-            connection = self.get_connection()
+            connection = self.get_connection('write')
             if connection is None:
-                return False, "Database connection failed", []
+                return None
 
             cursor = connection.cursor()
-
-            # Resolve residence ids and classify by on/off campus
-            resolved = []
-            for sel in selections:
-                residence_id = sel.get('residence_id')
-                if not residence_id:
-                    name = sel.get('residence_name')
-                    block = sel.get('block', '')
-                    res = self.find_residence(name, block)
-                    if not res:
-                        return False, f"Residence not found: {name} {block}", []
-                    residence_id = res['id']
-                    on_campus = res['on_campus']
-                else:
-                    res = self.get_residence_by_id(residence_id)
-                    if not res:
-                        return False, f"Residence not found: id {residence_id}", []
-                    on_campus = res['on_campus']
-                resolved.append((residence_id, on_campus))
-
-            # Validate selection counts - only on-campus has limits
-            sel_on = sum(1 for _, oc in resolved if oc)
-            sel_off = sum(1 for _, oc in resolved if not oc)
-            if sel_on > 2:
-                return False, "Cannot select more than 2 on-campus residences", []
-            # Off-campus has no limits
-
-            # Validate existing counts - only check on-campus limits
-            existing_counts = self.count_existing_by_type(student_id)
-            if existing_counts.get(True, 0) + sel_on > 2:
-                return False, "On-campus application limit exceeded (max 2)", []
-            # Off-campus has no limits
-
-            # Insert, ignoring duplicates to respect unique constraint
-            created_ids = []
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            for residence_id, _ in resolved:
-                try:
-                    cursor.execute(
-                        "INSERT INTO applications (student_id, residence_id, status, apply_date) VALUES (%s, %s, %s, %s)",
-                        (student_id, residence_id, 'Pending', now)
-                    )
-                    created_ids.append(cursor.lastrowid)
-                except Error as err:
-                    if 'Duplicate' in str(err) or 'duplicate' in str(err):
-                        return False, "Duplicate application for the same residence", []
-                    raise
+            connection.start_transaction()
+            cursor.execute(
+                "SELECT id FROM applications WHERE intake_cycle = %s ORDER BY id LIMIT %s FOR UPDATE",
+                (cycle, batch_size)
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                connection.commit()
+                return 0
+            columns = ", ".join(self.APPLICATION_COLUMNS)
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"INSERT INTO applications_archive ({columns}) "
+                f"SELECT {columns} FROM applications WHERE intake_cycle = %s AND id IN ({placeholders})",
+                [cycle, *ids]
+            )
+            cursor.execute(
+                f"DELETE FROM applications WHERE intake_cycle = %s AND id IN ({placeholders})",
+                [cycle, *ids]
+            )
             connection.commit()
-            return True, None, created_ids
+            return len(ids)
         except Error as err:
-            print(f"❌ Error creating applications: {err}")
-            return False, "Internal error creating applications", []
+            self._query_failed(err)
+            log.error("archival batch failed", extra={'cycle': cycle, 'error': str(err)})
+            if connection:
+                connection.rollback()
+            return None
         finally:
             if cursor:
                 cursor.close()
             if connection:
                 connection.close()
 
-    def update_application_status(self, application_id: int, status: str, room_number: str = None):
+    def drop_cycle_partition(self, cycle: int) -> bool:
+        """Drop a closed cycle's live partition, only once archival has emptied it."""
+        name = partition_name(cycle)
+        remaining = self.execute_query(f"SELECT COUNT(*) AS n FROM applications PARTITION ({name})", fetch_one=True,
+                                       intent='primary')
+        if remaining is None or remaining['n']:
+            log.error("partition not empty, not dropped", extra={'partition': name, 'rows': remaining['n'] if remaining else None})
+            return False
+        return self.execute_query(f"ALTER TABLE applications DROP PARTITION {name}") is not None
+
+    def migrate_applications_to_cycles(self) -> bool:
+        """
+        One-off conversion of a pre-cycle `applications` table: add and backfill
+        intake_cycle from apply_date, drop the foreign keys (not allowed on partitioned
+        tables), re-key on the cycle, partition by cycle and create the archive table.
+        Run during a maintenance window; each ALTER rebuilds the table.
+        """
+        column = self.execute_query(
+            "SELECT 1 AS present FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'applications' AND COLUMN_NAME = 'intake_cycle'",
+            (self.database,), fetch_one=True, intent='primary'
+        )
+        if column:
+            log.info("applications already has intake_cycle")
+            return True
+        foreign_keys = self.execute_query(
+            "SELECT CONSTRAINT_NAME AS name FROM information_schema.TABLE_CONSTRAINTS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'applications' AND CONSTRAINT_TYPE = 'FOREIGN KEY'",
+            (self.database,), fetch_all=True, intent='primary'
+        ) or []
+        cycle = current_cycle()
+        statements = []
+        if foreign_keys:
+            statements.append("ALTER TABLE applications " + ", ".join(f"DROP FOREIGN KEY {fk['name']}" for fk in foreign_keys))
+        statements += [
+            "ALTER TABLE applications ADD COLUMN intake_cycle SMALLINT UNSIGNED NOT NULL DEFAULT 0 AFTER id",
+            f"UPDATE applications SET intake_cycle = YEAR(COALESCE(apply_date, NOW())) "
+            f"+ (MONTH(COALESCE(apply_date, NOW())) >= {CYCLE_START_MONTH})",
+            "ALTER TABLE applications ALTER COLUMN intake_cycle DROP DEFAULT, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id, intake_cycle), "
+            "DROP INDEX uq_student_residence, ADD UNIQUE KEY uq_student_residence_cycle (student_id, residence_id, intake_cycle), "
+            "ADD INDEX idx_app_cycle_residence_status (intake_cycle, residence_id, status), "
+            "ADD INDEX idx_app_cycle_apply_date (intake_cycle, apply_date)",
+        ]
+        for statement in statements:
+            if self.execute_query(statement) is None:
+                log.error("migration stopped", extra={'statement': statement})
+                return False
+        oldest = self.execute_query("SELECT MIN(intake_cycle) AS first FROM applications", fetch_one=True, intent='primary')
+        first = min(oldest['first'] or cycle, cycle - 1) if oldest else cycle - 1
+        statements = [
+            f"ALTER TABLE applications {partition_clause(first, cycle + 1)}",
+            "CREATE TABLE IF NOT EXISTS applications_archive LIKE applications",
+            "ALTER TABLE applications_archive ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8",
+            # Limits become per cycle; the counters are re-seeded from applications on the next submit
+            "DELETE FROM student_application_limits",
+            "ALTER TABLE student_application_limits ADD COLUMN intake_cycle SMALLINT UNSIGNED NOT NULL AFTER student_id, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (student_id, intake_cycle)",
+        ]
+        for statement in statements:
+            if self.execute_query(statement) is None:
+                log.error("migration stopped", extra={'statement': statement})
+                return False
+        log.info("applications partitioned by intake cycle", extra={'first': first, 'last': cycle + 1})
+        return True
+
+    # ---------------- IDEMPOTENCY METHODS ----------------
+    def get_idempotency_record(self, scope: str, idem_key: str):
+        query = """
+        SELECT request_fingerprint, status_code, response_body, UNIX_TIMESTAMP(expires_at) AS expires
+        FROM idempotency_keys
+        WHERE scope = %s AND idem_key = %s AND expires_at > NOW()
+        """
+        row = self.execute_query(query, (scope, idem_key), fetch_one=True, intent='primary')
+        if row:
+            row['expires'] = float(row['expires'])
+        return row
+
+    def reserve_idempotency_key(self, scope: str, idem_key: str, fingerprint: str, ttl_seconds: int) -> bool:
+        """Claim a key before running the request. Returns False if it is already taken."""
         connection = None
         cursor = None
         try:
-            connection = self.get_connection()
+            connection = self.get_connection('write')
             if connection is None:
                 return False
-                
+
             cursor = connection.cursor()
-            if room_number is not None:
-                cursor.execute("UPDATE applications SET status=%s, room_number=%s WHERE id=%s", (status, room_number, application_id))
-            else:
-                cursor.execute("UPDATE applications SET status=%s WHERE id=%s", (status, application_id))
+            # An expired record for the same key no longer blocks reuse
+            cursor.execute(
+                "DELETE FROM idempotency_keys WHERE scope = %s AND idem_key = %s AND expires_at <= NOW()",
+                (scope, idem_key)
+            )
+            cursor.execute(
+                "INSERT INTO idempotency_keys (scope, idem_key, request_fingerprint, expires_at) "
+                "VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND)",
+                (scope, idem_key, fingerprint, ttl_seconds)
+            )
             connection.commit()
             return True
         except Error as err:
-            print(f"❌ Error updating application status: {err}")
+            if err.errno != errorcode.ER_DUP_ENTRY:
+                log.error("idempotency key reservation failed", extra={'error': str(err)})
             return False
         finally:
             if cursor:
@@ -379,26 +1351,256 @@ class Database:
             if connection:
                 connection.close()
 
-    def get_application_with_details(self, application_id: int):
-        query = """
-        SELECT a.id, a.status, a.apply_date, a.room_number,
-               s.id AS student_id, s.first_name, s.last_name, s.email, s.student_number,
-               r.id AS residence_id, r.residence_name, r.block, r.on_campus
-        FROM applications a
-        JOIN students s ON s.id = a.student_id
-        JOIN residences r ON r.id = a.residence_id
-        WHERE a.id = %s
+    def complete_idempotency_key(self, scope: str, idem_key: str, status_code: int, response_body: str) -> bool:
+        result = self.execute_query(
+            "UPDATE idempotency_keys SET status_code = %s, response_body = %s WHERE scope = %s AND idem_key = %s",
+            (status_code, response_body, scope, idem_key)
+        )
+        return bool(result)
+
+    def release_idempotency_key(self, scope: str, idem_key: str) -> bool:
+        result = self.execute_query(
+            "DELETE FROM idempotency_keys WHERE scope = %s AND idem_key = %s AND status_code IS NULL",
+            (scope, idem_key)
+        )
+        return result is not None
+
+    def purge_expired_idempotency_keys(self, batch_size: int = 1000) -> int:
+        result = self.execute_query(
+            "DELETE FROM idempotency_keys WHERE expires_at <= NOW() LIMIT %s",
+            (batch_size,)
+        )
+        return result or 0
+
+    # ---------------- ALLOCATION METHODS ----------------
+    def get_allocation_snapshot(self, intake_cycle: int | None = None):
+        """
+        Read everything the allocation simulator needs for one intake cycle in one connection, as plain tuples:
+        {'applications': [(student_id, residence_id)] in preference order,
+         'students': [(id, gender, year_of_study, gpa, distance)],
+         'residences': [(id, residence_name, block, available_rooms, accepted_count)]}
+        Students who already hold an accepted offer are left out. Returns None on failure.
         """
-        return self.execute_query(query, (application_id,), fetch_one=True)
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection('read')
+            if connection is None:
+                return None
 
-    def get_accepted_offcampus_students(self, residence_id: int):
-        query = """
-        SELECT s.id, s.first_name, s.last_name, s.email, s.student_number
-        FROM applications a
-        JOIN students s ON s.id = a.student_id
-        JOIN residences r ON r.id = a.residence_id
-        WHERE a.status = 'Accepted' AND r.on_campus = FALSE AND r.id = %s
-        ORDER BY s.last_name, s.first_name
+            cursor = connection.cursor()
+            cycle = intake_cycle or current_cycle()
+            pending = """
+            FROM applications a
+            WHERE a.intake_cycle = %s AND a.status = 'Pending'
+              AND NOT EXISTS (SELECT 1 FROM applications x
+                              WHERE x.intake_cycle = a.intake_cycle AND x.student_id = a.student_id AND x.status = 'Accepted')
+            """
+            cursor.execute(f"SELECT a.student_id, a.residence_id {pending} ORDER BY a.student_id, a.apply_date, a.id", (cycle,))
+            applications = cursor.fetchall()
+            cursor.execute(f"""
+            SELECT s.id, s.gender, s.year_of_study, s.gpa, s.distance
+            FROM students s
+            WHERE s.id IN (SELECT a.student_id {pending})
+            """, (cycle,))
+            students = cursor.fetchall()
+            cursor.execute("""
+            SELECT r.id, r.residence_name, r.block, r.available_rooms, COUNT(a.id)
+            FROM residences r
+            LEFT JOIN applications a ON a.intake_cycle = %s AND a.residence_id = r.id AND a.status = 'Accepted'
+            GROUP BY r.id, r.residence_name, r.block, r.available_rooms
+            """, (cycle,))
+            residences = cursor.fetchall()
+            return {'applications': applications, 'students': students, 'residences': residences}
+        except Error as err:
+            log.error("allocation snapshot read failed", extra={'error': str(err)})
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+
+    # ---------------- EVENT LOG METHODS ----------------
+    def record_application_events(self, events: list) -> bool:
+        """
+        events: list of (application_id, event_type, occurred_at)
+        Appends the batch to application_events and increments the hourly and daily
+        rollups in one transaction.
+        """
+        if not events:
+            return True
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection('write')
+            if connection is None:
+                return False
+
+            cursor = connection.cursor()
+            app_ids = list({app_id for app_id, _, _ in events})
+            cursor.execute(
+                f"""
+                SELECT a.id, a.student_id, a.residence_id, a.intake_cycle, s.gender, s.year_of_study, s.gpa, s.distance,
+                       (SELECT COUNT(*) FROM applications x
+                        WHERE x.intake_cycle = a.intake_cycle AND x.student_id = a.student_id AND x.id <= a.id)
+                FROM applications a
+                JOIN students s ON s.id = a.student_id
+                WHERE a.id IN ({', '.join(['%s'] * len(app_ids))})
+                """,
+                app_ids
+            )
+            owners = {row[0]: row[1:] for row in cursor.fetchall()}
+
+            rows = []
+            hourly = {}
+            daily = {}
+            demand = {}
+            for app_id, event_type, occurred_at in events:
+                if app_id not in owners:
+                    continue
+                student_id, residence_id, cycle, gender, year, gpa, distance, choice_rank = owners[app_id]
+                rows.append((app_id, student_id, residence_id, event_type, occurred_at))
+                if event_type == 'submitted':
+                    for dimension, value in demand_dimensions(choice_rank, gender, year, gpa, distance):
+                        key = (cycle, residence_id, dimension, value)
+                        demand[key] = demand.get(key, 0) + 1
+                hour = occurred_at.replace(minute=0, second=0, microsecond=0)
+                for buckets, key in ((hourly, (residence_id, hour)), (daily, (residence_id, occurred_at.date()))):
+                    counts = buckets.setdefault(key, dict.fromkeys(EVENT_TYPES, 0))
+                    counts[event_type] += 1
+            if not rows:
+                return True
+
+            connection.start_transaction()
+            cursor.execute(
+                "INSERT INTO application_events (application_id, student_id, residence_id, event_type, occurred_at) VALUES "
+                + ", ".join(["(%s,%s,%s,%s,%s)"] * len(rows)),
+                [value for row in rows for value in row]
+            )
+            increments = ", ".join(f"{col}={col}+VALUES({col})" for col in EVENT_TYPES)
+            for table, buckets in (('application_rollups_hourly', hourly), ('application_rollups_daily', daily)):
+                params = []
+                for (residence_id, bucket), counts in buckets.items():
+                    params.extend([residence_id, bucket] + [counts[e] for e in EVENT_TYPES])
+                cursor.execute(
+                    f"INSERT INTO {table} (residence_id, bucket, {', '.join(EVENT_TYPES)}) VALUES "
+                    + ", ".join(["(" + ", ".join(["%s"] * (2 + len(EVENT_TYPES))) + ")"] * len(buckets))
+                    + f" ON DUPLICATE KEY UPDATE {increments}",
+                    params
+                )
+            if demand:
+                cursor.execute(
+                    "INSERT INTO residence_demand (intake_cycle, residence_id, dimension, dim_value, applicants) VALUES "
+                    + ", ".join(["(%s,%s,%s,%s,%s)"] * len(demand))
+                    + " ON DUPLICATE KEY UPDATE applicants = applicants + VALUES(applicants)",
+                    [value for key, count in demand.items() for value in (*key, count)]
+                )
+            connection.commit()
+            return True
+        except Error as err:
+            log.error("application event write failed", extra={'error': str(err)})
+            if connection:
+                connection.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+
+    def get_application_trends(self, granularity: str = 'day', since=None, residence_id: int | None = None):
+        table = 'application_rollups_hourly' if granularity == 'hour' else 'application_rollups_daily'
+        query = f"""
+        SELECT u.residence_id, r.residence_name, r.block, u.bucket,
+               u.submitted, u.approved, u.rejected, u.accepted, u.declined
+        FROM {table} u
+        JOIN residences r ON r.id = u.residence_id
         """
-        result = self.execute_query(query, (residence_id,), fetch_all=True)
+        clauses = []
+        params = []
+        if since is not None:
+            clauses.append("u.bucket >= %s")
+            params.append(since)
+        if residence_id is not None:
+            clauses.append("u.residence_id = %s")
+            params.append(residence_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY u.bucket, r.residence_name, r.block"
+        result = self.execute_query(query, tuple(params), fetch_all=True, intent='read')
         return result if result is not None else []
+
+    # ---------------- DEMAND ANALYTICS METHODS ----------------
+    def get_demand_rows(self, intake_cycle: int | None = None):
+        """Residence catalogue joined with one cycle's residence_demand counters, as tuples."""
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection('read')
+            if connection is None:
+                return None
+
+            cursor = connection.cursor()
+            cursor.execute("""
+            SELECT r.id, r.residence_name, r.block, r.residence_type, r.available_rooms,
+                   d.dimension, d.dim_value, d.applicants
+            FROM residences r
+            LEFT JOIN residence_demand d ON d.intake_cycle = %s AND d.residence_id = r.id
+            """, (intake_cycle or current_cycle(),))
+            return cursor.fetchall()
+        except Error as err:
+            log.error("demand analytics read failed", extra={'error': str(err)})
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+
+    def rebuild_demand_aggregates(self, intake_cycle: int | None = None) -> bool:
+        """Recompute one cycle's residence_demand from its applications (backfill/repair; run off-peak)."""
+        cycle = intake_cycle or current_cycle()
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection('write')
+            if connection is None:
+                return False
+
+            cursor = connection.cursor()
+            cursor.execute("""
+            SELECT a.residence_id, s.gender, s.year_of_study, s.gpa, s.distance,
+                   ROW_NUMBER() OVER (PARTITION BY a.student_id ORDER BY a.id)
+            FROM applications a
+            JOIN students s ON s.id = a.student_id
+            WHERE a.intake_cycle = %s
+            """, (cycle,))
+            demand = {}
+            for residence_id, gender, year, gpa, distance, choice_rank in cursor.fetchall():
+                for dimension, value in demand_dimensions(choice_rank, gender, year, gpa, distance):
+                    key = (residence_id, dimension, value)
+                    demand[key] = demand.get(key, 0) + 1
+
+            connection.start_transaction()
+            cursor.execute("DELETE FROM residence_demand WHERE intake_cycle = %s", (cycle,))
+            items = list(demand.items())
+            for start in range(0, len(items), 1000):
+                chunk = items[start:start + 1000]
+                cursor.execute(
+                    "INSERT INTO residence_demand (intake_cycle, residence_id, dimension, dim_value, applicants) VALUES "
+                    + ", ".join(["(%s,%s,%s,%s,%s)"] * len(chunk)),
+                    [value for key, count in chunk for value in (cycle, *key, count)]
+                )
+            connection.commit()
+            return True
+        except Error as err:
+            log.error("demand aggregate rebuild failed", extra={'error': str(err)})
+            if connection:
+                connection.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
@@ -0,0 +1,144 @@
+"""
+Residence eligibility rules.
+
+`residences.restrictions` is free text ("first year only", "nursing only") and the
+gender split lives in `residence_type`. Each distinct (residence_type, restrictions)
+pair is compiled once into a Rule of bitmasks/keywords and cached, so matching a
+student against the whole catalogue is a few integer ANDs per residence.
+
+Attributes the student record does not have (gender 'other', missing year or
+program) never exclude a residence; only a known conflicting value does.
+A clause with a negation ("no first years", "males excluded", "not for
+postgraduates") excludes what it names instead of requiring it. A clause that
+cannot be read is logged and does not filter anyone.
+"""
+import logging
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+GENDER_BITS = {'male': 1, 'female': 2}
+ANY_GENDER = 0b11
+MAX_YEAR = 8
+ANY_YEAR = (1 << (MAX_YEAR + 1)) - 2  # bits 1..MAX_YEAR
+
+YEAR_WORDS = {
+    'first': 1, '1st': 1, 'second': 2, '2nd': 2, 'third': 3, '3rd': 3,
+    'fourth': 4, '4th': 4, 'fifth': 5, '5th': 5
+}
+YEAR_PATTERN = re.compile(r"\b(" + "|".join(YEAR_WORDS) + r"|[1-8])\b(?=[\w\s&/-]*\byears?\b)|\byears?\s*([1-8])\b")
+SENIOR_PATTERN = re.compile(r"\bseniors?\b")
+PROGRAM_PATTERN = re.compile(r"^([a-z][a-z &/-]*?)\s+(?:students?\s+)?only$")
+NEGATED_PROGRAM_PATTERN = re.compile(
+    r"^(?:no|not for|except|excluding)\s+([a-z][a-z &/-]*?)(?:\s+students?)?$"
+    r"|^([a-z][a-z &/-]*?)(?:\s+students?)?\s+(?:excluded|not allowed)$"
+)
+NEGATION_PATTERN = re.compile(r"\b(?:no|not|non|except|excluding|excluded?)\b")
+GENDER_WORDS = {
+    'male': 'male', 'males': 'male', 'men': 'male', 'boys': 'male',
+    'female': 'female', 'females': 'female', 'women': 'female', 'ladies': 'female', 'girls': 'female'
+}
+GENDER_PATTERN = re.compile(r"\b(" + "|".join(GENDER_WORDS) + r")\b")
+POSTGRAD_PATTERN = re.compile(r"\bpost-?grad(?:uate)?s?\b")
+UNDERGRAD_PATTERN = re.compile(r"\bunder-?grad(?:uate)?s?\b")
+# Students have no level column, so postgraduates are recognised by their program name
+POSTGRAD_PROGRAMS = frozenset({'honours', 'hons', 'master', 'msc', 'mba', 'phd', 'doctor', 'postgraduate', 'pgce'})
+NO_RESTRICTION = {'', 'none', 'n/a', 'na', '-'}
+
+log = logging.getLogger('eligibility')
+
+
+class Rule(NamedTuple):
+    gender_mask: int
+    year_mask: int
+    programs: frozenset
+    excluded_programs: frozenset
+    description: str
+
+
+def _year_bit(year) -> int:
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        return 0
+    return 1 << year if 1 <= year <= MAX_YEAR else 0
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(residence_type: str, restrictions: str) -> Rule:
+    """Compile one residence's type and restriction text into a Rule."""
+    gender_mask = GENDER_BITS.get((residence_type or '').lower(), ANY_GENDER)
+    year_mask = ANY_YEAR
+    programs = set()
+    excluded_programs = set()
+
+    for clause in re.split(r"[;,\n]", (restrictions or '').lower()):
+        clause = clause.strip()
+        if clause in NO_RESTRICTION:
+            continue
+        negated = bool(NEGATION_PATTERN.search(clause))
+        matched = False
+
+        years = [YEAR_WORDS.get(word) or int(word or digit) for word, digit in YEAR_PATTERN.findall(clause)]
+        if SENIOR_PATTERN.search(clause):
+            years.extend(range(2, MAX_YEAR + 1))
+        if years:
+            bits = sum(1 << y for y in set(years))
+            year_mask &= ~bits if negated else bits
+            matched = True
+
+        genders = {GENDER_WORDS[word] for word in GENDER_PATTERN.findall(clause)}
+        if genders:
+            bits = sum(GENDER_BITS[g] for g in genders)
+            gender_mask &= ~bits if negated else bits
+            matched = True
+
+        postgrad, undergrad = POSTGRAD_PATTERN.search(clause), UNDERGRAD_PATTERN.search(clause)
+        if postgrad or undergrad:
+            # "postgraduates only" / "no undergraduates" require a postgraduate program, the rest exclude one
+            (programs if bool(postgrad) != negated else excluded_programs).update(POSTGRAD_PROGRAMS)
+            matched = True
+
+        if not matched:
+            match = (NEGATED_PROGRAM_PATTERN if negated else PROGRAM_PATTERN).match(clause)
+            if match:
+                names = match.group(1) or match.group(2)
+                (excluded_programs if negated else programs).update(
+                    p.strip() for p in re.split(r"\band\b|&|/", names) if p.strip()
+                )
+                matched = True
+
+        if not matched:
+            log.warning("unparsed residence restriction ignored",
+                        extra={'clause': clause, 'restrictions': restrictions, 'residence_type': residence_type})
+
+    return Rule(gender_mask, year_mask & ANY_YEAR, frozenset(programs), frozenset(excluded_programs),
+                (restrictions or '').strip())
+
+
+def rule_for(residence: dict) -> Rule:
+    return compile_rule(residence.get('residence_type') or '', residence.get('restrictions') or '')
+
+
+def check_eligibility(student: dict, residence: dict):
+    """Returns (eligible: bool, reason: str | None) for one student/residence pair."""
+    rule = rule_for(residence)
+    label = f"{residence.get('residence_name')} {residence.get('block') or ''}".strip()
+    gender_bit = GENDER_BITS.get((student.get('gender') or '').lower(), 0)
+    if gender_bit and not gender_bit & rule.gender_mask:
+        if not gender_bit & GENDER_BITS.get((residence.get('residence_type') or '').lower(), ANY_GENDER):
+            return False, f"{label} is a {residence.get('residence_type')} residence"
+        return False, f"{label} is restricted: {rule.description}"
+    year_bit = _year_bit(student.get('year_of_study'))
+    if year_bit and not year_bit & rule.year_mask:
+        return False, f"{label} is restricted: {rule.description}"
+    program = (student.get('program') or '').lower()
+    if program and rule.programs and not any(p in program for p in rule.programs):
+        return False, f"{label} is restricted: {rule.description}"
+    if program and any(p in program for p in rule.excluded_programs):
+        return False, f"{label} is restricted: {rule.description}"
+    return True, None
+
+
+def filter_eligible(student: dict, residences: list) -> list:
+    return [r for r in residences if check_eligibility(student, r)[0]]
@@ -0,0 +1,101 @@
+"""
+Append-only application event log.
+
+Routes call `event_log.record(event_type, application_id)` after a successful
+write; the call only enqueues and never blocks the request. If the queue is
+full (the database is down or far behind), the event is dropped and counted in
+`dropped`, and the writer logs how many were lost. A background thread drains the queue in batches
+and hands them to `Database.record_application_events`, which appends to
+`application_events` and bumps the hourly/daily rollup counters in the same
+transaction, so trend queries never have to scan `applications`.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from resilience import DatabaseUnavailable
+
+EVENT_TYPES = ('submitted', 'approved', 'rejected', 'accepted', 'declined')
+
+log = logging.getLogger('events')
+
+
+class ApplicationEventLog:
+    def __init__(self, db, batch_size: int = 500, flush_interval: float = 1.0, max_pending: int = 20000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.dropped = 0
+        self._reported = 0
+        atexit.register(self.flush)
+
+    def record(self, event_type: str, application_id: int, occurred_at: datetime | None = None):
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown application event: {event_type}")
+        self._ensure_thread()
+        event = (int(application_id), event_type, occurred_at or datetime.now())
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Writer is behind; a request thread must not wait on it
+            self.dropped += 1
+
+    def flush(self):
+        """Write everything queued so far. Safe to call from any thread."""
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    return
+                try:
+                    written = self.db.record_application_events(batch)
+                except DatabaseUnavailable:
+                    # Keep the batch for the next flush once the database is back
+                    self._requeue(batch)
+                    return
+                if not written:
+                    log.error("application events dropped after a failed write", extra={'events': len(batch)})
+
+    def _requeue(self, batch: list):
+        for i, event in enumerate(batch):
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                self.dropped += len(batch) - i
+                return
+
+    def _drain(self) -> list:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='application-event-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                log.exception("application event writer error")
+            dropped = self.dropped
+            if dropped != self._reported:
+                log.error("application events dropped: queue full", extra={'events': dropped - self._reported})
+                self._reported = dropped
@@ -0,0 +1,136 @@
+"""
+Idempotency-Key support for state-changing POST routes.
+
+A client that sends `Idempotency-Key: <uuid>` gets exactly one execution of the
+route per key: the first response is stored (in the idempotency_keys table, with
+an in-memory front cache) and replayed verbatim for retries, so a resubmitted
+application or a retried approve never re-runs the write or re-sends email.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from flask import request, session, jsonify, make_response
+
+from storage import open_storage
+from resilience import DatabaseUnavailable
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL = 24 * 60 * 60  # seconds a stored response can be replayed
+MAX_KEY_LENGTH = 100
+PURGE_INTERVAL = 10 * 60  # seconds between opportunistic purges of expired keys
+
+
+class ResponseCache:
+    """Small thread-safe TTL cache in front of the idempotency_keys table."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires'] < time.time():
+                del self._entries[key]
+                return None
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first, then the oldest insertions
+                now = time.time()
+                for k in [k for k, e in self._entries.items() if e['expires'] < now]:
+                    del self._entries[k]
+                while len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = entry
+
+
+_cache = ResponseCache()
+_last_purge = 0.0
+
+
+def _maybe_purge(db):
+    global _last_purge
+    now = time.time()
+    if now - _last_purge >= PURGE_INTERVAL:
+        _last_purge = now
+        db.purge_expired_idempotency_keys()
+
+
+def _request_fingerprint() -> str:
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request.get_data() or b'')
+    return digest.hexdigest()
+
+
+def _replay(entry):
+    response = make_response(entry['response_body'], entry['status_code'])
+    response.headers['Content-Type'] = 'application/json'
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Route decorator: replay the stored response for a repeated Idempotency-Key."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.headers.get(IDEMPOTENCY_HEADER) or '').strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': 'Idempotency-Key too long'}), 400
+
+        db = open_storage()
+        # Keys are scoped to the caller so one user cannot replay another's response
+        scope = f"{session.get('user_type')}:{session.get('user_id')}"
+        fingerprint = _request_fingerprint()
+
+        entry = _cache.get((scope, key)) or db.get_idempotency_record(scope, key)
+        if entry is None and db.reserve_idempotency_key(scope, key, fingerprint, IDEMPOTENCY_TTL):
+            _maybe_purge(db)
+            return _execute(view, args, kwargs, db, scope, key, fingerprint)
+        # Lost a reservation race: read what the winner stored
+        entry = entry or db.get_idempotency_record(scope, key)
+        if entry is None:
+            return jsonify({'error': 'Idempotency store unavailable'}), 503
+
+        if entry['request_fingerprint'] != fingerprint:
+            return jsonify({'error': 'Idempotency-Key reused with a different request'}), 422
+        if entry['status_code'] is None:
+            return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+        _cache.set((scope, key), entry)
+        return _replay(entry)
+    return wrapper
+
+
+def _execute(view, args, kwargs, db, scope, key, fingerprint):
+    try:
+        response = make_response(view(*args, **kwargs))
+    except Exception:
+        try:
+            db.release_idempotency_key(scope, key)
+        except DatabaseUnavailable:
+            pass  # cannot release while the database is down; the reservation clears when the key expires
+        raise
+    if response.status_code >= 500:
+        # Server errors are not stored so the client's retry can run again
+        db.release_idempotency_key(scope, key)
+        return response
+    body = response.get_data(as_text=True)
+    if db.complete_idempotency_key(scope, key, response.status_code, body):
+        _cache.set((scope, key), {
+            'request_fingerprint': fingerprint,
+            'status_code': response.status_code,
+            'response_body': body,
+            'expires': time.time() + IDEMPOTENCY_TTL
+        })
+    return response
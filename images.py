@@ -0,0 +1,235 @@
+"""
+Responsive image derivatives for Assets/.
+
+`serve_assets` hands raster images to ImagePipeline.respond(), which picks the
+best format the browser accepts (AVIF, then WebP, then the source format) and
+the requested width (`?w=`, snapped up to one of BREAKPOINTS and never wider
+than the source). Derivatives are rendered on first request into an on-disk
+cache whose file names carry the source's content hash, so an edited image is
+re-hashed on its next request and its old derivatives are discarded.
+Templates use `image_srcset()` / `image_url()` to reference them.
+
+`python images.py [workers]` renders every derivative ahead of time in a
+process pool (run it on deploy so the first visitors do not pay for encoding).
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import request, send_file
+
+try:
+    from PIL import Image, features
+    HAVE_PIL = True
+except ImportError:
+    Image = features = None
+    HAVE_PIL = False
+
+BREAKPOINTS = (160, 320, 480, 640, 960, 1280)
+SOURCE_TYPES = {'.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg'}
+MIMETYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'png': 'image/png', 'jpeg': 'image/jpeg'}
+SAVE_OPTIONS = {
+    'avif': {'quality': 55, 'speed': 6},
+    'webp': {'quality': 80, 'method': 4},
+    'png': {'optimize': True},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def is_derivable(path: str) -> bool:
+    """True for source images the pipeline resizes/re-encodes (used by the asset middleware to defer them)."""
+    return HAVE_PIL and path.startswith('Assets/') and os.path.splitext(path)[1].lower() in SOURCE_TYPES
+
+
+def _encoders() -> tuple:
+    """Modern formats this Pillow build can write, best first."""
+    if not HAVE_PIL:
+        return ()
+    return tuple(fmt for fmt in ('avif', 'webp') if features.check(fmt))
+
+
+def _render(source: str, target: str, width: int, fmt: str) -> str:
+    """Resize source to width and encode it as fmt into target (atomically). Runs in worker processes too."""
+    with Image.open(source) as image:
+        image.load()
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(tmp, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+    os.replace(tmp, target)
+    return target
+
+
+class ImagePipeline:
+    def __init__(self, root: str, cache_dir: str, directory: str = 'Assets'):
+        self.root = root
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.encoders = _encoders()
+        self._sources = {}       # filename -> (mtime, digest, width, height)
+        self._locks = {}         # derivative path -> lock, so each is rendered once
+        self._lock = threading.Lock()
+
+    def handles(self, filename: str) -> bool:
+        return HAVE_PIL and os.path.splitext(filename)[1].lower() in SOURCE_TYPES
+
+    # ---------------- SOURCES ----------------
+    def _source(self, filename: str):
+        """(digest, width, height) for a source image, re-read only when its mtime changes."""
+        full = os.path.join(self.root, self.directory, filename)
+        mtime = os.path.getmtime(full)
+        cached = self._sources.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1:]
+        with open(full, 'rb') as handle:
+            digest = hashlib.sha256(handle.read()).hexdigest()[:10]
+        with Image.open(full) as image:
+            size = image.size
+        if cached and cached[1] != digest:
+            self._discard(filename, cached[1])
+        self._sources[filename] = (mtime, digest, *size)
+        return digest, *size
+
+    def _discard(self, filename: str, digest: str):
+        prefix = f"{os.path.splitext(filename)[0].replace('/', '_')}.{digest}."
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def _target(self, filename: str, digest: str, width: int, fmt: str) -> str:
+        stem = os.path.splitext(filename)[0].replace('/', '_')
+        return os.path.join(self.cache_dir, f"{stem}.{digest}.{width}.{fmt}")
+
+    @staticmethod
+    def snap_width(requested, source_width: int) -> int:
+        """Requested width rounded up to a breakpoint, capped at the source width."""
+        try:
+            requested = int(requested)
+        except (TypeError, ValueError):
+            return source_width
+        for width in BREAKPOINTS:
+            if width >= requested:
+                return min(width, source_width)
+        return source_width
+
+    def negotiate(self, accept: str, source_format: str) -> str:
+        accept = (accept or '').lower()
+        for fmt in self.encoders:
+            if MIMETYPES[fmt] in accept:
+                return fmt
+        return source_format
+
+    # ---------------- DERIVATIVES ----------------
+    def derivative(self, filename: str, width, accept: str):
+        """Path and mimetype of the derivative to serve, rendering it if it is not cached yet."""
+        digest, source_width, _ = self._source(filename)
+        width = self.snap_width(width, source_width)
+        source_format = SOURCE_TYPES[os.path.splitext(filename)[1].lower()]
+        fmt = self.negotiate(accept, source_format)
+        if fmt == source_format and width == source_width:
+            # Nothing to change: re-encoding the original would only make it bigger
+            return os.path.join(self.root, self.directory, filename), MIMETYPES[fmt], f"{digest}-{width}-{fmt}"
+        target = self._target(filename, digest, width, fmt)
+        if not os.path.exists(target):
+            with self._lock:
+                lock = self._locks.setdefault(target, threading.Lock())
+            with lock:
+                if not os.path.exists(target):
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    _render(os.path.join(self.root, self.directory, filename), target, width, fmt)
+            with self._lock:
+                self._locks.pop(target, None)
+        return target, MIMETYPES[fmt], f"{digest}-{width}-{fmt}"
+
+    def respond(self, filename: str, fingerprinted: bool = False):
+        """Flask response for an Assets/ image, negotiated on Accept and ?w=."""
+        path, mimetype, tag = self.derivative(filename, request.args.get('w'), request.headers.get('Accept'))
+        response = send_file(path, mimetype=mimetype, etag=tag, conditional=True)
+        response.headers['Cache-Control'] = IMMUTABLE if fingerprinted else 'no-cache'
+        response.headers['Vary'] = 'Accept'
+        return response
+
+    def pregenerate(self, workers: int | None = None) -> int:
+        """Render every (image, breakpoint, format) derivative in parallel; returns how many were written."""
+        jobs = []
+        base = os.path.join(self.root, self.directory)
+        for filename in sorted(os.listdir(base)):
+            if not self.handles(filename):
+                continue
+            digest, source_width, _ = self._source(filename)
+            source_format = SOURCE_TYPES[os.path.splitext(filename)[1].lower()]
+            widths = sorted({min(w, source_width) for w in BREAKPOINTS} | {source_width})
+            for width in widths:
+                for fmt in self.encoders + (source_format,):
+                    if fmt == source_format and width == source_width:
+                        continue
+                    target = self._target(filename, digest, width, fmt)
+                    if not os.path.exists(target):
+                        jobs.append((os.path.join(base, filename), target, width, fmt))
+        if not jobs:
+            return 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(_render, *job) for job in jobs]:
+                future.result()
+        return len(jobs)
+
+    # ---------------- TEMPLATE HELPERS ----------------
+    def srcset(self, url: str, filename: str) -> str:
+        """`url?w=320 320w, ...` for the breakpoints narrower than the source image."""
+        try:
+            _, source_width, _ = self._source(filename)
+        except OSError:
+            return ''
+        widths = [w for w in BREAKPOINTS if w < source_width] + [source_width]
+        return ', '.join(f"{url}?w={w} {w}w" for w in widths)
+
+
+def install(app, manifest, cache_dir: str | None = None) -> ImagePipeline:
+    """Register `image_url` / `image_srcset` template helpers backed by the asset manifest."""
+    pipeline = ImagePipeline(app.root_path, cache_dir or os.path.join(app.root_path, '.image_cache'))
+
+    def image_url(path: str, width: int | None = None) -> str:
+        url = manifest.asset_url(path)
+        return f"{url}?w={width}" if width else url
+
+    def image_srcset(path: str) -> str:
+        path = path.lstrip('./').lstrip('/')
+        return pipeline.srcset(manifest.asset_url(path), path.split('/', 1)[-1])
+
+    app.jinja_env.globals.update(image_url=image_url, image_srcset=image_srcset)
+    return pipeline
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    here = os.path.dirname(os.path.abspath(__file__))
+    pipeline = ImagePipeline(here, os.path.join(here, '.image_cache'))
+    started = time.perf_counter()
+    written = pipeline.pregenerate(int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    print(f"Rendered {written} derivatives ({', '.join(pipeline.encoders + ('source format',))}) "
+          f"in {time.perf_counter() - started:.1f}s")
+    total_source = total_best = 0
+    for filename in sorted(os.listdir(os.path.join(here, 'Assets'))):
+        if pipeline.handles(filename):
+            source = os.path.getsize(os.path.join(here, 'Assets', filename))
+            best, _, _ = pipeline.derivative(filename, 480, 'image/avif,image/webp')
+            total_source += source
+            total_best += os.path.getsize(best)
+            print(f"{filename:<32} {source:>9} -> {os.path.getsize(best):>8} bytes at 480w")
+    print(f"total {total_source} -> {total_best} bytes")
@@ -6,17 +6,18 @@ DROP TABLE IF EXISTS residences;
 
 CREATE TABLE residences (
   id INT AUTO_INCREMENT PRIMARY KEY,
-  residence_name VARCHAR(200),
-  block VARCHAR(100),
+  residence_name VARCHAR(200) NOT NULL,
+  block VARCHAR(100) NOT NULL DEFAULT '',
   on_campus BOOLEAN DEFAULT TRUE,
   residence_type ENUM('male','female','offcamp') DEFAULT 'offcamp',
   available_rooms INT DEFAULT 0,
-  restrictions VARCHAR(200)
+  restrictions VARCHAR(200),
+  UNIQUE KEY uq_residence_block (residence_name, block)
 );
 
 CREATE TABLE students (
   id INT AUTO_INCREMENT PRIMARY KEY,
-  student_number VARCHAR(50),
+  student_number VARCHAR(50) UNIQUE,
   password VARCHAR(255),
   first_name VARCHAR(100),
   last_name VARCHAR(100),
@@ -32,7 +33,8 @@ CREATE TABLE students (
   status VARCHAR(30) DEFAULT 'waitlisted',
   assigned_residence VARCHAR(255),
   room_number VARCHAR(50),
-  created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  FULLTEXT KEY ft_students_search (student_number, first_name, last_name, email)
 );
 
 -- sample residences
@@ -83,8 +85,15 @@ INSERT INTO residences (residence_name, block, on_campus, residence_type, availa
 -- F5 (Female)
 ('F5','', TRUE, 'female', 3, ''),
 
--- Off-campus
-('Thohoyandou Off-Campus','', FALSE, 'offcamp', 10, '');
+-- Off-campus (the OffCampus.html listings)
+('Thohoyandou Off-Campus','', FALSE, 'offcamp', 10, ''),
+('M Sherly Sibasa','', FALSE, 'offcamp', 10, 'none'),
+('Muthathe Residence','', FALSE, 'offcamp', 10, 'none'),
+('Simeka Heights','', FALSE, 'offcamp', 10, 'none'),
+('Maphula Residence','', FALSE, 'offcamp', 10, 'none'),
+('Emlanjeni Residence','', FALSE, 'offcamp', 10, 'none'),
+('Grand Royale','', FALSE, 'offcamp', 10, 'none'),
+('589 Residence','', FALSE, 'offcamp', 10, 'none');
 
 -- sample 11 students with hashed passwords (minimum 4 characters)
 INSERT INTO students (student_number, password, first_name, last_name, email, phone, address, gender, id_number, program, year_of_study, gpa, distance) VALUES
@@ -2,6 +2,7 @@ import mysql.connector
 from werkzeug.security import generate_password_hash
 import os
 from dotenv import load_dotenv
+from intake import current_cycle, partition_clause
 
 load_dotenv()
 
@@ -21,6 +22,13 @@ def init_database():
         cursor.execute(f"USE {os.getenv('DB_NAME', 'univen_accommodation')}")
         
         # Drop tables if they exist (drop child tables before parents)
+        cursor.execute("DROP TABLE IF EXISTS residence_demand")
+        cursor.execute("DROP TABLE IF EXISTS application_rollups_daily")
+        cursor.execute("DROP TABLE IF EXISTS application_rollups_hourly")
+        cursor.execute("DROP TABLE IF EXISTS application_events")
+        cursor.execute("DROP TABLE IF EXISTS idempotency_keys")
+        cursor.execute("DROP TABLE IF EXISTS student_application_limits")
+        cursor.execute("DROP TABLE IF EXISTS applications_archive")
         cursor.execute("DROP TABLE IF EXISTS applications")
         cursor.execute("DROP TABLE IF EXISTS students")
         cursor.execute("DROP TABLE IF EXISTS residences")
@@ -29,12 +37,13 @@ def init_database():
         cursor.execute("""
         CREATE TABLE residences (
             id INT AUTO_INCREMENT PRIMARY KEY,
-            residence_name VARCHAR(200),
-            block VARCHAR(100),
+            residence_name VARCHAR(200) NOT NULL,
+            block VARCHAR(100) NOT NULL DEFAULT '',
             on_campus BOOLEAN DEFAULT TRUE,
             residence_type ENUM('male','female','offcamp') DEFAULT 'offcamp',
             available_rooms INT DEFAULT 0,
-            restrictions VARCHAR(200)
+            restrictions VARCHAR(200),
+            UNIQUE KEY uq_residence_block (residence_name, block)
         )
         """)
         
@@ -42,7 +51,7 @@ def init_database():
         cursor.execute("""
         CREATE TABLE students (
             id INT AUTO_INCREMENT PRIMARY KEY,
-            student_number VARCHAR(50),
+            student_number VARCHAR(50) UNIQUE,
             password VARCHAR(255),
             first_name VARCHAR(100),
             last_name VARCHAR(100),
@@ -58,22 +67,105 @@ def init_database():
             status VARCHAR(30) DEFAULT 'waitlisted',
             assigned_residence VARCHAR(255),
             room_number VARCHAR(50),
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FULLTEXT KEY ft_students_search (student_number, first_name, last_name, email)
         )
         """)
 
-        # Create applications table
-        cursor.execute("""
-        CREATE TABLE applications (
-            id INT AUTO_INCREMENT PRIMARY KEY,
+        # Create applications table, one RANGE partition per intake cycle.
+        # Partitioned InnoDB tables cannot have foreign keys, and every unique key must
+        # include the partitioning column, hence (id, intake_cycle) and no FK constraints.
+        cycle = current_cycle()
+        applications_columns = """
+            id INT AUTO_INCREMENT,
+            intake_cycle SMALLINT UNSIGNED NOT NULL,
             student_id INT NOT NULL,
             residence_id INT NOT NULL,
             status ENUM('Pending','Approved','Rejected','Accepted') DEFAULT 'Pending',
             apply_date DATETIME DEFAULT CURRENT_TIMESTAMP,
             room_number VARCHAR(50) NULL,
-            CONSTRAINT fk_app_student FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
-            CONSTRAINT fk_app_res FOREIGN KEY (residence_id) REFERENCES residences(id) ON DELETE CASCADE,
-            CONSTRAINT uq_student_residence UNIQUE (student_id, residence_id)
+            PRIMARY KEY (id, intake_cycle),
+            UNIQUE KEY uq_student_residence_cycle (student_id, residence_id, intake_cycle),
+            INDEX idx_app_cycle_residence_status (intake_cycle, residence_id, status),
+            INDEX idx_app_cycle_apply_date (intake_cycle, apply_date)
+        """
+        cursor.execute(f"""
+        CREATE TABLE applications ({applications_columns})
+        {partition_clause(cycle - 1, cycle + 1)}
+        """)
+
+        # Closed cycles are moved here in batches by `python intake.py archive`
+        cursor.execute(f"""
+        CREATE TABLE applications_archive ({applications_columns})
+        ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+        {partition_clause(cycle - 1, cycle - 1)}
+        """)
+
+        # Per-student, per-cycle counter row locked FOR UPDATE while applications are inserted
+        cursor.execute("""
+        CREATE TABLE student_application_limits (
+            student_id INT NOT NULL,
+            intake_cycle SMALLINT UNSIGNED NOT NULL,
+            on_campus_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, intake_cycle),
+            CONSTRAINT fk_limit_student FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+        )
+        """)
+
+        # Stored responses for Idempotency-Key replays (expired rows are purged in batches)
+        cursor.execute("""
+        CREATE TABLE idempotency_keys (
+            scope VARCHAR(100) NOT NULL,
+            idem_key VARCHAR(100) NOT NULL,
+            request_fingerprint CHAR(64) NOT NULL,
+            status_code SMALLINT NULL,
+            response_body MEDIUMTEXT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            expires_at DATETIME NOT NULL,
+            PRIMARY KEY (scope, idem_key),
+            INDEX idx_idempotency_expires (expires_at)
+        )
+        """)
+
+        # Append-only history of application status changes
+        cursor.execute("""
+        CREATE TABLE application_events (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            application_id INT NOT NULL,
+            student_id INT NOT NULL,
+            residence_id INT NOT NULL,
+            event_type ENUM('submitted','approved','rejected','accepted','declined') NOT NULL,
+            occurred_at DATETIME NOT NULL,
+            INDEX idx_events_application (application_id),
+            INDEX idx_events_occurred (occurred_at)
+        )
+        """)
+
+        # Per-residence counters maintained from the event log
+        for table, bucket_type in (('application_rollups_hourly', 'DATETIME'), ('application_rollups_daily', 'DATE')):
+            cursor.execute(f"""
+            CREATE TABLE {table} (
+                residence_id INT NOT NULL,
+                bucket {bucket_type} NOT NULL,
+                submitted INT NOT NULL DEFAULT 0,
+                approved INT NOT NULL DEFAULT 0,
+                rejected INT NOT NULL DEFAULT 0,
+                accepted INT NOT NULL DEFAULT 0,
+                declined INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (residence_id, bucket),
+                INDEX idx_{table}_bucket (bucket)
+            )
+            """)
+
+        # Applicant counters per cycle and residence by choice rank, gender, year and distance/GPA bucket
+        cursor.execute("""
+        CREATE TABLE residence_demand (
+            intake_cycle SMALLINT UNSIGNED NOT NULL,
+            residence_id INT NOT NULL,
+            dimension VARCHAR(20) NOT NULL,
+            dim_value VARCHAR(20) NOT NULL,
+            applicants INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (intake_cycle, residence_id, dimension, dim_value)
         )
         """)
         
@@ -125,8 +217,15 @@ def init_database():
             # F5 (Female)
             ('F5','', True, 'female', 3, ''),
             
-            # Off-campus
-            ('Thohoyandou Off-Campus','', False, 'offcamp', 10, '')
+            # Off-campus (the OffCampus.html listings)
+            ('Thohoyandou Off-Campus','', False, 'offcamp', 10, ''),
+            ('M Sherly Sibasa','', False, 'offcamp', 10, 'none'),
+            ('Muthathe Residence','', False, 'offcamp', 10, 'none'),
+            ('Simeka Heights','', False, 'offcamp', 10, 'none'),
+            ('Maphula Residence','', False, 'offcamp', 10, 'none'),
+            ('Emlanjeni Residence','', False, 'offcamp', 10, 'none'),
+            ('Grand Royale','', False, 'offcamp', 10, 'none'),
+            ('589 Residence','', False, 'offcamp', 10, 'none')
         ]
         
         for residence in residences:
@@ -166,5 +265,26 @@ def init_database():
             cursor.close()
             connection.close()
 
+def migrate_database() -> bool:
+    """Bring a database created by an older init_db.py up to date in place, without dropping data."""
+    from database import Database
+    db = Database()
+    steps = (
+        ('student_application_limits table', db.migrate_application_limits),
+        ('residence_demand per intake cycle', db.migrate_demand_cycles),
+        ('unique residence (name, block)', db.migrate_unique_residence_blocks),
+    )
+    for label, step in steps:
+        if not step():
+            print(f"❌ Migration stopped at: {label} (see the log for the statement)")
+            return False
+        print(f"✅ {label}")
+    return True
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Create the database from scratch (drops every table) or migrate it in place")
+    parser.add_argument('--migrate', action='store_true', help="migrate an existing database instead of recreating it")
+    if parser.parse_args().migrate:
+        raise SystemExit(0 if migrate_database() else 1)
     init_database()
\ No newline at end of file
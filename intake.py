@@ -0,0 +1,124 @@
+"""
+Intake cycles.
+
+Every application belongs to an intake cycle, the academic year it applies
+for: applications made from CYCLE_START_MONTH onwards are for the next year's
+intake. `applications` is RANGE-partitioned on `intake_cycle` (one partition
+per cycle plus a catch-all `pmax`), and every Database read defaults to the
+current cycle, so hot-path queries prune to a single partition and the
+UNIQUE (student_id, residence_id, intake_cycle) key lets a student apply to
+the same block again in a later year.
+
+Closed cycles are moved in batches into `applications_archive` (InnoDB,
+ROW_FORMAT=COMPRESSED, partitioned the same way) and their now-empty live
+partition is dropped:
+
+    python intake.py status                 # partitions and row counts
+    python intake.py archive [--keep N] [--batch-size N] [--dry-run]
+    python intake.py migrate                # one-off: convert an existing applications table
+
+Set INTAKE_CYCLE to pin the current cycle (e.g. while a late intake is still
+being processed after the rollover month).
+"""
+import os
+from datetime import date, datetime
+
+CYCLE_START_MONTH = int(os.getenv('INTAKE_CYCLE_START_MONTH', '7'))  # July: applications open for next year
+ARCHIVE_BATCH_SIZE = 5000
+KEEP_CYCLES = 1  # closed cycles kept live after the current one (the previous year stays queryable on the hot table)
+
+
+def cycle_for(when: date | datetime) -> int:
+    return when.year + 1 if when.month >= CYCLE_START_MONTH else when.year
+
+
+def current_cycle() -> int:
+    pinned = os.getenv('INTAKE_CYCLE')
+    if pinned:
+        return int(pinned)
+    return cycle_for(date.today())
+
+
+def partition_name(cycle: int) -> str:
+    return f"p{int(cycle)}"
+
+
+def partition_clause(first: int, last: int) -> str:
+    """PARTITION BY RANGE clause with one partition per cycle in first..last plus pmax."""
+    parts = [f"PARTITION {partition_name(c)} VALUES LESS THAN ({c + 1})" for c in range(first, last + 1)]
+    parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    return "PARTITION BY RANGE (intake_cycle) (\n    " + ",\n    ".join(parts) + "\n)"
+
+
+def closed_cycles(partitions: list, current: int, keep: int = KEEP_CYCLES) -> list:
+    """Cycles with a live partition that are old enough to archive, oldest first."""
+    return sorted(p['cycle'] for p in partitions if p['cycle'] is not None and p['cycle'] < current - keep)
+
+
+def archive_closed_cycles(db, keep: int = KEEP_CYCLES, batch_size: int = ARCHIVE_BATCH_SIZE, dry_run: bool = False) -> dict:
+    """
+    Move every closed cycle from `applications` into `applications_archive`,
+    batch_size rows per transaction, then drop its live partition. Safe to
+    interrupt and rerun: each batch is copied and deleted atomically.
+    Returns {cycle: rows moved}.
+    """
+    current = current_cycle()
+    partitions = db.get_application_partitions()
+    if partitions is None:
+        print("❌ Could not read application partitions")
+        return {}
+    # Make sure the next cycle has its own partition before its applications start arriving
+    if not dry_run:
+        db.ensure_cycle_partition(current + 1)
+
+    moved = {}
+    for cycle in closed_cycles(partitions, current, keep):
+        if dry_run:
+            rows = next(p['rows'] for p in partitions if p['cycle'] == cycle)
+            print(f"🗄️ Would archive cycle {cycle} (~{rows} rows)")
+            continue
+        moved[cycle] = 0
+        db.ensure_cycle_partition(cycle, 'applications_archive')
+        while True:
+            count = db.archive_application_batch(cycle, batch_size)
+            if count is None:
+                print(f"❌ Archival of cycle {cycle} stopped after {moved[cycle]} rows")
+                return moved
+            moved[cycle] += count
+            if count < batch_size:
+                break
+        if db.drop_cycle_partition(cycle):
+            print(f"🗄️ Archived cycle {cycle}: {moved[cycle]} rows moved, partition {partition_name(cycle)} dropped")
+    # residence_demand is keyed on the cycle, so an archived cycle's counters stay behind as its history
+    return moved
+
+
+def _main(argv: list):
+    import argparse
+    import logs
+    from database import Database
+
+    logs.setup_console()
+    parser = argparse.ArgumentParser(description="Intake cycle partitions and archival")
+    parser.add_argument('command', choices=('status', 'archive', 'migrate'))
+    parser.add_argument('--keep', type=int, default=KEEP_CYCLES, help="closed cycles to keep live")
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args(argv)
+
+    db = Database()
+    if args.command == 'migrate':
+        db.migrate_applications_to_cycles()
+    elif args.command == 'archive':
+        archive_closed_cycles(db, args.keep, args.batch_size, args.dry_run)
+    print(f"Current intake cycle: {current_cycle()}")
+    for table, rows in (('applications', db.get_application_partitions()),
+                        ('applications_archive', db.get_application_partitions('applications_archive'))):
+        for p in rows or []:
+            bound = p['cycle'] + 1 if p['cycle'] is not None else 'MAXVALUE'
+            print(f"   {table:<22} {p['name']:<8} < {bound!s:<9} ~{p['rows']} rows")
+
+
+if __name__ == '__main__':
+    import sys
+    _main(sys.argv[1:])
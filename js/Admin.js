@@ -3,6 +3,18 @@ const API_BASE = '/api';
 let studentsCache = [];
 let residencesCache = [];
 let applicationsCache = [];
+// Lists are fetched a page at a time; next*Before is the cursor for "Load more" (null on the last page)
+const PAGE_SIZE = 50;
+let applicationsNextBefore = null;
+let applicationCounts = {};
+let studentsNextBefore = null;
+let studentFacets = { total: 0, programs: [] };
+
+// Idempotency keys per pending action, kept only while a retry could still replay it
+const actionKeys = {};
+function actionKey(action){
+  return actionKeys[action] = actionKeys[action] || crypto.randomUUID();
+}
 
 // Notification system
 function showNotification(message, type = 'info') {
@@ -59,18 +71,58 @@ async function loadAll(){
   }
 }
 
-async function loadApplications(){
-  const res = await fetch(`${API_BASE}/applications`, { credentials: 'same-origin' });
-  if(!res.ok){ applicationsCache = []; return; }
-  applicationsCache = await res.json();
+// Ids of the students matching a search box, from the server index (null when the box is empty)
+async function searchStudentIds(term){
+  if(!term) return null;
+  const res = await fetch(`${API_BASE}/search?q=${encodeURIComponent(term)}&limit=100`, { credentials: 'same-origin' });
+  if(!res.ok) return [];
+  const { results } = await res.json();
+  return results.map(r=>r.id);
+}
+
+async function loadApplications(more = false){
+  const filterEl = document.getElementById('status-filter');
+  const searchEl = document.getElementById('search-term');
+  const params = new URLSearchParams({ limit: PAGE_SIZE });
+  if(filterEl && filterEl.value !== 'all') params.set('status', filterEl.value);
+  const ids = await searchStudentIds(searchEl ? searchEl.value.trim() : '');
+  if(ids) params.set('student_ids', ids.join(','));
+  if(more && applicationsNextBefore !== null) params.set('before', applicationsNextBefore);
+
+  const res = await fetch(`${API_BASE}/applications/page?${params}`, { credentials: 'same-origin' });
+  if(!res.ok){ if(!more) applicationsCache = []; return; }
+  const page = await res.json();
+  applicationsCache = more ? applicationsCache.concat(page.applications) : page.applications;
+  applicationsNextBefore = page.next_before;
+  if(page.counts) applicationCounts = page.counts;
   renderApplicationsTable(applicationsCache);
 }
-async function loadStudents(){
-  const res = await fetch(`${API_BASE}/students`, { credentials: 'same-origin' });
-  if(!res.ok){ studentsCache = []; return; }
-  studentsCache = await res.json();
-  renderStudentsTable(studentsCache);
-  renderSummaryStats(studentsCache);
+async function loadStudents(more = false){
+  const prog = document.getElementById('student-program').value;
+  const q = document.getElementById('student-search').value.trim();
+  const params = new URLSearchParams({ limit: PAGE_SIZE });
+  if(prog !== 'all') params.set('program', prog);
+  const ids = await searchStudentIds(q);
+  if(ids) params.set('student_ids', ids.join(','));
+  if(more && studentsNextBefore !== null) params.set('before', studentsNextBefore);
+
+  const res = await fetch(`${API_BASE}/students/page?${params}`, { credentials: 'same-origin' });
+  if(!res.ok){ if(!more) studentsCache = []; return; }
+  const page = await res.json();
+  let rows = page.students;
+  if(ids){
+    // Keep the search ranking rather than the id order of the page
+    const rank = new Map(ids.map((id, i)=>[id, i]));
+    rows = rows.slice().sort((a, b)=>rank.get(a.id) - rank.get(b.id));
+  }
+  studentsCache = more ? studentsCache.concat(rows) : rows;
+  studentsNextBefore = page.next_before;
+  if(page.facets){
+    studentFacets = page.facets;
+    renderSummaryStats();
+    populatePrograms();
+  }
+  filterStudentRows();
 }
 // Note: residences/students panes kept but not needed for applications table
 
@@ -80,10 +132,10 @@ async function loadResidenceStats(){
   return await res.json();
 }
 function renderStats(){
-  const total = applicationsCache.length;
-  const approved = applicationsCache.filter(a=>a.status==='Approved').length;
-  const rejected = applicationsCache.filter(a=>a.status==='Rejected').length;
-  const pending = applicationsCache.filter(a=>a.status==='Pending').length;
+  const total = Object.values(applicationCounts).reduce((sum, n)=>sum + n, 0);
+  const approved = applicationCounts.Approved || 0;
+  const rejected = applicationCounts.Rejected || 0;
+  const pending = applicationCounts.Pending || 0;
 
   const cards = document.getElementById('stats-cards');
   cards.innerHTML = `
@@ -97,17 +149,9 @@ function renderStats(){
 function renderApplicationsTable(list){
   const tbody = document.getElementById('applications-table');
   if(!tbody) return;
-  const filterEl = document.getElementById('status-filter');
-  const searchEl = document.getElementById('search-term');
-  const filter = filterEl ? filterEl.value : 'all';
-  const search = searchEl ? searchEl.value.trim().toLowerCase() : '';
-
-  let data = list.slice();
-  if(filter && filter!=='all') data = data.filter(a => (a.status||'').toLowerCase() === filter.toLowerCase());
-  if(search) data = data.filter(a => (`${a.first_name||''} ${a.last_name||''} ${a.student_number||''} ${a.residence_name||''}`).toLowerCase().includes(search));
-
+  // Status and search filters are applied by the server; this renders the pages loaded so far
   tbody.innerHTML = '';
-  data.forEach(a => {
+  list.forEach(a => {
     tbody.insertAdjacentHTML('beforeend', `
       <tr>
         <td>${a.id}</td>
@@ -123,6 +167,9 @@ function renderApplicationsTable(list){
       </tr>
     `);
   });
+  if(applicationsNextBefore !== null){
+    tbody.insertAdjacentHTML('beforeend', `<tr><td colspan="6"><button class="btn" onclick="loadApplications(true)">Load more</button></td></tr>`);
+  }
 }
 
 function renderResidences(){
@@ -160,12 +207,16 @@ function renderStudentsTable(list){
       </tr>
     `);
   });
-  document.getElementById('students-count').innerText = list.length;
+  if(studentsNextBefore !== null){
+    tbody.insertAdjacentHTML('beforeend', `<tr><td colspan="5"><button class="btn" onclick="loadStudents(true)">Load more</button></td></tr>`);
+  }
+  const filtered = document.getElementById('student-search').value.trim() || document.getElementById('student-program').value !== 'all';
+  document.getElementById('students-count').innerText = filtered ? list.length : studentFacets.total;
 }
 
-function renderSummaryStats(list){
+function renderSummaryStats(){
   const container = document.getElementById('summary-stats');
-  const total = list.length;
+  const total = studentFacets.total;
   container.innerHTML = `
     <div class="card p-4"><div><div class="text-sm">Total Students</div><div class="text-xl">${total}</div></div></div>
   `;
@@ -173,21 +224,26 @@ function renderSummaryStats(list){
 
 function populatePrograms(){
   const select = document.getElementById('student-program');
-  const progs = Array.from(new Set(studentsCache.map(s=>s.program).filter(Boolean))).sort();
+  const current = select.value;
   select.innerHTML = '<option value="all">All Programs</option>';
-  progs.forEach(p => select.insertAdjacentHTML('beforeend', `<option value="${p}">${p}</option>`));
+  studentFacets.programs.forEach(p => select.insertAdjacentHTML('beforeend', `<option value="${p}">${p}</option>`));
+  select.value = studentFacets.programs.includes(current) ? current : 'all';
 }
 
-function filterApplications(){ renderApplicationsTable(applicationsCache); }
+// Filters reload the first page from the server; debounce keystrokes
+let applicationSearchTimer = null;
+function filterApplications(){
+  clearTimeout(applicationSearchTimer);
+  applicationSearchTimer = setTimeout(()=>loadApplications().catch(()=>{}), 200);
+}
+let studentSearchTimer = null;
 function filterStudents(){
-  const q = document.getElementById('student-search').value.toLowerCase();
+  clearTimeout(studentSearchTimer);
+  studentSearchTimer = setTimeout(()=>loadStudents().catch(()=>{}), 200);
+}
+function filterStudentRows(){
   const status = document.getElementById('student-status').value;
-  const prog = document.getElementById('student-program').value;
-  let data = studentsCache.slice();
-  if(status!=='all') data = data.filter(student=>student.status===status);
-  if(prog!=='all') data = data.filter(student=>student.program===prog);
-  if(q) data = data.filter(student=>(`${student.first_name} ${student.last_name} ${student.student_number}`).toLowerCase().includes(q));
-  renderStudentsTable(data);
+  renderStudentsTable(status === 'all' ? studentsCache : studentsCache.filter(student=>student.status===status));
 }
 
 async function approveApplication(id){
@@ -198,7 +254,13 @@ async function approveApplication(id){
     button.textContent = 'Approving...';
     button.disabled = true;
     
-    const res = await fetch(`${API_BASE}/applications/${id}/approve`, { method: 'POST', credentials: 'same-origin' });
+    const res = await fetch(`${API_BASE}/applications/${id}/approve`, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Idempotency-Key': actionKey(`approve-${id}`) }
+    });
+    // Any answer below 500 is final for this key; only network errors and 5xx reuse it
+    if(res.status < 500) delete actionKeys[`approve-${id}`];
     
     if(!res.ok){ 
       alert('Approve failed'); 
@@ -206,7 +268,7 @@ async function approveApplication(id){
       button.disabled = false;
       return; 
     }
-    
+
     // Show success message
     showNotification('Application approved successfully!', 'success');
     
@@ -233,7 +295,12 @@ async function rejectApplication(id){
     button.textContent = 'Rejecting...';
     button.disabled = true;
     
-    const res = await fetch(`${API_BASE}/applications/${id}/reject`, { method: 'POST', credentials: 'same-origin' });
+    const res = await fetch(`${API_BASE}/applications/${id}/reject`, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Idempotency-Key': actionKey(`reject-${id}`) }
+    });
+    if(res.status < 500) delete actionKeys[`reject-${id}`];
     
     if(!res.ok){ 
       alert('Reject failed'); 
@@ -241,7 +308,7 @@ async function rejectApplication(id){
       button.disabled = false;
       return; 
     }
-    
+
     // Show success message
     showNotification('Application rejected successfully!', 'success');
     
@@ -264,9 +331,13 @@ function downloadAcceptedPdf(residenceId){
   window.open(`${API_BASE}/offcampus/${encodeURIComponent(residenceId)}/accepted/pdf`, '_blank');
 }
 
-function openModal(id){
-  const s = studentsCache.find(x=>x.id===id);
-  if(!s) return;
+async function openModal(id){
+  const res = await fetch(`${API_BASE}/students/${id}/summary`, { credentials: 'same-origin' });
+  if(!res.ok) return;
+  const { student: s, applications } = await res.json();
+  const history = applications.length
+    ? `<ul>${applications.map(a=>`<li>${a.residence_name}${a.block ? ` - ${a.block}` : ''}: ${a.status}${a.room_number ? ` (room ${a.room_number})` : ''}</li>`).join('')}</ul>`
+    : '<p>No applications yet.</p>';
   const mb = document.getElementById('modal-body');
   mb.innerHTML = `<h2>${s.first_name} ${s.last_name}</h2>
     <p>Email: ${s.email}</p>
@@ -275,7 +346,9 @@ function openModal(id){
     <p>Distance: ${s.distance}</p>
     <p>GPA: ${s.gpa}</p>
     <p>Status: ${s.status}</p>
-    <p>Residence: ${s.assigned_residence || '-'}</p>`;
+    <p>Residence: ${s.assigned_residence || '-'}</p>
+    <h3>Applications</h3>
+    ${history}`;
   document.getElementById('student-modal').classList.add('active');
 }
 function closeModal(){ document.getElementById('student-modal').classList.remove('active'); }
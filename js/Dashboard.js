@@ -295,6 +295,9 @@ function refreshApplications() {
 }
 
 // Function to update the applications table with fresh data
+// Idempotency keys per pending accept/reject, kept only while a retry could still replay it
+const actionKeys = {};
+
 function updateApplicationsTable(applications) {
     const container = document.getElementById('application-content');
     if (!container) return;
@@ -315,7 +318,11 @@ function updateApplicationsTable(applications) {
     container.querySelectorAll('[data-app-accept]').forEach(btn => {
         btn.addEventListener('click', async (e) => {
             const id = e.currentTarget.getAttribute('data-app-accept');
-            const res = await fetch(`/api/applications/${id}/accept`, { method: 'POST' });
+            const key = `accept-${id}`;
+            actionKeys[key] = actionKeys[key] || crypto.randomUUID();
+            const res = await fetch(`/api/applications/${id}/accept`, { method: 'POST', headers: { 'Idempotency-Key': actionKeys[key] } });
+            // Any answer below 500 is final for this key; only network errors and 5xx reuse it
+            if (res.status < 500) delete actionKeys[key];
             if (res.ok) { 
                 refreshApplications(); // Refresh data after action
             } else { 
@@ -327,7 +334,10 @@ function updateApplicationsTable(applications) {
     container.querySelectorAll('[data-app-reject]').forEach(btn => {
         btn.addEventListener('click', async (e) => {
             const id = e.currentTarget.getAttribute('data-app-reject');
-            const res = await fetch(`/api/applications/${id}/reject_offer`, { method: 'POST' });
+            const key = `reject_offer-${id}`;
+            actionKeys[key] = actionKeys[key] || crypto.randomUUID();
+            const res = await fetch(`/api/applications/${id}/reject_offer`, { method: 'POST', headers: { 'Idempotency-Key': actionKeys[key] } });
+            if (res.status < 500) delete actionKeys[key];
             if (res.ok) { 
                 refreshApplications(); // Refresh data after action
             } else { 
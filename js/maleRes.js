@@ -198,6 +198,9 @@ function updateResidenceCards() {
     });
 }
 
+// Idempotency key for the submission in flight (reused only after a network error or 5xx)
+let submissionKey = null;
+
 // Submit applications to backend
 function submitApplications() {
     if (applications.length !== MAX_SELECTIONS) {
@@ -208,17 +211,23 @@ function submitApplications() {
     // Prepare data for backend
     const applicationData = {}; // unused now
 
+    // One key per submission so double-clicks and retries are applied once
+    submissionKey = submissionKey || crypto.randomUUID();
+
     // Send to backend
     fetch('/api/applications', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
+            'Idempotency-Key': submissionKey,
         },
         body: JSON.stringify({
             residences: applications.map(app => ({ residence_name: app.residence, block: app.block || '' }))
         })
     })
     .then(async response => {
+        // Any answer below 500 is final for this key; the next submit is a new request
+        if (response.status < 500) submissionKey = null;
         const text = await response.text();
         let data;
         try { data = JSON.parse(text); } catch { data = { raw: text }; }
@@ -5,6 +5,7 @@ const MAX_SELECTIONS = 2;
 const MAX_ON_CAMPUS = 2;
 const MAX_OFF_CAMPUS = 2;
 let isSubmitting = false; // Lock to prevent multiple submissions
+let submissionKey = null; // Idempotency key for the submission in flight (reused only after a network error or 5xx)
 
 // Prevent back button navigation after logout
 window.addEventListener('pageshow', function(event) {
@@ -285,14 +286,20 @@ async function submitApplications() {
       block: app.block || ''
     }));
 
+    // One key per submission so double-clicks and retries are applied once
+    submissionKey = submissionKey || crypto.randomUUID();
+
     // Send to backend
     const response = await fetch('/api/applications', {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        'Idempotency-Key': submissionKey,
       },
       body: JSON.stringify({ residences: applicationData })
     });
+    // Any answer below 500 is final for this key; the next submit is a new request
+    if (response.status < 500) submissionKey = null;
 
     const text = await response.text();
     let result; try { result = JSON.parse(text); } catch { result = { raw: text }; }
@@ -0,0 +1,320 @@
+"""
+Structured, non-blocking logging.
+
+`setup()` routes the root logger through a bounded in-memory queue. Calling
+threads only merge the message arguments and enqueue the record; one
+background writer thread formats records as JSON lines (orjson when
+installed) and writes them to stdout in batches. When the queue is full the
+record is dropped and counted instead of blocking the request, and the writer
+reports how many were lost once it catches up.
+
+Extra fields passed with `extra={...}` become JSON keys. While a Flask
+request is being handled (`install(app)`), every record also carries the
+request id (the caller's X-Request-ID, or a new one echoed back in that
+header), method, route and whatever the app `bind()`s, such as the student
+id. Each request ends with one `request` record holding its status,
+duration and time spent in the database (`add_timing`).
+
+High-volume success records are sampled: a record logged with
+`extra={'sample': rate}` is kept with that probability, decided in the
+calling thread so discarded records never reach the queue. Successful,
+fast requests use SUCCESS_SAMPLE_RATE; errors, warnings and slow requests
+are always kept.
+
+Environment: LOG_LEVEL (INFO), LOG_FORMAT (json, or text for a readable
+console), LOG_QUEUE_SIZE (10000 records), LOG_SAMPLE_RATE (0.1),
+LOG_SLOW_MS (500).
+
+Run `python logs.py` to compare print() with queued logging under thread
+contention.
+"""
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    import json
+    orjson = None
+    HAVE_ORJSON = False
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+SUCCESS_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.1'))
+SLOW_REQUEST_MS = float(os.getenv('LOG_SLOW_MS', '500'))
+WRITE_BATCH = 512  # records formatted and written per stream write
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+# Attributes every LogRecord has; anything else on a record came from `extra` or the request context
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'sample'}
+
+_context = contextvars.ContextVar('log_context', default=None)
+_handler = None
+
+
+# ---------------- REQUEST CONTEXT ----------------
+def bind(**fields):
+    """Attach fields to every record logged for the rest of the current request."""
+    context = _context.get()
+    if context is None:
+        _context.set(dict(fields))
+    else:
+        context.update(fields)
+
+
+def add_timing(name: str, seconds: float):
+    """Add to the current request's `<name>_ms` total and `<name>_calls` count (no-op outside a request)."""
+    context = _context.get()
+    if context is not None:
+        context[f'{name}_ms'] = context.get(f'{name}_ms', 0.0) + seconds * 1000
+        context[f'{name}_calls'] = context.get(f'{name}_calls', 0) + 1
+
+
+class _ContextFilter(logging.Filter):
+    """Runs in the calling thread: sampling first, then the request fields."""
+
+    def filter(self, record):
+        rate = record.__dict__.get('sample')
+        if rate is not None and rate < 1.0 and random.random() >= rate:
+            return False
+        context = _context.get()
+        if context:
+            for key, value in context.items():
+                record.__dict__.setdefault(key, value)
+        return True
+
+
+# ---------------- FORMATTERS ----------------
+def _extras(record) -> dict:
+    return {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRIBUTES}
+
+
+def _timestamp(record) -> str:
+    return datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds')
+
+
+def _exception(formatter: logging.Formatter, record) -> str | None:
+    if record.exc_info and not record.exc_text:
+        record.exc_text = formatter.formatException(record.exc_info)  # records that skipped the queue
+    return record.exc_text
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record) -> str:
+        entry = {'ts': _timestamp(record), 'level': record.levelname, 'logger': record.name,
+                 'msg': record.getMessage()}
+        entry.update(_extras(record))
+        if _exception(self, record):
+            entry['exc'] = record.exc_text
+        if HAVE_ORJSON:
+            return orjson.dumps(entry, default=str).decode()
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record) -> str:
+        fields = ' '.join(f'{k}={v}' for k, v in _extras(record).items())
+        line = f"{_timestamp(record)} {record.levelname:<7} {record.name}: {record.getMessage()} {fields}".rstrip()
+        if _exception(self, record):
+            line += '\n' + record.exc_text
+        return line
+
+
+# ---------------- QUEUE AND WRITER ----------------
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler over a bounded queue that drops (and counts) records instead of blocking."""
+
+    def __init__(self, maxsize: int = QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only the cheap part happens in the caller; formatting is left to the writer thread.
+        # Arguments are merged now so the record holds no references to mutable request objects.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Writer(threading.Thread):
+    def __init__(self, handler: DroppingQueueHandler, stream, formatter: logging.Formatter):
+        super().__init__(name='log-writer', daemon=True)
+        self.handler = handler
+        self.stream = stream
+        self.formatter = formatter
+        self.reported = 0
+
+    def run(self):
+        records = self.handler.queue
+        while True:
+            record = records.get()
+            batch = [record]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            lines = [self.formatter.format(r) for r in batch if r is not None]
+            dropped = self.handler.dropped
+            if dropped != self.reported:
+                notice = logging.LogRecord('logs', logging.WARNING, __file__, 0,
+                                           'log records dropped: queue full', None, None)
+                notice.dropped = dropped - self.reported
+                lines.append(self.formatter.format(notice))
+                self.reported = dropped
+            try:
+                if lines:
+                    self.stream.write('\n'.join(lines) + '\n')
+                    self.stream.flush()
+            except (OSError, ValueError):
+                pass  # stdout closed or broken pipe: nothing useful left to do with the records
+            if stop:
+                return
+
+    def stop(self, timeout: float = 2.0):
+        try:
+            self.handler.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.join(timeout)
+
+
+def setup(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None,
+          queue_size: int = QUEUE_SIZE) -> DroppingQueueHandler:
+    """Route the root logger through the queue and start the writer. Safe to call more than once."""
+    global _handler
+    if _handler is not None:
+        return _handler
+    handler = DroppingQueueHandler(queue_size)
+    handler.addFilter(_ContextFilter())
+    writer = _Writer(handler, stream or sys.stdout, JSONFormatter() if fmt == 'json' else TextFormatter())
+    writer.start()
+    handler.writer = writer
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+    atexit.register(writer.stop)  # flush what is still queued on shutdown
+    _handler = handler
+    return handler
+
+
+def setup_console(level: str = LOG_LEVEL):
+    """Synchronous text logging for command-line tools, so records stay in order with their print() output."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(TextFormatter())
+    logging.basicConfig(level=level, handlers=[handler])
+
+
+# ---------------- FLASK ----------------
+def install(app):
+    """Bind request id, method and route to each request's records and log one `request` record per request."""
+    from flask import g, request
+
+    log = logging.getLogger('request')
+
+    @app.before_request
+    def _bind_request():
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if not _VALID_REQUEST_ID.match(request_id):
+            request_id = os.urandom(8).hex()
+        g.log_started = time.perf_counter()
+        rule = request.url_rule
+        _context.set({'request_id': request_id, 'method': request.method,
+                      'route': rule.rule if rule is not None else request.path})
+
+    @app.after_request
+    def _log_request(response):
+        context = _context.get()
+        if context is None:
+            return response
+        response.headers[REQUEST_ID_HEADER] = context['request_id']
+        duration = (time.perf_counter() - g.get('log_started', time.perf_counter())) * 1000
+        fields = {'status': response.status_code, 'duration_ms': round(duration, 2)}
+        fields.update({k: round(v, 2) for k, v in context.items() if k.endswith('_ms')})
+        if response.status_code < 400 and duration < SLOW_REQUEST_MS:
+            fields['sample'] = SUCCESS_SAMPLE_RATE
+        level = logging.WARNING if response.status_code >= 500 or duration >= SLOW_REQUEST_MS else logging.INFO
+        log.log(level, 'request', extra=fields)
+        return response
+
+    @app.teardown_request
+    def _clear_request(exc=None):
+        _context.set(None)
+
+
+def _benchmark(threads: int = 8, per_thread: int = 20000):
+    import io
+
+    class SlowStream(io.StringIO):
+        """A terminal or log collector pipe: every write costs a little wall time."""
+        def write(self, s):
+            time.sleep(0.00002)
+            return super().write(s)
+
+    def run(emit) -> float:
+        def work(n):
+            for i in range(per_thread):
+                emit(n, i)
+        workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return (time.perf_counter() - started) / (threads * per_thread) * 1e6
+
+    stream = SlowStream()
+    lock = threading.Lock()  # print() to a shared stdout serialises on the stream the same way
+
+    def printed(n, i):
+        with lock:
+            print(f"/api/applications created: student={n} ids=[{i}]", file=stream)
+
+    handler = setup(stream=SlowStream(), queue_size=QUEUE_SIZE)
+    log = logging.getLogger('benchmark')
+
+    def logged(n, i):
+        log.info('application created', extra={'student_id': n, 'application_ids': [i]})
+
+    def sampled(n, i):
+        log.info('application created', extra={'student_id': n, 'application_ids': [i], 'sample': SUCCESS_SAMPLE_RATE})
+
+    def queued(emit) -> str:
+        while not handler.queue.empty():
+            time.sleep(0.01)  # start each run with the writer caught up
+        dropped = handler.dropped
+        cost = run(emit)
+        return f"{cost:6.2f} µs/record  ({handler.dropped - dropped} dropped while the writer caught up)"
+
+    print(f"{threads} threads x {per_thread} records, encoder: {'orjson' if HAVE_ORJSON else 'stdlib json'}")
+    print(f"   print() to a shared stream    {run(printed):6.2f} µs/record in the calling thread")
+    print(f"   queued JSON logging           {queued(logged)}")
+    print(f"   queued, sampled at {SUCCESS_SAMPLE_RATE:<4}       {queued(sampled)}")
+    handler.writer.stop()
+
+
+if __name__ == '__main__':
+    _benchmark()
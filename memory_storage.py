@@ -0,0 +1,315 @@
+"""
+The in-memory storage backend (DB_BACKEND=memory), see storage.py.
+"""
+import heapq
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash
+
+from intake import current_cycle
+from rowset import RowSet
+from storage import Storage
+
+
+class MemoryStorage(Storage):
+    """
+    Tables are dicts keyed by id, with hash indexes for every lookup the app makes.
+    One lock guards all of it; rows are copied on the way out so callers cannot
+    change stored state.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._students = {}            # id -> row
+        self._student_numbers = {}     # student_number -> id
+        self._residences = {}          # id -> row
+        self._residence_keys = {}      # (name.lower(), block.lower()) -> id
+        self._residence_names = defaultdict(list)  # name.lower() -> ids, in insert order
+        self._applications = {}        # id -> row
+        self._cycle_applications = defaultdict(dict)   # cycle -> {id: row}
+        self._student_applications = defaultdict(list)  # (student_id, cycle) -> ids
+        self._residence_applications = defaultdict(set)  # (residence_id, cycle) -> ids
+        self._application_keys = set()  # (student_id, residence_id, cycle)
+        self._next_ids = Counter()
+
+    def _next_id(self, table: str) -> int:
+        self._next_ids[table] += 1
+        return self._next_ids[table]
+
+    # ---------------- STUDENTS ----------------
+    def get_student_by_number(self, student_number):
+        with self._lock:
+            student_id = self._student_numbers.get(str(student_number))
+            return dict(self._students[student_id]) if student_id is not None else None
+
+    def get_student_by_id(self, student_id):
+        with self._lock:
+            row = self._students.get(student_id)
+            return dict(row) if row is not None else None
+
+    def get_all_students(self) -> RowSet:
+        columns = self.STUDENT_COLUMNS
+        with self._lock:
+            return RowSet(columns, [tuple(row[c] for c in columns) for row in self._students.values()])
+
+    def get_students_page(self, limit: int, before_id: int | None = None, program: str | None = None,
+                          student_ids: list | None = None) -> RowSet:
+        columns = self.SUMMARY_PROFILE_FIELDS
+        with self._lock:
+            ids = self._students if student_ids is None else [i for i in student_ids if i in self._students]
+            ids = heapq.nlargest(limit, (i for i in ids if (before_id is None or i < before_id) and
+                                         (program is None or self._students[i]['program'] == program)))
+            return RowSet(columns, [tuple(self._students[i][c] for c in columns) for i in ids])
+
+    def get_student_facets(self) -> dict:
+        with self._lock:
+            programs = {row['program'] for row in self._students.values() if row['program']}
+            return {'total': len(self._students), 'programs': sorted(programs)}
+
+    def bulk_upsert_students(self, rows: list) -> int | None:
+        columns = self.STUDENT_IMPORT_COLUMNS
+        affected = 0
+        with self._lock:
+            for values in rows:
+                incoming = dict(zip(columns, values))
+                number = str(incoming['student_number'])
+                student_id = self._student_numbers.get(number)
+                if student_id is None:
+                    student_id = self._next_id('students')
+                    row = dict.fromkeys(self.STUDENT_COLUMNS)
+                    row.update(incoming, id=student_id, student_number=number, status='waitlisted',
+                               created_at=datetime.now().replace(microsecond=0))
+                    row['gender'] = row['gender'] or 'other'
+                    self._students[student_id] = row
+                    self._student_numbers[number] = student_id
+                    affected += 1
+                else:
+                    row = self._students[student_id]
+                    row.update({k: v for k, v in incoming.items() if k not in ('student_number', 'password')})
+                    affected += 2
+        return affected
+
+    def update_student_password(self, student_id, plain_password) -> bool:
+        hashed = generate_password_hash(plain_password)
+        with self._lock:
+            row = self._students.get(student_id)
+            if row is not None:
+                row['password'] = hashed
+        return True
+
+    def get_student_summary(self, student_id: int):
+        with self._lock:
+            student = self._students.get(student_id)
+            if student is None:
+                return None
+            applications = []
+            for app_id in self._student_applications.get((student_id, current_cycle()), ()):
+                app = self._applications[app_id]
+                res = self._residences[app['residence_id']]
+                applications.append({
+                    'id': app['id'], 'residence_id': res['id'], 'residence_name': res['residence_name'],
+                    'block': res['block'], 'on_campus': res['on_campus'], 'residence_type': res['residence_type'],
+                    'status': app['status'], 'applied_date': app['apply_date'], 'room_number': app['room_number']
+                })
+            applications.sort(key=lambda a: a['applied_date'], reverse=True)
+            return {'student': {col: student[col] for col in self.SUMMARY_PROFILE_FIELDS}, 'applications': applications}
+
+    # ---------------- RESIDENCES ----------------
+    def get_residences(self, on_campus: bool | None = None, residence_type: str | None = None) -> RowSet:
+        columns = self.RESIDENCE_COLUMNS
+        with self._lock:
+            rows = [r for r in self._residences.values()
+                    if (on_campus is None or bool(r['on_campus']) == bool(on_campus))
+                    and (not residence_type or r['residence_type'] == residence_type)]
+        rows.sort(key=lambda r: (r['residence_name'].lower(), r['block'].lower()))
+        return RowSet(columns, [tuple(r[c] for c in columns) for r in rows])
+
+    def get_residence_by_id(self, residence_id: int):
+        with self._lock:
+            row = self._residences.get(residence_id)
+            return dict(row) if row is not None else None
+
+    def _residence_by_key(self, residence_name: str, block: str | None):
+        name = residence_name.lower()
+        with self._lock:
+            if block is None:
+                ids = self._residence_names.get(name)
+                residence_id = ids[0] if ids else None
+            else:
+                residence_id = self._residence_keys.get((name, block.lower()))
+            return dict(self._residences[residence_id]) if residence_id is not None else None
+
+    def bulk_upsert_residences(self, residences: list, update_existing: bool = False) -> list | None:
+        ids = []
+        with self._lock:
+            for row in self._parse_residences(residences):
+                if row is None:
+                    ids.append(None)
+                    continue
+                name, block, on_campus, residence_type, available_rooms, restrictions = row
+                key = (name.lower(), block.lower())
+                residence_id = self._residence_keys.get(key)
+                if residence_id is None:
+                    residence_id = self._next_id('residences')
+                    self._residences[residence_id] = {
+                        'id': residence_id, 'residence_name': name, 'block': block, 'on_campus': int(on_campus),
+                        'residence_type': residence_type, 'available_rooms': available_rooms, 'restrictions': restrictions
+                    }
+                    self._residence_keys[key] = residence_id
+                    self._residence_names[key[0]].append(residence_id)
+                elif update_existing:
+                    self._residences[residence_id].update(on_campus=int(on_campus), residence_type=residence_type,
+                                                          available_rooms=available_rooms, restrictions=restrictions)
+                ids.append(residence_id)
+        return ids
+
+    # ---------------- APPLICATIONS ----------------
+    def count_accepted_for_residence(self, residence_id: int, intake_cycle: int | None = None) -> int:
+        cycle = intake_cycle or current_cycle()
+        with self._lock:
+            return sum(1 for app_id in self._residence_applications.get((residence_id, cycle), ())
+                       if self._applications[app_id]['status'] == 'Accepted')
+
+    def get_student_applications(self, student_id, intake_cycle: int | None = None):
+        cycle = intake_cycle or current_cycle()
+        with self._lock:
+            out = []
+            for app_id in self._student_applications.get((student_id, cycle), ()):
+                app = self._applications[app_id]
+                res = self._residences[app['residence_id']]
+                out.append({'id': app['id'], 'residence_name': res['residence_name'], 'block': res['block'],
+                            'on_campus': res['on_campus'], 'status': app['status'],
+                            'applied_date': app['apply_date'], 'room_number': app['room_number']})
+        out.sort(key=lambda a: a['applied_date'], reverse=True)
+        return out
+
+    def get_all_applications(self, intake_cycle: int | None = None) -> RowSet:
+        cycle = intake_cycle or current_cycle()
+        with self._lock:
+            rows = []
+            for app in self._cycle_applications.get(cycle, {}).values():
+                s = self._students.get(app['student_id'])
+                r = self._residences.get(app['residence_id'])
+                if s is None or r is None:
+                    continue
+                rows.append((app['id'], cycle, app['status'], app['apply_date'], app['room_number'],
+                             s['id'], s['student_number'], s['first_name'], s['last_name'], s['email'],
+                             r['id'], r['residence_name'], r['block'], r['on_campus']))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return RowSet(self.APPLICATION_LIST_COLUMNS, rows)
+
+    def get_applications_page(self, limit: int, before_id: int | None = None, status: str | None = None,
+                              student_ids: list | None = None, intake_cycle: int | None = None) -> RowSet:
+        cycle = intake_cycle or current_cycle()
+        wanted = set(student_ids) if student_ids is not None else None
+        with self._lock:
+            apps = self._cycle_applications.get(cycle, {})
+            ids = heapq.nlargest(limit, (i for i, app in apps.items() if (before_id is None or i < before_id) and
+                                         (status is None or app['status'] == status) and
+                                         (wanted is None or app['student_id'] in wanted)))
+            rows = []
+            for app in (apps[i] for i in ids):
+                s, r = self._students.get(app['student_id']), self._residences.get(app['residence_id'])
+                if s is None or r is None:
+                    continue
+                rows.append((app['id'], cycle, app['status'], app['apply_date'], app['room_number'],
+                             s['id'], s['student_number'], s['first_name'], s['last_name'], s['email'],
+                             r['id'], r['residence_name'], r['block'], r['on_campus']))
+        return RowSet(self.APPLICATION_LIST_COLUMNS, rows)
+
+    def count_applications_by_status(self, intake_cycle: int | None = None) -> dict:
+        with self._lock:
+            return dict(Counter(app['status'] for app in self._cycle_applications.get(intake_cycle or current_cycle(), {}).values()))
+
+    def count_existing_by_type(self, student_id: int, intake_cycle: int | None = None):
+        cycle = intake_cycle or current_cycle()
+        counts = {True: 0, False: 0}
+        with self._lock:
+            for app_id in self._student_applications.get((student_id, cycle), ()):
+                counts[bool(self._residences[self._applications[app_id]['residence_id']]['on_campus'])] += 1
+        return counts
+
+    def _insert_applications(self, student_id: int, cycle: int, residence_ids: list, on_campus: int):
+        with self._lock:
+            existing_on = self.count_existing_by_type(student_id, cycle)[True]
+            if existing_on + on_campus > self.ON_CAMPUS_LIMIT:
+                return False, f"On-campus application limit exceeded (max {self.ON_CAMPUS_LIMIT})", []
+            keys = [(student_id, residence_id, cycle) for residence_id in residence_ids]
+            if len(set(keys)) != len(keys) or any(key in self._application_keys for key in keys):
+                return False, "Duplicate application for the same residence", []
+            now = datetime.now().replace(microsecond=0)
+            created_ids = []
+            for key in keys:
+                app_id = self._next_id('applications')
+                row = {'id': app_id, 'intake_cycle': cycle, 'student_id': student_id, 'residence_id': key[1],
+                       'status': 'Pending', 'apply_date': now, 'room_number': None}
+                self._applications[app_id] = row
+                self._cycle_applications[cycle][app_id] = row
+                self._student_applications[(student_id, cycle)].append(app_id)
+                self._residence_applications[(key[1], cycle)].add(app_id)
+                self._application_keys.add(key)
+                created_ids.append(app_id)
+            return True, None, created_ids
+
+    def update_application_status(self, application_id: int, status: str, room_number: str = None,
+                                  intake_cycle: int | None = None) -> bool:
+        cycle = intake_cycle or current_cycle()
+        with self._lock:
+            app = self._cycle_applications.get(cycle, {}).get(application_id)
+            if app is None:
+                return False
+            app['status'] = status
+            if room_number is not None:
+                app['room_number'] = room_number
+            return True
+
+    def get_application_with_details(self, application_id: int, intake_cycle: int | None = None, fresh: bool = False):
+        cycle = intake_cycle or current_cycle()
+        with self._lock:
+            app = self._cycle_applications.get(cycle, {}).get(application_id)
+            if app is None:
+                return None
+            s = self._students[app['student_id']]
+            r = self._residences[app['residence_id']]
+            return {'id': app['id'], 'intake_cycle': cycle, 'status': app['status'], 'apply_date': app['apply_date'],
+                    'room_number': app['room_number'], 'student_id': s['id'], 'first_name': s['first_name'],
+                    'last_name': s['last_name'], 'email': s['email'], 'student_number': s['student_number'],
+                    'residence_id': r['id'], 'residence_name': r['residence_name'], 'block': r['block'],
+                    'on_campus': r['on_campus']}
+
+    def get_accepted_offcampus_students(self, residence_id: int, intake_cycle: int | None = None):
+        cycle = intake_cycle or current_cycle()
+        with self._lock:
+            residence = self._residences.get(residence_id)
+            if residence is None or residence['on_campus']:
+                return []
+            students = [self._students[self._applications[app_id]['student_id']]
+                        for app_id in self._residence_applications.get((residence_id, cycle), ())
+                        if self._applications[app_id]['status'] == 'Accepted']
+            rows = [{k: s[k] for k in ('id', 'first_name', 'last_name', 'email', 'student_number')} for s in students]
+        rows.sort(key=lambda s: (s['last_name'] or '', s['first_name'] or ''))
+        return rows
+
+    # ---------------- ALLOCATION ----------------
+    def get_allocation_snapshot(self, intake_cycle: int | None = None):
+        cycle = intake_cycle or current_cycle()
+        with self._lock:
+            apps = list(self._cycle_applications.get(cycle, {}).values())
+            placed = {a['student_id'] for a in apps if a['status'] == 'Accepted'}
+            pending = sorted((a for a in apps if a['status'] == 'Pending' and a['student_id'] not in placed),
+                             key=lambda a: (a['student_id'], a['apply_date'], a['id']))
+            accepted = Counter(a['residence_id'] for a in apps if a['status'] == 'Accepted')
+            students = []
+            for student_id in dict.fromkeys(a['student_id'] for a in pending):
+                s = self._students.get(student_id)
+                if s is not None:
+                    students.append((s['id'], s['gender'], s['year_of_study'], s['gpa'], s['distance']))
+            residences = [(r['id'], r['residence_name'], r['block'], r['available_rooms'], accepted[r['id']])
+                          for r in self._residences.values()]
+        return {'applications': [(a['student_id'], a['residence_id']) for a in pending],
+                'students': students, 'residences': residences}
@@ -0,0 +1,415 @@
+"""
+Email notifications.
+
+Email bodies live in templates/email/ and are compiled once, when the
+Notifier is created; a send only renders an already-compiled template. Each
+template has `subject` and `summary` blocks besides the body, so a digest can
+quote several events in one message.
+
+`notifier.notify(email, kind, context)` never talks to SMTP from the request
+thread. Events for the same address are held for DIGEST_WINDOW seconds from
+the first one: a single event is sent as its own email, several are merged
+into one digest. Rendered messages go through bounded outboxes to a few
+sender threads that each keep one SMTP connection open for as long as there
+is mail to send, instead of connect/STARTTLS/login per message.
+
+Transactional mail (OTP codes, decisions) has its own outbox, which senders
+empty first; queueing it never blocks the request thread, and if that outbox
+is ever full the message is dropped, logged and counted. Campaigns (e.g.
+"remind every Pending/Approved student") page through the recipients in
+batches, render each batch and feed the campaign outbox; its bound blocks the
+campaign thread, throttling rendering to the sending rate.
+
+`python notifications.py [messages]` measures render cost and messages/second
+against a local SMTP stand-in.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+KINDS = ('submitted', 'approved', 'rejected', 'offer_accepted', 'offer_rejected', 'password_reset', 'reminder', 'test')
+DIGEST_WINDOW = float(os.getenv('NOTIFY_DIGEST_SECONDS', '30'))
+SMTP_CONNECTIONS = int(os.getenv('NOTIFY_SMTP_CONNECTIONS', '2'))
+BATCH_SIZE = 100            # messages a sender takes from the outbox at a time
+CAMPAIGN_BATCH_SIZE = 500   # students read and rendered per campaign batch
+MAX_PENDING = 10000         # bound of each outbox; campaigns block on a full one, transactional mail is dropped
+TICK = 0.5                  # seconds between digest window checks
+
+log = logging.getLogger('notifications')
+
+
+def smtp_settings() -> dict | None:
+    """SMTP settings from the environment, or None to log emails instead of sending them."""
+    host, user, password = os.getenv('SMTP_HOST'), os.getenv('SMTP_USER'), os.getenv('SMTP_PASS')
+    if not host or not user or not password:
+        return None
+    return {
+        'host': host, 'port': int(os.getenv('SMTP_PORT', '587')), 'user': user, 'password': password,
+        'sender': os.getenv('SMTP_FROM', user), 'starttls': True,
+    }
+
+
+class EmailTemplates:
+    def __init__(self, root: str = TEMPLATE_DIR):
+        self.env = Environment(loader=FileSystemLoader(root), autoescape=select_autoescape(['html']),
+                               auto_reload=False, trim_blocks=True, lstrip_blocks=True)
+        self._templates = {kind: self.env.get_template(f"email/{kind}.html") for kind in KINDS + ('digest',)}
+
+    def _block(self, kind: str, block: str, context: dict) -> str:
+        template = self._templates[kind]
+        return ''.join(template.blocks[block](template.new_context(context))).strip()
+
+    def render(self, kind: str, context: dict) -> tuple:
+        """(subject, html body) for one notification."""
+        subject = Markup(self._block(kind, 'subject', context)).unescape()
+        return subject, self._templates[kind].render(context)
+
+    def digest(self, student_name: str | None, events: list) -> tuple:
+        """(subject, html body) quoting each (kind, context) event's summary."""
+        items = [Markup(self._block(kind, 'summary', context)) for kind, context in events]
+        return self.render('digest', {'student_name': student_name, 'items': items})
+
+
+class Notifier:
+    def __init__(self, templates: EmailTemplates | None = None, smtp: dict | None = None,
+                 digest_window: float = DIGEST_WINDOW, connections: int = SMTP_CONNECTIONS,
+                 batch_size: int = BATCH_SIZE, max_pending: int = MAX_PENDING):
+        self.templates = templates or EmailTemplates()
+        self.smtp = smtp if smtp is not None else smtp_settings()
+        self.digest_window = digest_window
+        self.connections = max(1, connections)
+        self.batch_size = batch_size
+        self._urgent = queue.Queue(maxsize=max_pending)   # transactional mail: (to, subject, html, None)
+        self._outbox = queue.Queue(maxsize=max_pending)   # campaign mail: (to, subject, html, campaign id)
+        self._digests = {}          # email -> [deadline, student_name, [(kind, context)]]
+        self._digest_lock = threading.Lock()
+        self._threads = []
+        self._thread_lock = threading.Lock()
+        self.campaigns = {}         # campaign id -> progress dict
+        self.stats = {'sent': 0, 'failed': 0, 'digests': 0, 'coalesced': 0, 'dropped': 0}
+        self._stats_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    # ---------------- EVENTS ----------------
+    def notify(self, to_email: str, kind: str, context: dict, digest: bool = True):
+        """Queue a notification. With digest=False (OTP codes, tests) it skips the coalescing window."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown notification: {kind}")
+        if not to_email:
+            return
+        self._ensure_threads()
+        if not digest or self.digest_window <= 0:
+            self._enqueue(to_email, *self.templates.render(kind, context))
+            return
+        with self._digest_lock:
+            entry = self._digests.get(to_email)
+            if entry is None:
+                self._digests[to_email] = [time.monotonic() + self.digest_window, context.get('student_name'),
+                                           [(kind, context)]]
+                return
+            entry[2].append((kind, context))
+        with self._stats_lock:
+            self.stats['coalesced'] += 1
+
+    def _release_digests(self, force: bool = False):
+        """Render and queue every digest whose window has closed (all of them with force)."""
+        now = time.monotonic()
+        with self._digest_lock:
+            due = [email for email, entry in self._digests.items() if force or entry[0] <= now]
+            released = [(email, self._digests.pop(email)) for email in due]
+        for email, (_, student_name, events) in released:
+            if len(events) == 1:
+                subject, html = self.templates.render(*events[0])
+            else:
+                subject, html = self.templates.digest(student_name, events)
+                with self._stats_lock:
+                    self.stats['digests'] += 1
+            self._enqueue(email, subject, html)
+
+    def _enqueue(self, to_email: str, subject: str, html: str, campaign_id: str | None = None):
+        if campaign_id is not None:
+            self._outbox.put((to_email, subject, html, campaign_id))  # blocks the campaign thread while full
+            return
+        try:
+            self._urgent.put_nowait((to_email, subject, html, None))
+        except queue.Full:
+            log.error("email dropped: outbox full", extra={'to': to_email, 'subject': subject})
+            with self._stats_lock:
+                self.stats['dropped'] += 1
+
+    # ---------------- CAMPAIGNS ----------------
+    def start_campaign(self, db, statuses: list, subject: str | None = None, message: str | None = None) -> str:
+        """Remind every current-cycle student with an application in one of `statuses`, on a background thread."""
+        campaign_id = uuid.uuid4().hex[:12]
+        self.campaigns[campaign_id] = {
+            'status': 'running', 'statuses': list(statuses), 'queued': 0, 'sent': 0, 'failed': 0,
+            'started_at': datetime.now().isoformat(timespec='seconds'), 'finished_at': None
+        }
+        self._ensure_threads()
+        threading.Thread(target=self._run_campaign, args=(campaign_id, db, statuses, subject, message),
+                         name=f"campaign-{campaign_id}", daemon=True).start()
+        return campaign_id
+
+    def _run_campaign(self, campaign_id: str, db, statuses: list, subject, message):
+        progress = self.campaigns[campaign_id]
+        after = 0
+        try:
+            while True:
+                rows = db.get_campaign_recipients(statuses, after, CAMPAIGN_BATCH_SIZE)
+                if rows is None:
+                    raise RuntimeError("could not read recipients")
+                if not rows:
+                    break
+                for student in _group_recipients(rows):
+                    context = {'student_name': student['name'], 'applications': student['applications'],
+                               'subject': subject, 'message': message}
+                    self._enqueue(student['email'], *self.templates.render('reminder', context), campaign_id)
+                    with self._stats_lock:
+                        progress['queued'] += 1
+                after = rows[-1]['student_id']
+            with self._stats_lock:
+                done = progress['sent'] + progress['failed'] >= progress['queued']
+                progress['status'] = 'completed' if done else 'queued'
+            log.info("campaign queued", extra={'campaign_id': campaign_id, 'reminders': progress['queued']})
+        except Exception as e:
+            log.exception("campaign failed", extra={'campaign_id': campaign_id})
+            progress.update({'status': 'failed', 'error': str(e)})
+        progress['finished_at'] = datetime.now().isoformat(timespec='seconds')
+
+    # ---------------- SENDING ----------------
+    def _ensure_threads(self):
+        if len(self._threads) == self.connections and all(t.is_alive() for t in self._threads):
+            return
+        with self._thread_lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.connections:
+                thread = threading.Thread(target=self._run, name=f"email-sender-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _drain(self, block: bool) -> list:
+        """Up to batch_size messages, transactional ones first; waits up to TICK for the first one with block."""
+        batch = []
+        for outbox in (self._urgent, self._outbox):
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(outbox.get_nowait())
+            except queue.Empty:
+                pass
+        if not batch and block:
+            try:
+                batch.append(self._urgent.get(timeout=TICK))
+            except queue.Empty:
+                pass
+        return batch
+
+    def _run(self):
+        sender = _SMTPSender(self.smtp)
+        while True:
+            try:
+                self._release_digests()
+                batch = self._drain(block=True)
+                if not batch:
+                    sender.close()  # idle: do not hold a connection open
+                    continue
+                self._send(sender, batch)
+            except Exception:
+                log.exception("email sender error")
+
+    def _send(self, sender, batch: list):
+        try:
+            for to_email, subject, html, campaign_id in batch:
+                ok = sender.send(to_email, subject, html)
+                with self._stats_lock:
+                    self.stats['sent' if ok else 'failed'] += 1
+                    progress = self.campaigns.get(campaign_id)
+                    if progress is not None:
+                        progress['sent' if ok else 'failed'] += 1
+                        if progress['status'] == 'queued' and progress['sent'] + progress['failed'] >= progress['queued']:
+                            progress['status'] = 'completed'
+        finally:
+            for _, _, _, campaign_id in batch:
+                (self._urgent if campaign_id is None else self._outbox).task_done()
+
+    def flush(self):
+        """Send all pending digests now and wait until both outboxes are empty."""
+        self._release_digests(force=True)
+        if any(t.is_alive() for t in self._threads):
+            self._urgent.join()
+            self._outbox.join()
+            return
+        sender = _SMTPSender(self.smtp)  # no sender threads (e.g. at interpreter exit): send inline
+        try:
+            while True:
+                batch = self._drain(block=False)
+                if not batch:
+                    return
+                self._send(sender, batch)
+        finally:
+            sender.close()
+
+
+class _SMTPSender:
+    """One reusable SMTP connection; reconnects once if the server dropped it."""
+
+    def __init__(self, settings: dict | None):
+        self.settings = settings
+        self._server = None
+
+    def _connect(self):
+        import smtplib
+        settings = self.settings
+        server = smtplib.SMTP(settings['host'], settings['port'], timeout=30)
+        server.ehlo()
+        if settings.get('starttls') and server.has_extn('starttls'):
+            server.starttls()
+            server.ehlo()
+        if settings.get('user'):
+            server.login(settings['user'], settings['password'])
+        return server
+
+    def send(self, to_email: str, subject: str, html: str) -> bool:
+        if self.settings is None:
+            # SMTP not configured: log the message instead of sending it
+            log.info("email not sent: SMTP not configured", extra={'to': to_email, 'subject': subject, 'body': html})
+            return True
+        import smtplib
+        from email.mime.text import MIMEText
+        msg = MIMEText(html, 'html')
+        msg['Subject'] = subject
+        msg['From'] = self.settings['sender']
+        msg['To'] = to_email
+        for attempt in (1, 2):
+            try:
+                if self._server is None:
+                    self._server = self._connect()
+                self._server.sendmail(self.settings['sender'], [to_email], msg.as_string())
+                return True
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+                self.close()
+                if attempt == 2:
+                    log.error("email send failed", extra={'to': to_email, 'error': str(e)})
+            except smtplib.SMTPException as e:
+                log.error("email send failed", extra={'to': to_email, 'error': str(e)})
+                return False
+        return False
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+def _group_recipients(rows: list) -> list:
+    """Campaign rows (one per application, ordered by student) -> one entry per student."""
+    students = []
+    for row in rows:
+        if not students or students[-1]['id'] != row['student_id']:
+            students.append({'id': row['student_id'], 'email': row['email'], 'applications': [],
+                             'name': f"{row['first_name']} {row['last_name']}"})
+        residence = f"{row['residence_name']} {row['block']}".strip()
+        students[-1]['applications'].append({'residence': residence, 'status': row['status']})
+    return students
+
+
+def _smtp_stand_in(rtt: float = 0.0):
+    """
+    A minimal local SMTP server that accepts and discards mail; returns (server, port).
+    Each reply is delayed by rtt seconds to stand in for the network round trip to a real relay.
+    """
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.wfile.write(b"220 localhost SMTP stand-in\r\n")
+            for line in self.rfile:
+                if rtt:
+                    time.sleep(rtt)
+                command = line[:4].upper()
+                if command == b'EHLO':
+                    self.wfile.write(b"250-localhost\r\n250 8BITMIME\r\n")
+                elif command == b'DATA':
+                    self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    for data in self.rfile:
+                        if data == b".\r\n":
+                            break
+                    with self.server.lock:
+                        self.server.received += 1
+                    self.wfile.write(b"250 OK\r\n")
+                elif command == b'QUIT':
+                    self.wfile.write(b"221 Bye\r\n")
+                    return
+                else:
+                    self.wfile.write(b"250 OK\r\n")
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.received = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def _benchmark(n: int = 2000):
+    templates = EmailTemplates()
+    context = {'student_name': 'Dakalo Makhavhu', 'residence_name': 'DBSA Male M-4', 'application_date': 'May 02, 2026'}
+
+    started = time.perf_counter()
+    for _ in range(n):
+        templates.env.from_string(templates.env.loader.get_source(templates.env, 'email/approved.html')[0])
+    compile_each = (time.perf_counter() - started) / n * 1e6
+    started = time.perf_counter()
+    for _ in range(n):
+        templates.render('approved', context)
+    compiled = (time.perf_counter() - started) / n * 1e6
+    print(f"render: compile per message {compile_each:7.1f} µs, precompiled {compiled:5.1f} µs")
+    recipients = [f"{20000000 + i}@mvula.univen.ac.za" for i in range(n)]
+    for rtt in (0.0, 0.002):
+        server, port = _smtp_stand_in(rtt)
+        settings = {'host': '127.0.0.1', 'port': port, 'sender': 'no-reply@example.com'}
+        print(f"SMTP stand-in, {rtt * 1000:.0f} ms round trip:")
+
+        # Before: one connection per message, sent from the calling thread
+        sample = recipients[:max(1, n // 10)]
+        started = time.perf_counter()
+        for email in sample:
+            sender = _SMTPSender(settings)
+            sender.send(email, *templates.render('approved', context))
+            sender.close()
+        print(f"   one connection per message      {len(sample) / (time.perf_counter() - started):8.0f} msg/s")
+
+        for connections in (1, 4):
+            notifier = Notifier(templates, settings, digest_window=0, connections=connections)
+            started = time.perf_counter()
+            for email in recipients:
+                notifier.notify(email, 'approved', context)
+            notifier.flush()
+            print(f"   Notifier, {connections} connection(s)        {n / (time.perf_counter() - started):8.0f} msg/s")
+        server.shutdown()
+
+    # Digest: three events per student inside the window become one email each
+    server, port = _smtp_stand_in()
+    settings = {'host': '127.0.0.1', 'port': port, 'sender': 'no-reply@example.com'}
+    notifier = Notifier(templates, settings, digest_window=60)
+    for email in recipients[:n // 3]:
+        for kind in ('submitted', 'approved', 'offer_accepted'):
+            notifier.notify(email, kind, dict(context, residence_names=['DBSA Male M-4'], room_number='M-4-12'))
+    notifier.flush()
+    print(f"digest: {3 * (n // 3)} events -> {server.received} emails ({notifier.stats['digests']} digests)")
+    server.shutdown()
+
+if __name__ == '__main__':
+    import sys
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
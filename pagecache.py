@@ -0,0 +1,209 @@
+"""
+Rendered page cache for anonymous templates.
+
+Views decorated with `@page_cache.page` (the landing, login and password
+reset pages) are rendered once; the final HTML is stored with gzip/brotli
+variants and an ETag, and PageCache answers later GET/HEAD requests for that
+path straight from memory, ahead of Flask routing, session loading and the
+compression middleware (the stored variant already carries its
+Content-Encoding, so CompressionMiddleware passes it through).
+
+A decorated view that reads the session while rendering is session-bound: its
+response is returned normally, never stored, and the path is not cached again.
+Responses that are not 200 text/html, set cookies or say no-store/private are
+not stored either, and neither are requests with a query string.
+
+The whole cache is dropped when any file under templates/ changes or the
+asset manifest re-fingerprints a file (and, in debug mode, when anything
+under css/, js/ or Assets/ is edited), checked at most once per
+CHECK_INTERVAL, so edits show up without a restart.
+
+Run `python pagecache.py` to compare a rendered and a cached hit on `/`.
+"""
+import functools
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from flask import current_app, request, session
+
+from compression import HAVE_BROTLI, accepted_encodings, brotli
+
+CHECK_INTERVAL = 1.0   # seconds between template/asset change checks
+CACHE_CONTROL = 'no-cache'  # browsers revalidate with If-None-Match and get a 304
+
+log = logging.getLogger('pagecache')
+
+
+class CachedPage:
+    __slots__ = ('body', 'variants', 'etag', 'content_type', 'stamp')
+
+    def __init__(self, body: bytes, content_type: str, stamp):
+        self.body = body
+        self.content_type = content_type
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        self.stamp = stamp
+        # Compressed once at store time, at the highest levels, since every later hit reuses them
+        self.variants = {}
+        candidates = [('gzip', gzip.compress(body, compresslevel=9, mtime=0))]
+        if HAVE_BROTLI:
+            candidates.insert(0, ('br', brotli.compress(body, quality=11)))
+        for encoding, encoded in candidates:
+            if len(encoded) < len(body):
+                self.variants[encoding] = encoded
+
+    def respond(self, environ, start_response):
+        headers = [
+            ('Content-Type', self.content_type),
+            ('Cache-Control', CACHE_CONTROL),
+            ('ETag', self.etag),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH', '')
+        if self.etag in if_none_match or if_none_match.strip() == '*':
+            start_response('304 Not Modified', headers)
+            return [b'']
+
+        body = self.body
+        if self.variants:
+            accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING'))
+            for encoding, encoded in self.variants.items():
+                if encoding in accepted:
+                    body = encoded
+                    headers.append(('Content-Encoding', encoding))
+                    break
+        headers.append(('Content-Length', str(len(body))))
+        start_response('200 OK', headers)
+        return [b''] if environ.get('REQUEST_METHOD') == 'HEAD' else [body]
+
+
+class PageCache:
+    """WSGI middleware serving stored pages, plus the `page` decorator that stores them."""
+
+    def __init__(self, app, template_dir: str, manifest=None, check_interval: float = CHECK_INTERVAL):
+        self.app = app
+        self.template_dir = template_dir
+        self.manifest = manifest
+        self.check_interval = check_interval
+        self._pages = {}            # PATH_INFO -> CachedPage
+        self._session_bound = set()  # paths whose view read the session
+        self._stamp = self._current_stamp()
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    # ---------------- INVALIDATION ----------------
+    def _current_stamp(self):
+        directories = [self.template_dir]
+        if getattr(self.manifest, 'watch', False):
+            # Debug mode: an edited css/js file changes the fingerprinted URLs baked into the pages
+            directories += [os.path.join(self.manifest.root, d) for d in self.manifest.dirs]
+        latest = 0.0
+        for directory in directories:
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    try:
+                        latest = max(latest, os.path.getmtime(os.path.join(dirpath, filename)))
+                    except OSError:
+                        pass
+        return latest, getattr(self.manifest, 'version', 0)
+
+    def _check(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            stamp = self._current_stamp()
+            if stamp != self._stamp:
+                self._stamp = stamp
+                self._pages = {}
+                log.info("page cache cleared: templates or assets changed")
+
+    def clear(self):
+        with self._lock:
+            self._pages = {}
+            self._session_bound.clear()
+
+    # ---------------- SERVING ----------------
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') in ('GET', 'HEAD') and not environ.get('QUERY_STRING'):
+            self._check()
+            page = self._pages.get(environ.get('PATH_INFO', ''))
+            if page is not None and page.stamp == self._stamp:
+                return page.respond(environ, start_response)
+        return self.app(environ, start_response)
+
+    # ---------------- STORING ----------------
+    def page(self, view):
+        """Decorator for views whose output does not depend on the user or the request."""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            path = request.environ.get('PATH_INFO', '')
+            if request.method != 'GET' or request.query_string or path in self._session_bound:
+                return view(*args, **kwargs)
+
+            stamp = self._stamp
+            accessed = getattr(session, 'accessed', False)
+            session.accessed = False
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+                session_read = session.accessed
+            finally:
+                session.accessed = accessed or session.accessed
+
+            if session_read:
+                self._session_bound.add(path)
+                log.warning("view reads the session; not page-cached", extra={'endpoint': request.endpoint, 'path': path})
+            elif self._storable(response):
+                page = self._pages[path] = CachedPage(response.get_data(), response.headers['Content-Type'], stamp)
+                response.set_etag(page.etag.strip('"'))
+                response.headers['Cache-Control'] = CACHE_CONTROL
+            return response
+        return wrapper
+
+    @staticmethod
+    def _storable(response) -> bool:
+        if response.status_code != 200 or response.is_streamed or response.mimetype != 'text/html':
+            return False
+        if 'Set-Cookie' in response.headers or 'Content-Encoding' in response.headers:
+            return False
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        return 'no-store' not in cache_control and 'private' not in cache_control
+
+
+def install(app, manifest=None) -> PageCache:
+    """Wrap app.wsgi_app; decorate anonymous views with the returned cache's `page`."""
+    cache = PageCache(app.wsgi_app, os.path.join(app.root_path, app.template_folder), manifest)
+    app.wsgi_app = cache
+    return cache
+
+
+def _benchmark(n: int = 2000):
+    from werkzeug.test import EnvironBuilder
+
+    from app import app
+
+    def run(query_string: str) -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            environ = EnvironBuilder('/', query_string=query_string,
+                                     headers={'Accept-Encoding': 'gzip, br'}).get_environ()
+            body = app.wsgi_app(environ, lambda status, headers, exc_info=None: None)
+            b''.join(body)
+            getattr(body, 'close', lambda: None)()
+        return (time.perf_counter() - started) / n * 1e6
+
+    run('')  # store the page
+    rendered = run('render=1')  # a query string bypasses the cache: routing, session, render, compression
+    cached = run('')
+    print(f"GET / rendered: {rendered:8.1f} µs/request")
+    print(f"GET / cached:   {cached:8.1f} µs/request  ({rendered / cached:.0f}x)")
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,600 @@
+"""
+Read-through cache for the storage layer's hot single-row reads.
+
+`CachedStorage` wraps any Storage backend (open_storage() does this unless
+READ_CACHE_SIZE=0). It caches get_student_by_id, get_residence_by_id,
+get_student_applications, get_application_with_details and
+get_student_summary, and passes every other call straight through. There are two tiers:
+
+    local    an LRU per worker with at most READ_CACHE_SIZE entries,
+             each served for READ_CACHE_TTL seconds
+    shared   optional, Redis at READ_CACHE_URL: workers share each other's
+             loads, and an invalidation in one worker evicts the matching
+             entries in every worker's local tier (pub/sub)
+
+Each entry is tagged with what it was built from: `student:<id>`,
+`residence:<id>`, `application:<id>`, plus `students`/`residences` for bulk
+changes. The wrapped write methods invalidate their tags once they return, so
+a status update evicts the application's details and the student's
+application list, wherever they are cached.
+
+A read that misses loads from the backend without holding any lock. If a
+write invalidates one of the result's tags while that load is in flight, the
+result is returned to its caller but not stored, because it may predate the
+write. An invalidation bumps an epoch counter and records the epoch per tag;
+a load may store its result only when none of its tags was invalidated after
+the load began. The shared tier applies the same rule with the counter kept
+in Redis, checking tag epochs when it reads an entry rather than when it
+stores one. Shared entries and invalidation messages are JSON (orjson when
+installed); datetimes, dates and decimals are tagged so rows come back with
+the types the backend returned. The shared tier needs the optional `redis`
+package; without it READ_CACHE_URL is ignored with a warning and each worker
+keeps its local tier only.
+
+None results are not cached. Cached rows are copied on the way in and out,
+so callers may change what they get back. `stats()` reports hits, misses and
+evictions per method; admins read it at GET /api/admin/cache.
+
+Run `python readcache.py` to compare cached and uncached reads on a SQLite
+backend and to check that no stale entry survives concurrent writers.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    # Optional: only the shared tier needs it
+    import redis
+    HAVE_REDIS = True
+except ImportError:
+    redis = None
+    HAVE_REDIS = False
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    orjson = None
+    HAVE_ORJSON = False
+
+from intake import current_cycle
+
+CACHE_SIZE = int(os.getenv('READ_CACHE_SIZE', '10000'))   # local entries per worker; 0 turns the cache off
+CACHE_TTL = float(os.getenv('READ_CACHE_TTL', '10'))      # seconds an entry is served
+SHARED_URL = os.getenv('READ_CACHE_URL', '')              # e.g. redis://localhost:6379/0
+TAG_HISTORY = 20000       # recent tag invalidations remembered to reject stale stores
+KEY_PREFIX = 'readcache:'
+CHANNEL = KEY_PREFIX + 'invalidate'
+
+log = logging.getLogger('readcache')
+
+
+# ---------------- SHARED TIER ENCODING ----------------
+_DECODERS = {'$datetime': datetime.fromisoformat, '$date': date.fromisoformat, '$decimal': Decimal}
+
+
+def _encode_default(obj):
+    if isinstance(obj, datetime):
+        return {'$datetime': obj.isoformat()}
+    if isinstance(obj, date):
+        return {'$date': obj.isoformat()}
+    if isinstance(obj, Decimal):
+        return {'$decimal': str(obj)}
+    raise TypeError(f"{type(obj).__name__} is not cacheable in the shared tier")
+
+
+def _dumps(obj) -> bytes:
+    if HAVE_ORJSON:
+        return orjson.dumps(obj, default=_encode_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(obj, default=_encode_default, separators=(',', ':')).encode()
+
+
+def _revive(obj):
+    if isinstance(obj, list):
+        return [_revive(item) for item in obj]
+    if isinstance(obj, dict):
+        if len(obj) == 1:
+            (tag, text), = obj.items()
+            if tag in _DECODERS:
+                return _DECODERS[tag](text)
+        return {key: _revive(value) for key, value in obj.items()}
+    return obj
+
+
+def _loads(raw: bytes):
+    return _revive(orjson.loads(raw) if HAVE_ORJSON else json.loads(raw))
+
+
+def _copy(value):
+    """Dicts and lists copied all the way down (a summary nests its applications); leaves are immutable."""
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+class ReadCache:
+    def __init__(self, max_entries: int = CACHE_SIZE, ttl: float = CACHE_TTL, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()   # key -> (expires_at, value, tags), least recently used first
+        self._keys = defaultdict(set)   # tag -> keys of the entries built from it
+        self._invalidated = OrderedDict()  # tag -> epoch of its latest invalidation, oldest first
+        self._epoch = 0
+        self._forgotten = 0             # newest epoch dropped from _invalidated
+        self._lock = threading.Lock()
+        self._counts = defaultdict(Counter)  # method -> hits/misses/shared_hits
+        self._events = Counter()        # stores, stale_skips, evictions, expirations, invalidations
+
+    # ---------------- READS ----------------
+    def get_or_load(self, method: str, key: tuple, load, tags_for):
+        """The cached result of `load()` for `key`; tags_for(result) names what it was built from."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._counts[method]['hits'] += 1
+                    return _copy(entry[1])
+                self._remove(key)
+                self._events['expirations'] += 1
+            start = self._epoch
+            if self.shared is None:
+                self._counts[method]['misses'] += 1
+
+        if self.shared is not None:
+            found, value, tags = self.shared.get(key)
+            with self._lock:
+                self._counts[method]['shared_hits' if found else 'misses'] += 1
+            if found:
+                self._store(key, value, tags, start)
+                return _copy(value)
+
+        shared_start = self.shared.epoch() if self.shared is not None else None
+        value = load()
+        if value is None:
+            return None
+        tags = tags_for(value)
+        if self._store(key, _copy(value), tags, start) and shared_start is not None:
+            self.shared.set(key, value, tags, shared_start, self.ttl)
+        return value
+
+    def _store(self, key: tuple, value, tags: tuple, start: int) -> bool:
+        with self._lock:
+            # A tag invalidated after the load began means the result may predate that write
+            if start != self._epoch and (start < self._forgotten or
+                                         any(self._invalidated.get(tag, 0) > start for tag in tags)):
+                self._events['stale_skips'] += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._keys[tag].add(key)
+            self._events['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._events['evictions'] += 1
+            return True
+
+    def _remove(self, key: tuple):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys[tag]
+
+    # ---------------- INVALIDATION ----------------
+    def invalidate(self, *tags: str, publish: bool = True):
+        """Evict every entry built from any of `tags`, here and (when publishing) in every worker."""
+        if not tags:
+            return
+        with self._lock:
+            self._epoch += 1
+            for tag in tags:
+                self._invalidated[tag] = self._epoch
+                self._invalidated.move_to_end(tag)
+                for key in list(self._keys.get(tag, ())):
+                    self._remove(key)
+            while len(self._invalidated) > TAG_HISTORY:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+            self._events['invalidations'] += len(tags)
+        if publish and self.shared is not None:
+            self.shared.invalidate(tags)
+
+    def clear(self, publish: bool = True):
+        with self._lock:
+            self._epoch += 1
+            self._forgotten = self._epoch  # loads already in flight must not store
+            self._invalidated.clear()
+            self._entries.clear()
+            self._keys.clear()
+        if publish and self.shared is not None:
+            self.shared.clear()
+
+    # ---------------- METRICS ----------------
+    def stats(self) -> dict:
+        with self._lock:
+            methods = {}
+            for method, counts in self._counts.items():
+                lookups = counts['hits'] + counts['shared_hits'] + counts['misses']
+                methods[method] = {'hits': counts['hits'], 'shared_hits': counts['shared_hits'], 'misses': counts['misses'],
+                                   'hit_ratio': round((lookups - counts['misses']) / lookups, 3) if lookups else None}
+            hits = sum(c['hits'] + c['shared_hits'] for c in self._counts.values())
+            lookups = hits + sum(c['misses'] for c in self._counts.values())
+            return {
+                'entries': len(self._entries), 'max_entries': self.max_entries, 'ttl_seconds': self.ttl,
+                'hit_ratio': round(hits / lookups, 3) if lookups else None, 'methods': methods,
+                **{name: self._events[name] for name in ('stores', 'stale_skips', 'evictions', 'expirations',
+                                                          'invalidations')},
+                'shared': self.shared.status() if self.shared is not None else None,
+            }
+
+
+class SharedTier:
+    """
+    The Redis tier. Entries are stored as JSON with the epoch their load began at; tag epochs live
+    in Redis too, so an entry stored by one worker after another worker's invalidation of
+    one of its tags is rejected when read. Redis errors count as misses and never fail a read;
+    after one, the tier is skipped for RETRY_SECONDS rather than paying a timeout per read.
+    """
+
+    RETRY_SECONDS = 5
+
+    def __init__(self, url: str = SHARED_URL, ttl: float = CACHE_TTL):
+        if not HAVE_REDIS:
+            raise RuntimeError("READ_CACHE_URL is set but the redis package is not installed")
+        self.url = url
+        self.client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self.ttl = ttl
+        self.errors = 0
+        self._down_until = 0.0
+        self.origin = os.urandom(8).hex()  # this worker's own invalidations are not replayed to it
+        self._listener = None
+
+    def _key(self, key: tuple) -> str:
+        return KEY_PREFIX + ':'.join(map(str, key))
+
+    def _failed(self, err):
+        self.errors += 1
+        self._down_until = time.monotonic() + self.RETRY_SECONDS
+        log.warning("shared read cache unavailable", extra={'error': str(err)})
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def epoch(self) -> int | None:
+        if not self.available:
+            return None
+        try:
+            return int(self.client.get(KEY_PREFIX + 'epoch') or 0)
+        except redis.RedisError as err:
+            self._failed(err)
+            return None
+
+    def get(self, key: tuple):
+        """(found, value, tags)"""
+        if not self.available:
+            return False, None, ()
+        try:
+            raw = self.client.get(self._key(key))
+            if raw is None:
+                return False, None, ()
+            entry = _loads(raw)
+            start, value, tags = entry['start'], entry['value'], tuple(entry['tags'])
+            epochs = self.client.mget([KEY_PREFIX + 'tag:' + tag for tag in tags + ('*',)])
+            if any(int(epoch or 0) > start for epoch in epochs):
+                return False, None, ()
+            return True, value, tags
+        except (ValueError, KeyError, TypeError) as err:
+            log.warning("unreadable shared cache entry", extra={'key': self._key(key), 'error': str(err)})
+            return False, None, ()
+        except redis.RedisError as err:
+            self._failed(err)
+            return False, None, ()
+
+    def set(self, key: tuple, value, tags: tuple, start: int | None, ttl: float):
+        if start is None or not self.available:
+            return
+        try:
+            raw = _dumps({'start': start, 'tags': list(tags), 'value': value})
+        except TypeError as err:
+            log.debug("value not shared", extra={'key': self._key(key), 'error': str(err)})
+            return
+        try:
+            self.client.set(self._key(key), raw, px=int(ttl * 1000))
+        except redis.RedisError as err:
+            self._failed(err)
+
+    def invalidate(self, tags):
+        # Not skipped while marked down: an invalidation that gets through is worth the timeout
+        try:
+            epoch = self.client.incr(KEY_PREFIX + 'epoch')
+            pipe = self.client.pipeline(transaction=False)
+            for tag in tags:
+                # Kept a little longer than any entry that could have been built before it
+                pipe.set(KEY_PREFIX + 'tag:' + tag, epoch, px=int((self.ttl + 60) * 1000))
+            pipe.publish(CHANNEL, _dumps({'origin': self.origin, 'tags': list(tags)}))
+            pipe.execute()
+        except redis.RedisError as err:
+            self._failed(err)
+
+    def clear(self):
+        # Every entry is also checked against the "*" tag, so this fails all entries built before now
+        self.invalidate(('*',))
+
+    def listen(self, cache: ReadCache):
+        """Apply other workers' invalidations to `cache`'s local tier, on a background thread."""
+        def run():
+            client = redis.Redis.from_url(self.url, socket_connect_timeout=1)  # no read timeout: it waits for messages
+            while True:
+                try:
+                    pubsub = client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(CHANNEL)
+                    for message in pubsub.listen():
+                        try:
+                            data = _loads(message['data'])
+                            origin, tags = data['origin'], tuple(data['tags'])
+                        except (ValueError, KeyError, TypeError):
+                            log.warning("unreadable cache invalidation message")
+                            cache.clear(publish=False)
+                            continue
+                        if origin == self.origin:
+                            continue
+                        if '*' in tags:
+                            cache.clear(publish=False)
+                        else:
+                            cache.invalidate(*tags, publish=False)
+                except redis.RedisError as err:
+                    # Missed invalidations while disconnected: drop everything local rather than serve it
+                    self._failed(err)
+                    cache.clear(publish=False)
+                    time.sleep(1)
+        self._listener = threading.Thread(target=run, name='readcache-listener', daemon=True)
+        self._listener.start()
+
+    def status(self) -> dict:
+        return {'available': self.available, 'errors': self.errors,
+                'listening': self._listener is not None and self._listener.is_alive()}
+
+
+# ---------------- STORAGE WRAPPER ----------------
+def _student_tags(row) -> tuple:
+    return (f"student:{row['id']}", 'students')
+
+
+def _residence_tags(row) -> tuple:
+    return (f"residence:{row['id']}", 'residences')
+
+
+def _summary_tags(summary) -> tuple:
+    return (f"student:{summary['student']['id']}", 'students', 'residences',
+            *(f"application:{app['id']}" for app in summary['applications']))
+
+
+def _details_tags(row) -> tuple:
+    return (f"application:{row['id']}", f"student:{row['student_id']}", f"residence:{row['residence_id']}",
+            'students')
+
+
+class CachedStorage:
+    """A Storage that serves the hot reads from a ReadCache and invalidates it from the writes."""
+
+    # Writes that can touch any cached row: the whole cache goes
+    FLUSHING_WRITES = frozenset({'archive_application_batch', 'drop_cycle_partition', 'migrate_applications_to_cycles',
+                                 'migrate_unique_student_numbers', 'migrate_unique_residence_blocks',
+                                 'migrate_application_limits', 'migrate_demand_cycles'})
+
+    def __init__(self, storage, cache: ReadCache):
+        self.storage = storage
+        self.cache = cache
+
+    def __getattr__(self, name):
+        attr = getattr(self.storage, name)
+        if name in self.FLUSHING_WRITES:
+            def flushing(*args, **kwargs):
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    self.cache.clear()
+            return flushing
+        return attr
+
+    # ---------------- CACHED READS ----------------
+    def get_student_by_id(self, student_id):
+        return self.cache.get_or_load('get_student_by_id', ('student', student_id),
+                                      lambda: self.storage.get_student_by_id(student_id), _student_tags)
+
+    def get_residence_by_id(self, residence_id: int):
+        return self.cache.get_or_load('get_residence_by_id', ('residence', residence_id),
+                                      lambda: self.storage.get_residence_by_id(residence_id), _residence_tags)
+
+    def get_student_applications(self, student_id, intake_cycle: int | None = None):
+        cycle = intake_cycle or current_cycle()
+        # The rows carry residence names but not ids, so any residence change evicts them
+        return self.cache.get_or_load(
+            'get_student_applications', ('student_applications', student_id, cycle),
+            lambda: self.storage.get_student_applications(student_id, cycle),
+            lambda rows: (f"student:{student_id}", 'residences') + tuple(f"application:{row['id']}" for row in rows)
+        )
+
+    def get_application_with_details(self, application_id: int, intake_cycle: int | None = None, fresh: bool = False):
+        cycle = intake_cycle or current_cycle()
+        if fresh:
+            return self.storage.get_application_with_details(application_id, cycle, fresh=True)
+        return self.cache.get_or_load('get_application_with_details', ('application', application_id, cycle),
+                                      lambda: self.storage.get_application_with_details(application_id, cycle),
+                                      _details_tags)
+
+    def get_student_summary(self, student_id: int):
+        return self.cache.get_or_load('get_student_summary', ('student_summary', student_id, current_cycle()),
+                                      lambda: self.storage.get_student_summary(student_id), _summary_tags)
+
+    # ---------------- INVALIDATING WRITES ----------------
+    # Tags are invalidated after the write returns (committed) and also when it raises,
+    # since a failed write may still have changed rows
+    def update_application_status(self, application_id: int, status: str, room_number: str = None,
+                                  intake_cycle: int | None = None) -> bool:
+        try:
+            return self.storage.update_application_status(application_id, status, room_number, intake_cycle)
+        finally:
+            self.cache.invalidate(f"application:{application_id}")
+
+    def create_applications_with_validation(self, student_id: int, selections: list):
+        try:
+            return self.storage.create_applications_with_validation(student_id, selections)
+        finally:
+            self.cache.invalidate(f"student:{student_id}")
+
+    def update_student_password(self, student_id, plain_password) -> bool:
+        try:
+            return self.storage.update_student_password(student_id, plain_password)
+        finally:
+            self.cache.invalidate(f"student:{student_id}")
+
+    def bulk_upsert_students(self, rows: list) -> int | None:
+        try:
+            return self.storage.bulk_upsert_students(rows)
+        finally:
+            self.cache.invalidate('students')
+
+    def bulk_upsert_residences(self, residences: list, update_existing: bool = False) -> list | None:
+        try:
+            return self.storage.bulk_upsert_residences(residences, update_existing)
+        finally:
+            self.cache.invalidate('residences')
+
+    def upsert_residence(self, *args, **kwargs) -> int | None:
+        try:
+            return self.storage.upsert_residence(*args, **kwargs)
+        finally:
+            self.cache.invalidate('residences')
+
+
+def wrap(storage):
+    """`storage` behind a read cache configured from the environment, or unchanged when READ_CACHE_SIZE=0."""
+    if CACHE_SIZE <= 0:
+        return storage
+    shared = None
+    if SHARED_URL and not HAVE_REDIS:
+        log.warning("READ_CACHE_URL is set but the redis package is not installed; using the local tier only")
+    elif SHARED_URL:
+        shared = SharedTier(SHARED_URL, CACHE_TTL)
+    cache = ReadCache(CACHE_SIZE, CACHE_TTL, shared)
+    if shared is not None:
+        shared.listen(cache)
+    return CachedStorage(storage, cache)
+
+
+def _benchmark(students: int = 20000, lookups: int = 50000, writers: int = 2, readers: int = 6, seconds: float = 3.0):
+    import random
+    from timeit import timeit
+
+    from sqlite_storage import SQLiteStorage
+    from storage import populate
+
+    backend = SQLiteStorage(':memory:')
+    populate(backend, students)
+    student_ids = backend.get_all_students().column('id')
+    app_ids = backend.get_all_applications().column('id')
+    residence_ids = backend.get_residences().column('id')
+    rng = random.Random(1)
+    # Skewed like real traffic: a few students (and their applications) are read far more than the rest
+    def skewed(ids: list) -> list:
+        return [ids[min(int(rng.expovariate(10 / len(ids))), len(ids) - 1)] for _ in range(lookups)]
+    hot, hot_apps = skewed(student_ids), skewed(app_ids)
+
+    def reads(storage) -> dict:
+        return {
+            'get_student_by_id': lambda i: storage.get_student_by_id(hot[i]),
+            'get_residence_by_id': lambda i: storage.get_residence_by_id(residence_ids[i % len(residence_ids)]),
+            'get_student_applications': lambda i: storage.get_student_applications(hot[i]),
+            'get_application_with_details': lambda i: storage.get_application_with_details(hot_apps[i]),
+        }
+
+    def run(storage) -> dict:
+        timings = {}
+        for label, fn in reads(storage).items():
+            started = time.perf_counter()
+            for i in range(lookups):
+                fn(i)
+            timings[label] = (time.perf_counter() - started) / lookups * 1e6
+        return timings
+
+    cached = CachedStorage(backend, ReadCache(max_entries=CACHE_SIZE, ttl=60))
+    plain, mixed = run(backend), run(cached)
+    ratios = {label: counts['hit_ratio'] for label, counts in cached.cache.stats()['methods'].items()}
+    hit = {label: timeit(lambda: fn(0), number=lookups) / lookups * 1e6 for label, fn in reads(cached).items()}
+    print(f"{students} students on SQLite, {lookups} skewed lookups per method, {CACHE_SIZE}-entry cache:")
+    print(f"   {'':<30} {'backend':>8} {'cache hit':>10} {'skewed mix':>11}")
+    for label in plain:
+        ratio = ratios[label]
+        print(f"   {label:<30} {plain[label]:6.1f}µs {hit[label]:8.1f}µs {mixed[label]:9.1f}µs  (hit ratio {ratio:.0%})")
+
+    # Writers flip statuses while readers re-read the same rows through a backend with a 1 ms round trip,
+    # so writes routinely land while a read is in flight. Afterwards no cached entry may disagree with the
+    # backend; the same run with the epoch check turned off shows what it prevents.
+    class RoundTrip:
+        def __init__(self, storage):
+            self.storage = storage
+
+        def __getattr__(self, name):
+            return getattr(self.storage, name)
+
+        def get_application_with_details(self, *args):
+            row = self.storage.get_application_with_details(*args)
+            time.sleep(0.001)  # the row is on its way back while writers commit
+            return row
+
+    class Unguarded(ReadCache):
+        def _store(self, key, value, tags, start):
+            return super()._store(key, value, tags, self._epoch)
+
+    targets = hot_apps[:200]
+
+    def race(cache: ReadCache) -> tuple:
+        storage = CachedStorage(RoundTrip(backend), cache)
+        stop = threading.Event()
+
+        def write():
+            r = random.Random()
+            while not stop.is_set():
+                storage.update_application_status(r.choice(targets), r.choice(('Pending', 'Approved', 'Accepted')))
+                time.sleep(0.0005)
+
+        def read():
+            r = random.Random()
+            while not stop.is_set():
+                storage.get_application_with_details(r.choice(targets))
+
+        threads = [threading.Thread(target=write) for _ in range(writers)] + [threading.Thread(target=read) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        stale = sum(1 for app_id in set(targets)
+                    if (entry := cache._entries.get(('application', app_id, current_cycle()))) is not None
+                    and entry[1]['status'] != backend.get_application_with_details(app_id)['status'])
+        return stale, cache.stats()['stale_skips']
+
+    print(f"{writers} writers + {readers} readers on {len(set(targets))} applications for {seconds:.0f}s each, 1 ms read round trip:")
+    stale, skipped = race(ReadCache(CACHE_SIZE, 60))
+    print(f"   epoch check        {stale:4} stale entries left ({skipped} racing loads not stored)")
+    stale, _ = race(Unguarded(CACHE_SIZE, 60))
+    print(f"   no epoch check     {stale:4} stale entries left")
+
+if __name__ == '__main__':
+    _benchmark()
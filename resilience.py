@@ -0,0 +1,96 @@
+"""
+Circuit breaker for the primary database.
+
+While MySQL answers, the breaker is closed and every call goes through.
+After `failure_threshold` consecutive connection failures it opens: callers
+fail fast with DatabaseUnavailable (the app turns that into a 503 with
+Retry-After) instead of each waiting out the connect timeout. Once the backoff
+delay has passed, one caller is let through as a half-open probe; its success
+closes the breaker, and its failure reopens it for a longer delay. Delays grow
+exponentially up to `max_delay`, with jitter so that workers recovering
+together do not all reconnect at the same moment.
+"""
+import logging
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+log = logging.getLogger('resilience')
+
+
+class DatabaseUnavailable(Exception):
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CLOSED
+        self._failures = 0        # consecutive failures while closed
+        self._opened = 0          # consecutive opens without a success, drives the backoff
+        self._retry_at = 0.0
+        self._probing = False
+        self._last_error = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise DatabaseUnavailable unless this caller may try the database now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.time()
+            if self.state == OPEN and now >= self._retry_at and not self._probing:
+                self.state = HALF_OPEN
+                self._probing = True
+                return  # this caller is the probe
+        raise DatabaseUnavailable(f"{self.name} unavailable: {self._last_error}", self.retry_after())
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                log.info("circuit closed", extra={'circuit': self.name})
+            self.state = CLOSED
+            self._failures = 0
+            self._opened = 0
+            self._probing = False
+
+    def record_failure(self, error=None) -> bool:
+        """Count a failure. Returns True if this failure opened the circuit."""
+        with self._lock:
+            self._last_error = error
+            self._failures += 1
+            if self.state == CLOSED and self._failures < self.failure_threshold:
+                return False
+            was_open = self.state == OPEN
+            self.state = OPEN
+            self._probing = False
+            if was_open:
+                return False
+            self._opened += 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (self._opened - 1))
+            self._retry_at = time.time() + random.uniform(delay / 2, delay)
+            log.error("circuit open", extra={'circuit': self.name, 'retry_in': round(self._retry_at - time.time(), 1),
+                                              'error': str(error)})
+            return True
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed (a short default when closed)."""
+        return max(self._retry_at - time.time(), 0.0) or self.base_delay
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'retry_in': round(max(self._retry_at - time.time(), 0.0), 2) if self.state != CLOSED else 0,
+                'last_error': str(self._last_error) if self._last_error and self.state != CLOSED else None
+            }
@@ -0,0 +1,133 @@
+"""
+Compact result sets and fast JSON for the large list endpoints.
+
+A RowSet keeps a query result as the cursor returned it - one column-name tuple
+plus one plain tuple per row - instead of one dict per row. Iterating or
+indexing it still yields dicts, so existing callers keep working.
+
+FastJSONProvider is installed as the Flask JSON provider. It encodes with orjson
+when that is installed (stdlib json otherwise) using the same conventions as
+Flask's default provider (HTTP dates, Decimal as string, sorted keys), and
+`jsonify(rowset)` streams the array out in batches rather than building one
+large string.
+
+Run `python rowset.py` for a 50k-row benchmark.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    orjson = None
+    HAVE_ORJSON = False
+
+STREAM_BATCH = 1000  # rows encoded per response chunk
+
+
+class RowSet:
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns, rows: list):
+        self.columns = tuple(columns)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RowSet(self.columns, self.rows[index])
+        return dict(zip(self.columns, self.rows[index]))
+
+    def column(self, name: str) -> list:
+        i = self.columns.index(name)
+        return [row[i] for row in self.rows]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs) -> str:
+        if not HAVE_ORJSON or set(kwargs) - {'separators', 'indent'}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(kwargs.get('indent'))).decode()
+        except TypeError:
+            # e.g. integers wider than 64 bits; the stdlib encoder handles everything Flask's does
+            return super().dumps(obj, **kwargs)
+
+    def _options(self, indent=None) -> int:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def response(self, *args, **kwargs):
+        if len(args) == 1 and not kwargs and isinstance(args[0], RowSet):
+            return self._app.response_class(self.iter_encode(args[0]), mimetype=self.mimetype)
+        return super().response(*args, **kwargs)
+
+    def iter_encode(self, rowset: RowSet):
+        """Yield the rowset as a JSON array, STREAM_BATCH rows per chunk."""
+        columns, rows = rowset.columns, rowset.rows
+        if HAVE_ORJSON:
+            options = self._options()
+            encode = lambda batch: orjson.dumps(batch, default=self.default, option=options)
+        else:
+            encode = lambda batch: self.dumps(batch, separators=(',', ':')).encode()
+        yield b'['
+        for start in range(0, len(rows), STREAM_BATCH):
+            chunk = encode([dict(zip(columns, row)) for row in rows[start:start + STREAM_BATCH]])
+            yield (b',' if start else b'') + chunk[1:-1]
+        yield b']\n'
+
+
+def _benchmark(n: int = 50000):
+    import random
+    import time
+    import tracemalloc
+    from datetime import datetime, timedelta
+    from flask import Flask
+
+    rng = random.Random(7)
+    columns = ('id', 'status', 'apply_date', 'room_number', 'student_id', 'student_number', 'first_name',
+               'last_name', 'email', 'residence_id', 'residence_name', 'block', 'on_campus')
+    started_at = datetime(2025, 1, 6, 8, 0)
+
+    def fetch():
+        # What the cursor hands back: one tuple per row
+        return [(i, rng.choice(('Pending', 'Approved', 'Accepted', 'Rejected')), started_at + timedelta(minutes=i),
+                 None, i, str(20000000 + i), f"First{i}", 'Mbatha', f"{20000000 + i}@mvula.univen.ac.za",
+                 i % 40, 'DBSA Male', f"M-{i % 8}", 1) for i in range(n)]
+
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = FastJSONProvider(app)
+
+    def dict_rows():
+        rows = [dict(zip(columns, row)) for row in fetch()]
+        return default_provider.dumps(rows, separators=(',', ':')).encode()
+
+    def rowset_stream():
+        body = fast_provider.iter_encode(RowSet(columns, fetch()))
+        return sum(len(chunk) for chunk in body)
+
+    print(f"{n} application rows, encoder: {'orjson' if HAVE_ORJSON else 'stdlib json'}")
+    for label, run in (('dict rows + stdlib jsonify', dict_rows), ('RowSet + streamed provider', rowset_stream)):
+        tracemalloc.start()
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label}: {elapsed * 1000:.0f} ms, peak {peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == '__main__':
+    _benchmark()
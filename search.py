@@ -0,0 +1,211 @@
+"""
+In-memory admin search over students and their applications.
+
+Every student becomes one document (student number, name, email, program and the
+residences they applied to). Tokens go into a sorted list for prefix lookups
+(bisect) and a trigram map for typo-tolerant matches. The index is built once
+at startup and patched as students and applications are written; until it is
+ready the search endpoint falls back to MySQL FULLTEXT.
+
+Run `python search.py` for a 50k-student benchmark.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+
+TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+# No status: it changes with writes the index never sees, so the search endpoint reads it from storage
+DOC_FIELDS = ('id', 'student_number', 'first_name', 'last_name', 'email', 'program')
+MIN_TRIGRAM_SIMILARITY = 0.4
+
+
+def tokenize(text) -> list:
+    return [t for t in TOKEN_SPLIT.split(str(text or '').lower()) if t]
+
+
+def trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StudentSearchIndex:
+    def __init__(self):
+        self.ready = False
+        self._docs = {}            # student id -> document dict
+        self._doc_tokens = {}      # student id -> set of tokens
+        self._postings = {}        # token -> set of student ids
+        self._keys = []            # sorted tokens, for prefix scans
+        self._trigrams = {}        # trigram -> set of tokens
+        self._lock = threading.RLock()
+
+    # ---------------- BUILD / UPDATE ----------------
+    def build(self, students: list, applications: list):
+        """Replace the index contents. applications need student_id, residence_name, block."""
+        residences = {}
+        for a in applications:
+            residences.setdefault(a['student_id'], set()).add(self._residence_label(a))
+        fresh = StudentSearchIndex()
+        for s in students:
+            fresh._add(s, residences.get(s['id'], ()))
+        fresh._keys = sorted(fresh._postings)
+        with self._lock:
+            self._docs, self._doc_tokens = fresh._docs, fresh._doc_tokens
+            self._postings, self._keys, self._trigrams = fresh._postings, fresh._keys, fresh._trigrams
+            self.ready = True
+
+    def upsert_student(self, student: dict, applications: list | None = None):
+        """
+        Add or refresh a student's document. applications (rows with residence_name, block)
+        replace the residences it is found by; without them the indexed ones are kept.
+        """
+        with self._lock:
+            if applications is None:
+                residences = self._docs.get(student['id'], {}).get('residences', ())
+            else:
+                residences = {self._residence_label(a) for a in applications}
+            self._remove(student['id'])
+            for token in self._add(student, residences):
+                self._insort_key(token)
+
+    @staticmethod
+    def _residence_label(row) -> str:
+        name = (row.get('residence_name') or '').strip()
+        block = (row.get('block') or '').strip()
+        return f"{name} - {block}" if block else name
+
+    def _add(self, student: dict, residences) -> list:
+        doc = {field: student.get(field) for field in DOC_FIELDS}
+        doc['residences'] = sorted(residences)
+        tokens = set()
+        for field in ('student_number', 'first_name', 'last_name', 'program'):
+            tokens.update(tokenize(doc[field]))
+        if doc['email']:
+            # Index the mailbox and the full address, not the shared domain words
+            email = str(doc['email']).lower()
+            tokens.update(tokenize(email.split('@')[0]))
+            tokens.add(email)
+        for label in doc['residences']:
+            tokens.update(tokenize(label))
+
+        new_tokens = []
+        self._docs[doc['id']] = doc
+        self._doc_tokens[doc['id']] = tokens
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                new_tokens.append(token)
+                for tri in trigrams(token):
+                    self._trigrams.setdefault(tri, set()).add(token)
+            ids.add(doc['id'])
+        return new_tokens
+
+    def _remove(self, student_id):
+        for token in self._doc_tokens.pop(student_id, ()):
+            ids = self._postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(student_id)
+            if not ids:
+                del self._postings[token]
+                i = bisect.bisect_left(self._keys, token)
+                if i < len(self._keys) and self._keys[i] == token:
+                    del self._keys[i]
+                for tri in trigrams(token):
+                    bucket = self._trigrams.get(tri)
+                    if bucket:
+                        bucket.discard(token)
+        self._docs.pop(student_id, None)
+
+    def _insort_key(self, token):
+        i = bisect.bisect_left(self._keys, token)
+        if i == len(self._keys) or self._keys[i] != token:
+            self._keys.insert(i, token)
+
+    # ---------------- QUERY ----------------
+    def _prefix_matches(self, term: str) -> dict:
+        """student id -> best score for tokens starting with term (exact match scores highest)."""
+        scores = {}
+        i = bisect.bisect_left(self._keys, term)
+        while i < len(self._keys) and self._keys[i].startswith(term):
+            token = self._keys[i]
+            score = 3.0 if token == term else 2.0
+            for sid in self._postings[token]:
+                if scores.get(sid, 0) < score:
+                    scores[sid] = score
+            i += 1
+        return scores
+
+    def _fuzzy_matches(self, term: str) -> dict:
+        grams = trigrams(term)
+        overlap = {}
+        for tri in grams:
+            for token in self._trigrams.get(tri, ()):
+                overlap[token] = overlap.get(token, 0) + 1
+        scores = {}
+        for token, shared in overlap.items():
+            similarity = shared / (len(grams) + len(trigrams(token)) - shared)
+            if similarity < MIN_TRIGRAM_SIMILARITY:
+                continue
+            for sid in self._postings.get(token, ()):
+                if scores.get(sid, 0) < similarity:
+                    scores[sid] = similarity
+        return scores
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Top-k documents matching every query term (by prefix, else by trigram similarity)."""
+        query = (query or '').strip().lower()
+        # An email address is matched as a whole against the indexed full addresses
+        terms = [query] if '@' in query else tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            total = None
+            for term in terms:
+                scores = self._prefix_matches(term) or self._fuzzy_matches(term)
+                if total is None:
+                    total = scores
+                else:
+                    total = {sid: total[sid] + s for sid, s in scores.items() if sid in total}
+                if not total:
+                    return []
+            best = heapq.nlargest(limit, total.items(), key=lambda item: item[1])
+            return [dict(self._docs[sid], score=round(score, 3)) for sid, score in best]
+
+
+def _benchmark(n: int = 50000, queries: int = 2000):
+    import random
+    rng = random.Random(7)
+    first = ['Amokelane', 'Dakalo', 'Katlego', 'Tsetselelo', 'Phumlani', 'Survive', 'Ntando', 'Siphesihle', 'Mulungisi', 'Thabo', 'Mutangwa']
+    last = ['Bele', 'Makhavhu', 'Mamphekgo', 'Masangu', 'Mbatha', 'Motupa', 'Nhlengethwa', 'Phakathi', 'Rikhotso', 'Masuku', 'Rambuda']
+    res = ['DBSA Male', 'New Male', 'F3', 'Lost City Boys', 'DBSA Female', 'New Female', 'Lost City Girls', 'F5']
+    students = []
+    for i in range(n):
+        number = str(20000000 + i)
+        students.append({'id': i + 1, 'student_number': number, 'first_name': f"{rng.choice(first)}{i % 97}",
+                         'last_name': rng.choice(last), 'email': f"{number}@mvula.univen.ac.za",
+                         'program': 'Computer Science'})
+    applications = [{'student_id': s['id'], 'residence_name': rng.choice(res), 'block': f"M-{rng.randint(1, 8)}"}
+                     for s in students for _ in range(2)]
+    index = StudentSearchIndex()
+    started = time.perf_counter()
+    index.build(students, applications)
+    print(f"build: {n} students in {time.perf_counter() - started:.2f}s")
+
+    samples = [rng.choice(students) for _ in range(queries)]
+    cases = {
+        'student number prefix': [s['student_number'][:6] for s in samples],
+        'full name': [f"{s['first_name']} {s['last_name']}" for s in samples],
+        'fuzzy surname': [s['last_name'][:-1] + 'x' for s in samples],
+    }
+    for label, qs in cases.items():
+        started = time.perf_counter()
+        for q in qs:
+            index.search(q, 20)
+        print(f"{label}: {(time.perf_counter() - started) / len(qs) * 1000:.3f} ms/query")
+
+
+if __name__ == '__main__':
+    _benchmark()
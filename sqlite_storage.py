@@ -0,0 +1,441 @@
+"""
+The SQLite storage backend (DB_BACKEND=sqlite, file at DB_SQLITE_PATH), see storage.py.
+"""
+import atexit
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash
+
+import logs
+from intake import current_cycle
+from rowset import RowSet
+from storage import Storage, page_filters
+
+SQLITE_PATH = os.getenv('DB_SQLITE_PATH', 'univen_accommodation.sqlite3')
+
+log = logging.getLogger('storage')
+
+# Stored as ISO text ('YYYY-MM-DD HH:MM:SS'); read back as datetimes like MySQL returns them
+DATETIME_COLUMNS = frozenset(('created_at', 'apply_date', 'applied_date'))
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS residences (
+    id INTEGER PRIMARY KEY,
+    residence_name TEXT NOT NULL COLLATE NOCASE,
+    block TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    on_campus INTEGER DEFAULT 1,
+    residence_type TEXT DEFAULT 'offcamp',
+    available_rooms INTEGER DEFAULT 0,
+    restrictions TEXT,
+    UNIQUE (residence_name, block)
+);
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    student_number TEXT UNIQUE,
+    password TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    email TEXT,
+    phone TEXT,
+    address TEXT,
+    gender TEXT DEFAULT 'other',
+    id_number TEXT,
+    program TEXT,
+    year_of_study INTEGER,
+    gpa REAL,
+    distance REAL,
+    status TEXT DEFAULT 'waitlisted',
+    assigned_residence TEXT,
+    room_number TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS applications (
+    id INTEGER PRIMARY KEY,
+    intake_cycle INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    residence_id INTEGER NOT NULL,
+    status TEXT DEFAULT 'Pending',
+    apply_date DATETIME,
+    room_number TEXT,
+    UNIQUE (student_id, intake_cycle, residence_id)
+);
+CREATE INDEX IF NOT EXISTS idx_app_cycle_residence_status ON applications (intake_cycle, residence_id, status);
+CREATE INDEX IF NOT EXISTS idx_app_cycle_apply_date ON applications (intake_cycle, apply_date);
+CREATE INDEX IF NOT EXISTS idx_app_cycle_student ON applications (intake_cycle, student_id, apply_date);
+"""
+
+
+class SQLiteStorage(Storage):
+    """
+    The same schema as MySQL (minus partitions, the archive and the analytics tables) in SQLite.
+    Each thread gets its own connection; WAL mode lets reads run alongside the single writer,
+    and application inserts take the write lock up front (BEGIN IMMEDIATE) so the on-campus
+    limit check and the inserts are atomic.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = SQLITE_PATH):
+        super().__init__()
+        if path == ':memory:':
+            # Every thread needs its own connection to the same database. A shared-cache in-memory
+            # database locks whole tables and fails concurrent writers instead of waiting, so
+            # ':memory:' is a file in a temporary directory, removed at exit
+            directory = tempfile.mkdtemp(prefix='storage-')
+            atexit.register(shutil.rmtree, directory, True)
+            path = os.path.join(directory, 'storage.sqlite3')
+        self.path = path
+        self._local = threading.local()
+        self._connection.executescript(SQLITE_SCHEMA)
+
+    def _connect(self):
+        # Datetimes are converted per connection: sqlite3.register_adapter/register_converter are
+        # process-wide and would change every other sqlite3 user in the process
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        connection.row_factory = _datetime_row_factory()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _execute(self, query: str, params=()):
+        started = time.perf_counter()
+        try:
+            return self._connection.execute(query, params)
+        finally:
+            logs.add_timing('db', time.perf_counter() - started)
+
+    def _rows(self, query: str, params=()) -> list | None:
+        try:
+            cursor = self._execute(query, params)
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except sqlite3.Error as err:
+            log.error("database query error", extra={'error': str(err)})
+            return None
+
+    def _row(self, query: str, params=()):
+        rows = self._rows(query, params)
+        return rows[0] if rows else None
+
+    def _rowset(self, query: str, params=()) -> RowSet:
+        try:
+            cursor = self._execute(query, params)
+            return RowSet([d[0] for d in cursor.description], cursor.fetchall())
+        except sqlite3.Error as err:
+            log.error("database query error", extra={'error': str(err)})
+            return RowSet((), [])
+
+    def close_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    # ---------------- STUDENTS ----------------
+    def get_student_by_number(self, student_number):
+        return self._row("SELECT * FROM students WHERE student_number = ?", (str(student_number),))
+
+    def get_student_by_id(self, student_id):
+        return self._row("SELECT * FROM students WHERE id = ?", (student_id,))
+
+    def get_all_students(self) -> RowSet:
+        return self._rowset("SELECT * FROM students")
+
+    def get_students_page(self, limit: int, before_id: int | None = None, program: str | None = None,
+                          student_ids: list | None = None) -> RowSet:
+        where, params = page_filters('id', before_id, (('program', program),), 'id', student_ids, '?')
+        return self._rowset(f"SELECT {', '.join(self.SUMMARY_PROFILE_FIELDS)} FROM students {where} "
+                            f"ORDER BY id DESC LIMIT ?", params + (limit,))
+
+    def get_student_facets(self) -> dict:
+        total = self._row("SELECT COUNT(*) AS n FROM students")
+        programs = self._rows("SELECT DISTINCT program FROM students WHERE program IS NOT NULL ORDER BY program")
+        return {'total': total['n'] if total else 0, 'programs': [row['program'] for row in programs or []]}
+
+    def bulk_upsert_students(self, rows: list) -> int | None:
+        if not rows:
+            return 0
+        columns = self.STUDENT_IMPORT_COLUMNS
+        updates = ", ".join(f"{c}=excluded.{c}" for c in columns if c not in ('student_number', 'password'))
+        connection = self._connection
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                f"INSERT INTO students ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (student_number) DO UPDATE SET {updates}",
+                [tuple(str(v) if c == 'student_number' else v for c, v in zip(columns, row)) for row in rows]
+            )
+            connection.execute("COMMIT")
+            return len(rows)
+        except sqlite3.Error as err:
+            log.error("student bulk upsert failed", extra={'error': str(err)})
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            return None
+
+    def update_student_password(self, student_id, plain_password) -> bool:
+        try:
+            self._execute("UPDATE students SET password = ? WHERE id = ?", (generate_password_hash(plain_password), student_id))
+            return True
+        except sqlite3.Error as err:
+            log.error("password update failed", extra={'error': str(err)})
+            return False
+
+    def get_student_summary(self, student_id: int):
+        profile = ", ".join(f"s.{col}" for col in self.SUMMARY_PROFILE_FIELDS)
+        rows = self._rows(f"""
+        SELECT {profile},
+               a.id AS application_id, a.status AS application_status, a.apply_date AS applied_date,
+               a.room_number AS application_room, r.id AS residence_id, r.residence_name, r.block,
+               r.on_campus, r.residence_type
+        FROM students s
+        LEFT JOIN applications a ON a.student_id = s.id AND a.intake_cycle = ?
+        LEFT JOIN residences r ON r.id = a.residence_id
+        WHERE s.id = ?
+        ORDER BY a.apply_date DESC
+        """, (current_cycle(), student_id))
+        if not rows:
+            return None
+        return {
+            'student': {col: rows[0][col] for col in self.SUMMARY_PROFILE_FIELDS},
+            'applications': [
+                {'id': row['application_id'], 'residence_id': row['residence_id'],
+                 'residence_name': row['residence_name'], 'block': row['block'], 'on_campus': row['on_campus'],
+                 'residence_type': row['residence_type'], 'status': row['application_status'],
+                 'applied_date': row['applied_date'], 'room_number': row['application_room']}
+                for row in rows if row['application_id'] is not None
+            ]
+        }
+
+    # ---------------- RESIDENCES ----------------
+    def get_residences(self, on_campus: bool | None = None, residence_type: str | None = None) -> RowSet:
+        clauses, params = [], []
+        if on_campus is not None:
+            clauses.append("on_campus = ?")
+            params.append(int(bool(on_campus)))
+        if residence_type:
+            clauses.append("residence_type = ?")
+            params.append(residence_type)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return self._rowset(f"SELECT * FROM residences{where} ORDER BY residence_name, block", params)
+
+    def get_residence_by_id(self, residence_id: int):
+        return self._row("SELECT * FROM residences WHERE id = ?", (residence_id,))
+
+    def _residence_by_key(self, residence_name: str, block: str | None):
+        if block is None:
+            return self._row("SELECT * FROM residences WHERE residence_name = ? ORDER BY id LIMIT 1", (residence_name,))
+        return self._row("SELECT * FROM residences WHERE residence_name = ? AND block = ?", (residence_name, block))
+
+    def bulk_upsert_residences(self, residences: list, update_existing: bool = False) -> list | None:
+        parsed = self._parse_residences(residences)
+        rows = [row for row in parsed if row is not None]
+        if not rows:
+            return [None] * len(parsed)
+        if update_existing:
+            conflict = ("DO UPDATE SET on_campus=excluded.on_campus, residence_type=excluded.residence_type, "
+                        "available_rooms=excluded.available_rooms, restrictions=excluded.restrictions")
+        else:
+            conflict = "DO NOTHING"
+        connection = self._connection
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO residences (residence_name, block, on_campus, residence_type, available_rooms, restrictions) "
+                f"VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (residence_name, block) {conflict}",
+                rows
+            )
+            ids = [connection.execute("SELECT id FROM residences WHERE residence_name = ? AND block = ?",
+                                      (row[0], row[1])).fetchone()[0] if row else None for row in parsed]
+            connection.execute("COMMIT")
+            return ids
+        except sqlite3.Error as err:
+            log.error("residence upsert failed", extra={'error': str(err)})
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            return None
+
+    # ---------------- APPLICATIONS ----------------
+    def count_accepted_for_residence(self, residence_id: int, intake_cycle: int | None = None) -> int:
+        row = self._row("SELECT COUNT(*) AS count FROM applications WHERE intake_cycle = ? AND residence_id = ? "
+                        "AND status = 'Accepted'", (intake_cycle or current_cycle(), residence_id))
+        return int(row['count']) if row else 0
+
+    def get_student_applications(self, student_id, intake_cycle: int | None = None):
+        return self._rows("""
+        SELECT a.id, r.residence_name, r.block, r.on_campus, a.status, a.apply_date AS applied_date, a.room_number
+        FROM applications a
+        JOIN residences r ON r.id = a.residence_id
+        WHERE a.student_id = ? AND a.intake_cycle = ?
+        ORDER BY a.apply_date DESC
+        """, (student_id, intake_cycle or current_cycle())) or []
+
+    def get_all_applications(self, intake_cycle: int | None = None) -> RowSet:
+        return self._rowset("""
+        SELECT a.id, a.intake_cycle, a.status, a.apply_date, a.room_number,
+               s.id AS student_id, s.student_number, s.first_name, s.last_name, s.email,
+               r.id AS residence_id, r.residence_name, r.block, r.on_campus
+        FROM applications a
+        JOIN students s ON s.id = a.student_id
+        JOIN residences r ON r.id = a.residence_id
+        WHERE a.intake_cycle = ?
+        ORDER BY a.apply_date DESC
+        """, (intake_cycle or current_cycle(),))
+
+    def get_applications_page(self, limit: int, before_id: int | None = None, status: str | None = None,
+                              student_ids: list | None = None, intake_cycle: int | None = None) -> RowSet:
+        where, params = page_filters('a.id', before_id, (('a.intake_cycle', intake_cycle or current_cycle()),
+                                                          ('a.status', status)), 'a.student_id', student_ids, '?')
+        return self._rowset(f"""
+        SELECT a.id, a.intake_cycle, a.status, a.apply_date, a.room_number,
+               s.id AS student_id, s.student_number, s.first_name, s.last_name, s.email,
+               r.id AS residence_id, r.residence_name, r.block, r.on_campus
+        FROM applications a
+        JOIN students s ON s.id = a.student_id
+        JOIN residences r ON r.id = a.residence_id
+        {where}
+        ORDER BY a.id DESC LIMIT ?
+        """, params + (limit,))
+
+    def count_applications_by_status(self, intake_cycle: int | None = None) -> dict:
+        rows = self._rows("SELECT status, COUNT(*) AS n FROM applications WHERE intake_cycle = ? GROUP BY status",
+                          (intake_cycle or current_cycle(),))
+        return {row['status']: row['n'] for row in rows or []}
+
+    def count_existing_by_type(self, student_id: int, intake_cycle: int | None = None):
+        rows = self._rows("""
+        SELECT r.on_campus AS on_campus, COUNT(*) AS cnt
+        FROM applications a
+        JOIN residences r ON r.id = a.residence_id
+        WHERE a.intake_cycle = ? AND a.student_id = ?
+        GROUP BY r.on_campus
+        """, (intake_cycle or current_cycle(), student_id))
+        counts = {True: 0, False: 0}
+        for row in rows or []:
+            counts[bool(row['on_campus'])] = row['cnt']
+        return counts
+
+    def _insert_applications(self, student_id: int, cycle: int, residence_ids: list, on_campus: int):
+        connection = self._connection
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            existing_on = connection.execute("""
+                SELECT COUNT(*) FROM applications a JOIN residences r ON r.id = a.residence_id
+                WHERE a.intake_cycle = ? AND a.student_id = ? AND r.on_campus = 1
+                """, (cycle, student_id)).fetchone()[0]
+            if existing_on + on_campus > self.ON_CAMPUS_LIMIT:
+                connection.execute("ROLLBACK")
+                return False, f"On-campus application limit exceeded (max {self.ON_CAMPUS_LIMIT})", []
+            now = datetime.now().replace(microsecond=0).isoformat(' ')
+            created_ids = []
+            for residence_id in residence_ids:
+                cursor = connection.execute(
+                    "INSERT INTO applications (intake_cycle, student_id, residence_id, status, apply_date) "
+                    "VALUES (?, ?, ?, 'Pending', ?)", (cycle, student_id, residence_id, now))
+                created_ids.append(cursor.lastrowid)
+            connection.execute("COMMIT")
+            return True, None, created_ids
+        except sqlite3.IntegrityError:
+            connection.execute("ROLLBACK")
+            return False, "Duplicate application for the same residence", []
+        except sqlite3.Error as err:
+            log.error("application create failed", extra={'error': str(err)})
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            return False, "Internal error creating applications", []
+
+    def update_application_status(self, application_id: int, status: str, room_number: str = None,
+                                  intake_cycle: int | None = None) -> bool:
+        cycle = intake_cycle or current_cycle()
+        try:
+            if room_number is not None:
+                cursor = self._execute("UPDATE applications SET status = ?, room_number = ? WHERE id = ? AND intake_cycle = ?",
+                                       (status, room_number, application_id, cycle))
+            else:
+                cursor = self._execute("UPDATE applications SET status = ? WHERE id = ? AND intake_cycle = ?",
+                                       (status, application_id, cycle))
+            return cursor.rowcount > 0
+        except sqlite3.Error as err:
+            log.error("database query error", extra={'error': str(err)})
+            return False
+
+    def get_application_with_details(self, application_id: int, intake_cycle: int | None = None, fresh: bool = False):
+        return self._row("""
+        SELECT a.id, a.intake_cycle, a.status, a.apply_date, a.room_number,
+               s.id AS student_id, s.first_name, s.last_name, s.email, s.student_number,
+               r.id AS residence_id, r.residence_name, r.block, r.on_campus
+        FROM applications a
+        JOIN students s ON s.id = a.student_id
+        JOIN residences r ON r.id = a.residence_id
+        WHERE a.intake_cycle = ? AND a.id = ?
+        """, (intake_cycle or current_cycle(), application_id))
+
+    def get_accepted_offcampus_students(self, residence_id: int, intake_cycle: int | None = None):
+        return self._rows("""
+        SELECT s.id, s.first_name, s.last_name, s.email, s.student_number
+        FROM applications a
+        JOIN students s ON s.id = a.student_id
+        JOIN residences r ON r.id = a.residence_id
+        WHERE a.intake_cycle = ? AND a.status = 'Accepted' AND r.on_campus = 0 AND r.id = ?
+        ORDER BY s.last_name, s.first_name
+        """, (intake_cycle or current_cycle(), residence_id)) or []
+
+    # ---------------- ALLOCATION ----------------
+    def get_allocation_snapshot(self, intake_cycle: int | None = None):
+        cycle = intake_cycle or current_cycle()
+        pending = """
+        FROM applications a
+        WHERE a.intake_cycle = ? AND a.status = 'Pending'
+          AND NOT EXISTS (SELECT 1 FROM applications x
+                          WHERE x.intake_cycle = a.intake_cycle AND x.student_id = a.student_id AND x.status = 'Accepted')
+        """
+        try:
+            applications = self._execute(
+                f"SELECT a.student_id, a.residence_id {pending} ORDER BY a.student_id, a.apply_date, a.id", (cycle,)
+            ).fetchall()
+            students = self._execute(
+                f"SELECT s.id, s.gender, s.year_of_study, s.gpa, s.distance FROM students s "
+                f"WHERE s.id IN (SELECT a.student_id {pending})", (cycle,)
+            ).fetchall()
+            residences = self._execute("""
+            SELECT r.id, r.residence_name, r.block, r.available_rooms, COUNT(a.id)
+            FROM residences r
+            LEFT JOIN applications a ON a.intake_cycle = ? AND a.residence_id = r.id AND a.status = 'Accepted'
+            GROUP BY r.id
+            """, (cycle,)).fetchall()
+        except sqlite3.Error as err:
+            log.error("allocation snapshot read failed", extra={'error': str(err)})
+            return None
+        return {'applications': applications, 'students': students, 'residences': residences}
+
+
+def _datetime_row_factory():
+    """A row factory for one connection that turns the DATETIME_COLUMNS text back into datetimes."""
+    last = [None, ()]  # the cursor description seen last and its DATETIME column indexes
+
+    def factory(cursor, row):
+        description = cursor.description
+        if description is not last[0]:
+            last[:] = description, [i for i, d in enumerate(description) if d[0] in DATETIME_COLUMNS]
+        if not last[1]:
+            return row
+        values = list(row)
+        for i in last[1]:
+            if isinstance(values[i], str):
+                values[i] = datetime.fromisoformat(values[i])
+        return tuple(values)
+    return factory
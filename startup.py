@@ -0,0 +1,73 @@
+"""
+Worker start-up timing.
+
+`app.py` calls `begin()` before its other imports and `finish()` once the app
+object is ready. With STARTUP_REPORT=1 in the environment, the time spent in
+each top-level import (nested imports are counted under the module that
+triggered them) and in each marked stage is printed on boot. Without it, both
+calls are no-ops.
+
+`python startup.py` imports the app with the report enabled.
+"""
+import builtins
+import os
+import sys
+import threading
+import time
+
+_original_import = builtins.__import__
+_enabled = False
+_started = 0.0
+_depth = 0
+_imports = {}   # module name -> seconds spent importing it (first import only)
+_stages = []    # (label, seconds since begin())
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    global _depth
+    if _depth or level or threading.current_thread() is not threading.main_thread():
+        return _original_import(name, globals, locals, fromlist, level)
+    if name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    _depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _depth -= 1
+        _imports[name] = _imports.get(name, 0) + time.perf_counter() - started
+
+
+def begin():
+    global _enabled, _started
+    if os.getenv('STARTUP_REPORT', '').lower() not in ('1', 'true', 'yes', 'on'):
+        return
+    _enabled = True
+    _started = time.perf_counter()
+    builtins.__import__ = _timed_import
+
+
+def mark(label: str):
+    if _enabled:
+        _stages.append((label, time.perf_counter() - _started))
+
+
+def finish():
+    """Stop timing imports and print the report."""
+    global _enabled
+    if not _enabled:
+        return
+    builtins.__import__ = _original_import
+    _enabled = False
+    total = time.perf_counter() - _started
+    print(f"⏱️ Startup {total * 1000:.1f} ms (imports {sum(_imports.values()) * 1000:.1f} ms)")
+    for name, seconds in sorted(_imports.items(), key=lambda item: item[1], reverse=True):
+        if seconds >= 0.0005:
+            print(f"   import {name:<28} {seconds * 1000:8.1f} ms")
+    for label, at in _stages:
+        print(f"   {label:<35} at {at * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    os.environ['STARTUP_REPORT'] = '1'
+    import app  # noqa: F401  (app.py calls begin()/finish())
@@ -0,0 +1,611 @@
+"""
+Storage backends.
+
+`Storage` is the data surface the app, the allocation simulator and the
+import tools rely on: students, residences, applications, status updates and
+the stats built from them. Three backends implement it:
+
+    mysql    database.Database: the production backend (pool, replicas,
+             circuit breaker, partitioned applications, event rollups)
+    sqlite   sqlite_storage.SQLiteStorage: one database file, or a throwaway
+             one with DB_SQLITE_PATH=:memory:
+    memory   memory_storage.MemoryStorage: dicts with hash indexes, no SQL
+             at all
+
+`open_storage()` returns the backend named by DB_BACKEND (default mysql),
+one instance per process. SQLite and memory exist for tests, CI load tests
+and profiling on a laptop with no MySQL server, so some features are left to
+MySQL. There are no read replicas, and the idempotency store lives in the
+process. Application events are accepted and discarded, so trends and demand
+analytics come back empty. Set DB_MEMORY_SEED=<students> to start the memory
+backend with a synthetic intake.
+
+    python storage.py seed --backend sqlite --students 20000
+    python storage.py bench [--students 100000] [--backends memory,sqlite,mysql]
+
+`bench` fills each local backend with the same synthetic intake (MySQL is
+only read, never filled) and times the hot reads, a status update, the admin
+list and an allocation snapshot plus simulation.
+"""
+import os
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash
+
+import logs
+import readcache
+from eligibility import check_eligibility
+from intake import current_cycle
+from rowset import RowSet
+
+BACKENDS = ('mysql', 'sqlite', 'memory')
+BLOCK_PATTERN = re.compile(r"^([A-Za-z]+)[\s-]?([0-9]+)$")  # M5 / M 5 -> M-5
+
+
+class Storage(ABC):
+    """The backend interface, plus the logic every backend shares. Rows are dicts; list reads return RowSets."""
+
+    name = 'abstract'
+
+    STUDENT_COLUMNS = (
+        'id', 'student_number', 'password', 'first_name', 'last_name', 'email', 'phone', 'address', 'gender',
+        'id_number', 'program', 'year_of_study', 'gpa', 'distance', 'status', 'assigned_residence', 'room_number',
+        'created_at'
+    )
+    RESIDENCE_COLUMNS = ('id', 'residence_name', 'block', 'on_campus', 'residence_type', 'available_rooms', 'restrictions')
+    APPLICATION_COLUMNS = ('id', 'intake_cycle', 'student_id', 'residence_id', 'status', 'apply_date', 'room_number')
+    # get_all_applications: one row per application with its student and residence
+    APPLICATION_LIST_COLUMNS = (
+        'id', 'intake_cycle', 'status', 'apply_date', 'room_number', 'student_id', 'student_number', 'first_name',
+        'last_name', 'email', 'residence_id', 'residence_name', 'block', 'on_campus'
+    )
+    STUDENT_IMPORT_COLUMNS = (
+        'student_number', 'password', 'first_name', 'last_name', 'email', 'phone', 'address',
+        'gender', 'id_number', 'program', 'year_of_study', 'gpa', 'distance'
+    )
+    SUMMARY_PROFILE_FIELDS = (
+        'id', 'student_number', 'first_name', 'last_name', 'email', 'phone', 'gender', 'program',
+        'year_of_study', 'gpa', 'distance', 'status', 'assigned_residence', 'room_number', 'created_at'
+    )
+    ON_CAMPUS_LIMIT = 2
+
+    def __init__(self):
+        self._idempotency = {}   # (scope, key) -> record dict with 'expires'
+        self._idempotency_lock = threading.Lock()
+
+    # ---------------- REQUEST LIFECYCLE ----------------
+    # Replica routing and pooling are MySQL concerns; the embedded backends have nothing to do
+    def warm_up(self):
+        pass
+
+    def begin_request(self, last_write_at: float | None = None):
+        pass
+
+    def end_request(self) -> bool:
+        return False
+
+    def health(self) -> dict:
+        return {'status': 'ok', 'backend': self.name, 'database': None, 'replicas': []}
+
+    def close_connection(self):
+        pass
+
+    # ---------------- STUDENTS ----------------
+    @abstractmethod
+    def get_student_by_number(self, student_number):
+        ...
+
+    @abstractmethod
+    def get_student_by_id(self, student_id):
+        ...
+
+    @abstractmethod
+    def get_all_students(self) -> RowSet:
+        ...
+
+    @abstractmethod
+    def get_students_page(self, limit: int, before_id: int | None = None, program: str | None = None,
+                          student_ids: list | None = None) -> RowSet:
+        """Up to `limit` students (SUMMARY_PROFILE_FIELDS) with id below before_id, newest first."""
+
+    @abstractmethod
+    def get_student_facets(self) -> dict:
+        """{'total': student count, 'programs': sorted distinct programs}, for the admin filters."""
+
+    @abstractmethod
+    def bulk_upsert_students(self, rows: list) -> int | None:
+        """rows: tuples ordered as STUDENT_IMPORT_COLUMNS; existing students keep their password."""
+
+    @abstractmethod
+    def update_student_password(self, student_id, plain_password) -> bool:
+        ...
+
+    def student_number_is_unique(self) -> bool:
+        """Whether the store enforces unique student numbers; bulk_upsert_students relies on it."""
+        return True
+
+    def migrate_unique_student_numbers(self) -> bool:
+        return True
+
+    @abstractmethod
+    def get_student_summary(self, student_id: int):
+        """{'student': profile without the password hash, 'applications': current cycle with residence details}."""
+
+    def search_students_fulltext(self, term: str, limit: int = 20):
+        """Substring match on number, names and email (MySQL uses its FULLTEXT index instead)."""
+        words = [w.lower() for w in re.split(r"[^0-9A-Za-z@.]+", term or '') if w]
+        if not words:
+            return []
+        fields = ('student_number', 'first_name', 'last_name', 'email')
+        matches = []
+        for student in self.get_all_students():
+            text = ' '.join(str(student[f] or '') for f in fields).lower()
+            if all(w in text for w in words):
+                matches.append({k: student[k] for k in ('id', 'student_number', 'first_name', 'last_name',
+                                                         'email', 'program', 'status')} | {'score': len(words)})
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def get_search_documents(self):
+        """Students plus the residences they applied to, for building the admin search index."""
+        students = [{k: s[k] for k in ('id', 'student_number', 'first_name', 'last_name', 'email', 'program')}
+                    for s in self.get_all_students()]
+        applications = [{'student_id': a['student_id'], 'residence_name': a['residence_name'], 'block': a['block']}
+                        for a in self.get_all_applications()]
+        return students, applications
+
+    # ---------------- RESIDENCES ----------------
+    @abstractmethod
+    def get_residences(self, on_campus: bool | None = None, residence_type: str | None = None) -> RowSet:
+        ...
+
+    @abstractmethod
+    def get_residence_by_id(self, residence_id: int):
+        ...
+
+    @abstractmethod
+    def bulk_upsert_residences(self, residences: list, update_existing: bool = False) -> list | None:
+        """
+        Insert by (residence_name, block), case-insensitively. Returns ids in input order, with None
+        for an entry _parse_residences rejects, or None on failure.
+        """
+
+    def residence_block_is_unique(self) -> bool:
+        """Whether the store enforces unique (residence_name, block); bulk_upsert_residences relies on it."""
+        return True
+
+    def migrate_unique_residence_blocks(self) -> bool:
+        return True
+
+    def migrate_application_limits(self) -> bool:
+        return True
+
+    def migrate_demand_cycles(self) -> bool:
+        return True
+
+    @abstractmethod
+    def _residence_by_key(self, residence_name: str, block: str | None):
+        """The residence with this name and block (any block when block is None), or None."""
+
+    def upsert_residence(self, residence_name: str, block: str = "", on_campus: bool = False,
+                         residence_type: str = 'offcamp', available_rooms: int = 0,
+                         restrictions: str = '') -> int | None:
+        ids = self.bulk_upsert_residences([{
+            'residence_name': residence_name, 'block': block, 'on_campus': on_campus,
+            'residence_type': residence_type, 'available_rooms': available_rooms,
+            'restrictions': restrictions
+        }])
+        return ids[0] if ids else None
+
+    def find_residence(self, residence_name: str, block: str = ""):
+        name = (residence_name or '').strip()
+        normalized_block = (block or '').strip()
+        if normalized_block:
+            res = self._residence_by_key(name, normalized_block)
+            if res:
+                return res
+            m = BLOCK_PATTERN.match(normalized_block)
+            if m:
+                res = self._residence_by_key(name, f"{m.group(1)}-{m.group(2)}")
+                if res:
+                    return res
+        # Residences like 'F3' have no blocks: fall back to the name alone
+        return self._residence_by_key(name, None)
+
+    def _parse_residences(self, residences: list) -> list:
+        """
+        One (name, block, on_campus, type, rooms, restrictions) tuple per entry, in input order;
+        None for an entry that is not a dict, has no name, or has a non-numeric or negative room count.
+        """
+        rows = []
+        for r in residences:
+            name = (r.get('residence_name') or '').strip() if isinstance(r, dict) else ''
+            try:
+                available_rooms = int(r.get('available_rooms') or 0) if name else -1
+            except (TypeError, ValueError):
+                available_rooms = -1
+            if available_rooms < 0:
+                rows.append(None)
+                continue
+            rows.append((
+                name,
+                (r.get('block') or '').strip(),
+                bool(r.get('on_campus', False)),
+                r.get('residence_type') or 'offcamp',
+                available_rooms,
+                r.get('restrictions') or ''
+            ))
+        return rows
+
+    # ---------------- APPLICATIONS ----------------
+    @abstractmethod
+    def count_accepted_for_residence(self, residence_id: int, intake_cycle: int | None = None) -> int:
+        ...
+
+    @abstractmethod
+    def get_student_applications(self, student_id, intake_cycle: int | None = None):
+        ...
+
+    @abstractmethod
+    def get_all_applications(self, intake_cycle: int | None = None) -> RowSet:
+        ...
+
+    @abstractmethod
+    def get_applications_page(self, limit: int, before_id: int | None = None, status: str | None = None,
+                              student_ids: list | None = None, intake_cycle: int | None = None) -> RowSet:
+        """Up to `limit` rows shaped like get_all_applications with id below before_id, newest first."""
+
+    @abstractmethod
+    def count_applications_by_status(self, intake_cycle: int | None = None) -> dict:
+        ...
+
+    @abstractmethod
+    def count_existing_by_type(self, student_id: int, intake_cycle: int | None = None):
+        ...
+
+    @abstractmethod
+    def update_application_status(self, application_id: int, status: str, room_number: str = None,
+                                  intake_cycle: int | None = None) -> bool:
+        ...
+
+    @abstractmethod
+    def get_application_with_details(self, application_id: int, intake_cycle: int | None = None, fresh: bool = False):
+        """fresh=True skips any cache or replica; use it when the answer decides a write."""
+
+    @abstractmethod
+    def get_accepted_offcampus_students(self, residence_id: int, intake_cycle: int | None = None):
+        ...
+
+    @abstractmethod
+    def _insert_applications(self, student_id: int, cycle: int, residence_ids: list, on_campus: int):
+        """
+        Atomically check the student's on-campus count for the cycle and insert one Pending
+        application per residence. Returns (success, error, created_ids).
+        """
+
+    def create_applications_with_validation(self, student_id: int, selections: list):
+        """
+        selections: list of dicts with either {residence_id} or {residence_name, block}
+        Returns (success: bool, error: str | None, created_ids: list[int])
+        """
+        resolved = []
+        residences = []
+        for sel in selections:
+            residence_id = sel.get('residence_id')
+            if not residence_id:
+                name = sel.get('residence_name')
+                block = sel.get('block', '')
+                res = self.find_residence(name, block)
+                if not res:
+                    return False, f"Residence not found: {name} {block}", []
+            else:
+                res = self.get_residence_by_id(residence_id)
+                if not res:
+                    return False, f"Residence not found: id {residence_id}", []
+            resolved.append((res['id'], res['on_campus']))
+            residences.append(res)
+
+        # Reject residences the student's gender/year/program rules them out of
+        student = self.get_student_by_id(student_id)
+        if student:
+            for res in residences:
+                eligible, reason = check_eligibility(student, res)
+                if not eligible:
+                    return False, f"Not eligible: {reason}", []
+
+        # Only on-campus selections are limited
+        sel_on = sum(1 for _, oc in resolved if oc)
+        if sel_on > self.ON_CAMPUS_LIMIT:
+            return False, f"Cannot select more than {self.ON_CAMPUS_LIMIT} on-campus residences", []
+        return self._insert_applications(student_id, current_cycle(), [rid for rid, _ in resolved], sel_on)
+
+    def get_campaign_recipients(self, statuses: list, after_student_id: int = 0, limit: int = 500,
+                                intake_cycle: int | None = None):
+        """One row per matching application for the next `limit` students after after_student_id."""
+        if not statuses:
+            return []
+        wanted = set(statuses)
+        rows = [a for a in self.get_all_applications(intake_cycle)
+                if a['status'] in wanted and a['student_id'] > after_student_id]
+        rows.sort(key=lambda a: (a['student_id'], a['apply_date'] or datetime.min))
+        students = sorted({a['student_id'] for a in rows})[:limit]
+        last = students[-1] if students else None
+        return [{'student_id': a['student_id'], 'first_name': a['first_name'], 'last_name': a['last_name'],
+                 'email': a['email'], 'residence_name': a['residence_name'], 'block': a['block'], 'status': a['status']}
+                for a in rows if last is not None and a['student_id'] <= last]
+
+    # ---------------- ALLOCATION ----------------
+    @abstractmethod
+    def get_allocation_snapshot(self, intake_cycle: int | None = None):
+        """
+        {'applications': [(student_id, residence_id)] in preference order,
+         'students': [(id, gender, year_of_study, gpa, distance)],
+         'residences': [(id, residence_name, block, available_rooms, accepted_count)]}
+        for Pending applications of students without an accepted offer; None on failure.
+        """
+
+    # ---------------- IDEMPOTENCY ----------------
+    # In-process store: enough for one worker on an embedded backend
+    def get_idempotency_record(self, scope: str, idem_key: str):
+        with self._idempotency_lock:
+            record = self._idempotency.get((scope, idem_key))
+            if record is None or record['expires'] <= time.time():
+                return None
+            return dict(record)
+
+    def reserve_idempotency_key(self, scope: str, idem_key: str, fingerprint: str, ttl_seconds: int) -> bool:
+        now = time.time()
+        with self._idempotency_lock:
+            record = self._idempotency.get((scope, idem_key))
+            if record is not None and record['expires'] > now:
+                return False
+            self._idempotency[(scope, idem_key)] = {'request_fingerprint': fingerprint, 'status_code': None,
+                                                     'response_body': None, 'expires': now + ttl_seconds}
+            return True
+
+    def complete_idempotency_key(self, scope: str, idem_key: str, status_code: int, response_body: str) -> bool:
+        with self._idempotency_lock:
+            record = self._idempotency.get((scope, idem_key))
+            if record is None:
+                return False
+            record.update(status_code=status_code, response_body=response_body)
+            return True
+
+    def release_idempotency_key(self, scope: str, idem_key: str) -> bool:
+        with self._idempotency_lock:
+            record = self._idempotency.get((scope, idem_key))
+            if record is not None and record['status_code'] is None:
+                del self._idempotency[(scope, idem_key)]
+            return True
+
+    def purge_expired_idempotency_keys(self, batch_size: int = 1000) -> int:
+        now = time.time()
+        with self._idempotency_lock:
+            expired = [key for key, record in self._idempotency.items() if record['expires'] <= now][:batch_size]
+            for key in expired:
+                del self._idempotency[key]
+        return len(expired)
+
+    # ---------------- EVENTS AND ANALYTICS ----------------
+    # The event log and its rollups are MySQL-only: events are dropped and the reports are empty
+    def record_application_events(self, events: list) -> bool:
+        return True
+
+    def get_application_trends(self, granularity: str = 'day', since=None, residence_id: int | None = None):
+        return []
+
+    def get_demand_rows(self, intake_cycle: int | None = None):
+        return [(r['id'], r['residence_name'], r['block'], r['residence_type'], r['available_rooms'], None, None, None)
+                for r in self.get_residences()]
+
+    def rebuild_demand_aggregates(self, intake_cycle: int | None = None) -> bool:
+        return True
+
+
+# ---------------- SQL HELPERS ----------------
+def page_filters(id_column: str, before_id, equals, in_column: str, in_values, placeholder: str) -> tuple:
+    """WHERE clause and params for the keyset-paged list reads; None filters are left out."""
+    clauses, params = [], []
+    if before_id is not None:
+        clauses.append(f"{id_column} < {placeholder}")
+        params.append(before_id)
+    for column, value in equals:
+        if value is not None:
+            clauses.append(f"{column} = {placeholder}")
+            params.append(value)
+    if in_values is not None:
+        # An empty id list matches nothing rather than everything
+        clauses.append(f"{in_column} IN ({', '.join([placeholder] * len(in_values))})" if in_values else "FALSE")
+        params.extend(in_values)
+    return ("WHERE " + " AND ".join(clauses) if clauses else ""), tuple(params)
+
+
+# ---------------- SELECTION ----------------
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def open_storage(backend: str | None = None) -> Storage:
+    """The process-wide storage for `backend` (DB_BACKEND by default), behind the read cache (see readcache.py)."""
+    backend = (backend or os.getenv('DB_BACKEND', 'mysql')).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+    with _instances_lock:
+        storage = _instances.get(backend)
+        if storage is None:
+            if backend == 'mysql':
+                from database import Database
+                storage = Database()
+            elif backend == 'sqlite':
+                from sqlite_storage import SQLiteStorage
+                storage = SQLiteStorage()
+            else:
+                from memory_storage import MemoryStorage
+                storage = MemoryStorage()
+                seed = int(os.getenv('DB_MEMORY_SEED', '0'))
+                if seed:
+                    populate(storage, seed)
+            storage = _instances[backend] = readcache.wrap(storage)
+        return storage
+
+
+# ---------------- SYNTHETIC DATA ----------------
+CATALOGUE = (
+    # (residence_name, blocks, on_campus, residence_type, rooms per block, restrictions)
+    ('DBSA Male', [f"M-{i}" for i in range(1, 9)], True, 'male', 60, ''),
+    ('DBSA Female', [f"F-{i}" for i in range(1, 9)], True, 'female', 60, ''),
+    ('New Male', ['A West', 'B West', 'A East', 'B East'], True, 'male', 80, ''),
+    ('New Female', ['A South', 'B South', 'A North', 'B North'], True, 'female', 80, ''),
+    ('Lost City Boys', ['Ground Floor', 'First Floor'], True, 'male', 120, 'first year only'),
+    ('Lost City Girls', ['Ground Floor', 'First Floor'], True, 'female', 120, 'first year only'),
+    ('F3', [''], True, 'male', 150, 'seniors'),
+    ('F5', [''], True, 'female', 150, 'seniors'),
+    ('Muthathe Residence', [''], False, 'offcamp', 400, ''),
+    ('Simeka Heights', [''], False, 'offcamp', 400, ''),
+    ('Grand Royale', [''], False, 'offcamp', 300, ''),
+    ('Thohoyandou Off-Campus', [''], False, 'offcamp', 600, ''),
+)
+FIRST_NAMES = ('Amokelane', 'Dakalo', 'Katlego', 'Tsetselelo', 'Phumlani', 'Ntando', 'Thabo', 'Mutangwa',
+               'Siphesihle', 'Mulungisi', 'Rudzani', 'Lufuno', 'Khathu', 'Mpho', 'Vhutshilo', 'Ndivhuwo')
+LAST_NAMES = ('Bele', 'Makhavhu', 'Mamphekgo', 'Masangu', 'Mbatha', 'Motupa', 'Phakathi', 'Rambuda',
+              'Nhlengethwa', 'Rikhotso', 'Masuku', 'Netshitenzhe', 'Mudau', 'Tshivhase', 'Ramabulana')
+PROGRAMS = ('Computer Science', 'Engineering', 'Nursing', 'Science', 'Education', 'Law', 'Business', 'Arts')
+
+
+def populate(storage: Storage, students: int, choices: int = 3, accepted_share: float = 0.1, seed: int = 7,
+             batch_size: int = 5000) -> dict:
+    """
+    Fill `storage` with the residence catalogue, `students` synthetic students and up to `choices`
+    eligible applications each (at most ON_CAMPUS_LIMIT on campus), accepting `accepted_share` of
+    students' first choices. Goes through the public API, so every backend is filled the same way.
+    Returns counts and timings.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    residence_ids = storage.bulk_upsert_residences([
+        {'residence_name': name, 'block': block, 'on_campus': on_campus, 'residence_type': kind,
+         'available_rooms': rooms, 'restrictions': restrictions}
+        for name, blocks, on_campus, kind, rooms, restrictions in CATALOGUE for block in blocks
+    ], update_existing=True)
+    residences = [storage.get_residence_by_id(rid) for rid in residence_ids]
+
+    password = generate_password_hash('password')  # hashing is the slow part of a real import; once is enough here
+    first_number = 30000000
+    for start in range(0, students, batch_size):
+        rows = []
+        for i in range(start, min(students, start + batch_size)):
+            number = str(first_number + i)
+            rows.append((number, password, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                         f"{number}@mvula.univen.ac.za", f"07{rng.randrange(10 ** 8):08d}", f"Addr {i}",
+                         rng.choice(('male', 'female')), f"{rng.randrange(10 ** 13):013d}", rng.choice(PROGRAMS),
+                         rng.randint(1, 4), round(rng.uniform(1.5, 4.0), 2), round(rng.uniform(0.5, 60.0), 2)))
+        if storage.bulk_upsert_students(rows) is None:
+            raise RuntimeError(f"Student batch at {start} failed")
+    loaded = time.perf_counter()
+
+    created = accepted = 0
+    for i in range(students):
+        student = storage.get_student_by_number(str(first_number + i))
+        eligible = [r for r in residences if check_eligibility(student, r)[0]]
+        on = [r for r in eligible if r['on_campus']]
+        off = [r for r in eligible if not r['on_campus']]
+        picks = rng.sample(on, min(len(on), Storage.ON_CAMPUS_LIMIT)) + rng.sample(off, min(len(off), 1))
+        picks = picks[:choices]
+        ok, error, ids = storage.create_applications_with_validation(student['id'], [{'residence_id': r['id']} for r in picks])
+        if not ok:
+            continue  # already applied on an earlier run
+        created += len(ids)
+        if ids and rng.random() < accepted_share:
+            storage.update_application_status(ids[0], 'Accepted', f"R{rng.randrange(1, 400)}")
+            accepted += 1
+    return {'students': students, 'applications': created, 'accepted': accepted,
+            'students_seconds': round(loaded - started, 2), 'applications_seconds': round(time.perf_counter() - loaded, 2)}
+
+
+def _benchmark(students: int = 100000, backends=('memory', 'sqlite'), lookups: int = 20000):
+    from allocation import Snapshot, simulate
+    from memory_storage import MemoryStorage
+    from sqlite_storage import SQLiteStorage
+
+    def timed(fn, n: int = 1) -> float:
+        started = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        return (time.perf_counter() - started) / n
+
+    print(f"{students} students, ~{Storage.ON_CAMPUS_LIMIT + 1} applications each")
+    for backend in backends:
+        if backend == 'mysql':
+            storage = open_storage('mysql')
+            storage = getattr(storage, 'storage', storage)  # time the backend, not the read cache
+            if storage.health()['status'] == 'unavailable':
+                print("mysql: unavailable, skipped")
+                continue
+            print("mysql (existing data, not filled):")
+        else:
+            storage = MemoryStorage() if backend == 'memory' else SQLiteStorage(':memory:')
+            filled = populate(storage, students)
+            print(f"{backend}: filled in {filled['students_seconds']}s (students) + "
+                  f"{filled['applications_seconds']}s ({filled['applications']} applications)")
+
+        all_students = storage.get_all_students()
+        if not len(all_students):
+            print("   no students to read")
+            continue
+        ids = all_students.column('id')
+        numbers = all_students.column('student_number')
+        applications = storage.get_all_applications()
+        app_ids = applications.column('id') or [0]
+        residence_ids = storage.get_residences().column('id')
+        reads = {
+            'get_student_by_id': lambda i: storage.get_student_by_id(ids[i % len(ids)]),
+            'get_student_by_number': lambda i: storage.get_student_by_number(numbers[i % len(numbers)]),
+            'get_residence_by_id': lambda i: storage.get_residence_by_id(residence_ids[i % len(residence_ids)]),
+            'get_student_applications': lambda i: storage.get_student_applications(ids[i % len(ids)]),
+            'get_application_with_details': lambda i: storage.get_application_with_details(app_ids[i % len(app_ids)]),
+            'get_student_summary': lambda i: storage.get_student_summary(ids[i % len(ids)]),
+        }
+        for label, fn in reads.items():
+            print(f"   {label:<30} {timed(fn, lookups) * 1e6:9.1f} µs")
+        if backend != 'mysql':
+            update = lambda i: storage.update_application_status(app_ids[i % len(app_ids)], 'Pending')
+            print(f"   {'update_application_status':<30} {timed(update, lookups // 4) * 1e6:9.1f} µs")
+        print(f"   {'get_all_applications':<30} {timed(lambda i: storage.get_all_applications()) * 1000:9.1f} ms "
+              f"({len(applications)} rows)")
+        snapshot_started = time.perf_counter()
+        snapshot = Snapshot(storage.get_allocation_snapshot())
+        snapshot_seconds = time.perf_counter() - snapshot_started
+        simulate_seconds = timed(lambda i: simulate(snapshot, workers=1))
+        print(f"   {'allocation snapshot':<30} {snapshot_seconds * 1000:9.1f} ms ({len(snapshot)} students), "
+              f"simulate {simulate_seconds * 1000:.0f} ms")
+
+
+def _main(argv: list):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Storage backends: seed a local database or compare backends")
+    parser.add_argument('command', choices=('seed', 'bench'))
+    parser.add_argument('--backend', default=None, help="backend to seed (DB_BACKEND by default)")
+    parser.add_argument('--backends', default='memory,sqlite', help="comma-separated backends to benchmark")
+    parser.add_argument('--students', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    logs.setup_console()
+    if args.command == 'seed':
+        storage = open_storage(args.backend)
+        if storage.name == 'memory':
+            raise SystemExit("The memory backend lives in one process; set DB_MEMORY_SEED for the app instead")
+        print(populate(storage, args.students or 1000))
+    else:
+        _benchmark(args.students or 100000, tuple(b.strip() for b in args.backends.split(',') if b.strip()))
+
+
+if __name__ == '__main__':
+    import sys
+    _main(sys.argv[1:])
@@ -0,0 +1,242 @@
+"""
+Bulk import of the registrar's student list (CSV or XLSX).
+
+Rows are streamed from the file in chunks, initial passwords are hashed in
+parallel across CPU cores and each chunk is written with a single multi-row
+INSERT ... ON DUPLICATE KEY UPDATE. Progress is checkpointed after every
+committed chunk so an interrupted import picks up where it stopped.
+
+The upsert is keyed on students.student_number, so the import refuses to
+run against a database created before that column had a unique key; merge
+the duplicates and add the key first with --migrate.
+
+Usage:
+    python student_import.py students.csv [--batch-size 1000] [--workers 4] [--restart]
+    python student_import.py --migrate [students.csv]
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash
+
+from storage import Storage, open_storage
+
+try:
+    # Optional dependency used for XLSX imports
+    from openpyxl import load_workbook
+    OPENPYXL_AVAILABLE = True
+except Exception:
+    OPENPYXL_AVAILABLE = False
+
+DEFAULT_BATCH_SIZE = 1000
+NUMERIC_COLUMNS = {'year_of_study': lambda v: int(float(v)), 'gpa': float, 'distance': float}
+GENDERS = {'male': 'male', 'm': 'male', 'female': 'female', 'f': 'female'}
+PASSWORD_INDEX = Storage.STUDENT_IMPORT_COLUMNS.index('password')
+
+
+def _normalize_header(name) -> str:
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def iter_student_rows(path: str):
+    """Yield each student row of a CSV/XLSX file as a dict keyed by lower_snake_case header."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        if not OPENPYXL_AVAILABLE:
+            raise RuntimeError("openpyxl is required to import XLSX files")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [_normalize_header(h) for h in next(rows, [])]
+            for values in rows:
+                if values is None or all(v is None for v in values):
+                    continue
+                yield {header[i]: values[i] for i in range(min(len(header), len(values)))}
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            reader = csv.DictReader(handle)
+            reader.fieldnames = [_normalize_header(h) for h in (reader.fieldnames or [])]
+            for row in reader:
+                yield row
+
+
+def iter_chunks(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def prepare_student(row: dict):
+    """
+    Map a raw file row to (values, plain_password).
+    values follows Storage.STUDENT_IMPORT_COLUMNS with the password slot left empty.
+    Returns None for rows without a student number.
+    """
+    student_number = _clean(row.get('student_number'))
+    if not student_number:
+        return None
+    values = {}
+    for col in Storage.STUDENT_IMPORT_COLUMNS:
+        value = _clean(row.get(col))
+        if value is not None and col in NUMERIC_COLUMNS:
+            try:
+                value = NUMERIC_COLUMNS[col](value)
+            except ValueError:
+                value = None
+        values[col] = value
+    gender = (values['gender'] or 'other').lower()
+    values['gender'] = GENDERS.get(gender, 'other')
+    if not values['email']:
+        values['email'] = f"{student_number}@mvula.univen.ac.za"
+    # Initial password: explicit column, else ID number, else the student number itself
+    plain_password = values['password'] or values['id_number'] or student_number
+    values['password'] = None
+    return [values[col] for col in Storage.STUDENT_IMPORT_COLUMNS], plain_password
+
+
+class ImportCheckpoint:
+    """Records how many source rows have been committed so a failed import can resume."""
+
+    def __init__(self, path: str, source_path: str):
+        self.path = path
+        stat = os.stat(source_path)
+        self.source = {'path': os.path.abspath(source_path), 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+        self.rows_done = 0
+
+    def load(self) -> int:
+        try:
+            with open(self.path, encoding='utf-8') as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return 0
+        # A checkpoint for a different/modified file is ignored
+        if data.get('source') == self.source:
+            self.rows_done = int(data.get('rows_done', 0))
+        return self.rows_done
+
+    def save(self, rows_done: int):
+        self.rows_done = rows_done
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump({'source': self.source, 'rows_done': rows_done, 'updated_at': time.time()}, handle)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def import_students(path: str, batch_size: int = DEFAULT_BATCH_SIZE, workers: int | None = None,
+                    checkpoint_path: str | None = None, resume: bool = True, progress=None, db=None) -> dict:
+    """
+    Import students from `path`. Returns a stats dict:
+    {rows_read, imported, skipped, resumed_from, elapsed, rows_per_sec, completed, error}
+    `progress` is called with the running stats after each committed batch.
+    """
+    db = db or open_storage()
+    if not db.student_number_is_unique():
+        return {'rows_read': 0, 'imported': 0, 'skipped': 0, 'resumed_from': 0, 'elapsed': 0.0,
+                'rows_per_sec': 0.0, 'completed': False,
+                'error': "students.student_number has no unique key; run: python student_import.py --migrate"}
+    checkpoint = ImportCheckpoint(checkpoint_path or f"{path}.checkpoint.json", path)
+    start_row = checkpoint.load() if resume else 0
+    stats = {
+        'rows_read': start_row, 'imported': 0, 'skipped': 0, 'resumed_from': start_row,
+        'elapsed': 0.0, 'rows_per_sec': 0.0, 'completed': False, 'error': None
+    }
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, batch_size // (4 * workers))
+
+    # Spawned, not forked: the app runs this from a background thread while its log, mail, event
+    # and pool threads may hold locks that a forked child would inherit locked forever
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        rows = iter_student_rows(path)
+        # Skip rows already committed by a previous run
+        for _ in range(start_row):
+            if next(rows, None) is None:
+                break
+        for chunk in iter_chunks(rows, batch_size):
+            prepared = [prepare_student(row) for row in chunk]
+            valid = [p for p in prepared if p is not None]
+            hashes = pool.map(generate_password_hash, [pw for _, pw in valid], chunksize=chunksize)
+            batch = []
+            for (values, _), hashed in zip(valid, hashes):
+                values[PASSWORD_INDEX] = hashed
+                batch.append(tuple(values))
+
+            if db.bulk_upsert_students(batch) is None:
+                stats['error'] = f"Batch starting at row {stats['rows_read'] + 1} failed; rerun to resume"
+                break
+
+            stats['rows_read'] += len(chunk)
+            stats['imported'] += len(batch)
+            stats['skipped'] += len(chunk) - len(batch)
+            checkpoint.save(stats['rows_read'])
+            stats['elapsed'] = time.perf_counter() - started
+            stats['rows_per_sec'] = round((stats['rows_read'] - start_row) / stats['elapsed'], 1) if stats['elapsed'] else 0.0
+            if progress:
+                progress(dict(stats))
+        else:
+            stats['completed'] = True
+            checkpoint.clear()
+
+    stats['elapsed'] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def main():
+    import logs
+
+    logs.setup_console()
+    parser = argparse.ArgumentParser(description="Bulk import students from a CSV/XLSX file")
+    parser.add_argument('path', nargs='?')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--restart', action='store_true', help="ignore any saved checkpoint")
+    parser.add_argument('--migrate', action='store_true',
+                        help="merge duplicate student numbers and add the unique key before importing")
+    args = parser.parse_args()
+    if not args.path and not args.migrate:
+        parser.error("a file to import is required unless --migrate is given")
+
+    if args.migrate:
+        if not open_storage().migrate_unique_student_numbers():
+            print("❌ Migration failed; see the log for the statement that stopped it")
+            return
+        print("✅ students.student_number is unique")
+        if not args.path:
+            return
+
+    def report(s):
+        print(f"📥 {s['rows_read']} rows ({s['imported']} imported, {s['skipped']} skipped) - {s['rows_per_sec']} rows/s")
+
+    stats = import_students(args.path, args.batch_size, args.workers, resume=not args.restart, progress=report)
+    if stats['completed']:
+        print(f"✅ Import finished: {stats['imported']} students in {stats['elapsed']}s")
+    else:
+        print(f"❌ Import stopped: {stats['error']}")
+
+
+if __name__ == '__main__':
+    main()
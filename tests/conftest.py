@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app modules live at the repository root; the suite runs on the in-memory backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DB_BACKEND', 'memory')
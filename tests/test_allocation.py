@@ -0,0 +1,37 @@
+import pytest
+
+import allocation
+from allocation import Snapshot, run_strategy, simulate
+from memory_storage import MemoryStorage
+from storage import populate
+
+
+@pytest.fixture(scope='module')
+def snapshot():
+    storage = MemoryStorage()
+    populate(storage, students=600, choices=3, accepted_share=0.1, seed=11)
+    rows = storage.get_allocation_snapshot()
+    # Two free rooms per residence, so the strategies compete for seats
+    rows['residences'] = [(rid, name, block, accepted + 2, accepted) for rid, name, block, _, accepted in rows['residences']]
+    return Snapshot(rows)
+
+
+def test_a_seeded_simulation_is_stable_and_respects_capacity(snapshot):
+    first = simulate(snapshot, lottery_seeds=[3, 5], workers=1)
+    assert simulate(snapshot, lottery_seeds=[3, 5], workers=1) == first
+    assert [(r['strategy'], r['seed']) for r in first] == [('distance', None), ('gpa', None), ('random', 3), ('random', 5)]
+    for result in first:
+        assert result['placed'] + result['unplaced'] == len(snapshot)
+        assert result['placed'] == sum(r['placed'] for r in result['residences'])
+        assert all(r['placed'] <= r['capacity'] for r in result['residences'])
+        assert result['unplaced']
+
+
+def test_large_runs_reuse_one_worker_pool(snapshot, monkeypatch):
+    monkeypatch.setattr(allocation, 'PARALLEL_THRESHOLD', 0)
+    results = simulate(snapshot, ('distance', 'gpa'))
+    pool = allocation._pool
+    assert pool is not None
+    assert simulate(snapshot, ('distance', 'gpa')) == results
+    assert allocation._pool is pool
+    assert results == [run_strategy(snapshot, 'distance'), run_strategy(snapshot, 'gpa')]
@@ -0,0 +1,33 @@
+from analytics import build_demand_report, demand_dimensions
+
+
+def test_an_application_counts_once_per_dimension():
+    assert dict(demand_dimensions(1, 'Female', 2, 3.2, 12.5)) == {
+        'total': 'all', 'choice': '1', 'gender': 'female', 'year': '2', 'distance': '10-20', 'gpa': '3.0-3.5'
+    }
+    assert dict(demand_dimensions(4, None, None, None, 250)) == {
+        'total': 'all', 'choice': '3+', 'gender': 'other', 'year': 'unknown', 'distance': '100+', 'gpa': 'unknown'
+    }
+    assert dict(demand_dimensions(2, 'male', 1, 1.5, 0))['distance'] == '0-5'
+
+
+def test_the_report_ranks_residences_by_oversubscription():
+    rows = [
+        (1, 'DBSA Male', 'M-1', 'male', 10, 'total', 'all', 25),
+        (1, 'DBSA Male', 'M-1', 'male', 10, 'choice', '1', 15),
+        (1, 'DBSA Male', 'M-1', 'male', 10, 'choice', '2', 7),
+        (1, 'DBSA Male', 'M-1', 'male', 10, 'choice', '3+', 3),
+        (1, 'DBSA Male', 'M-1', 'male', 10, 'gender', 'male', 25),
+        (1, 'DBSA Male', 'M-1', 'male', 10, 'distance', '50-100', 4),
+        (2, 'F3', 'A', 'female', 20, 'total', 'all', 10),
+        (2, 'F3', 'A', 'female', 20, 'year', '1', 10),
+        (3, 'Grand Royale', '', 'none', 0, None, None, None),  # no applicants yet (LEFT JOIN)
+    ]
+    report = build_demand_report(rows)
+    assert [e['residence_id'] for e in report] == [1, 2, 3]
+    first, second, empty = report
+    assert (first['applicants'], first['oversubscription']) == (25, 2.5)
+    assert (first['first_choice'], first['second_choice']) == (15, 7)
+    assert first['by_gender'] == {'male': 25} and first['distance'] == {'50-100': 4}
+    assert (second['oversubscription'], second['by_year']) == (0.5, {'1': 10})
+    assert (empty['applicants'], empty['oversubscription']) == (0, None)
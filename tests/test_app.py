@@ -0,0 +1,81 @@
+import logging
+import uuid
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as app_module
+from storage import populate
+
+STUDENT_NUMBER = '90000001'
+
+
+@pytest.fixture(scope='module')
+def db():
+    storage = app_module.db
+    if not len(storage.get_residences()):
+        populate(storage, 1)
+    storage.bulk_upsert_students([(STUDENT_NUMBER, generate_password_hash('secret'), 'Test', 'Student',
+                                   'test@example.com', '0', '', 'male', '', 'Computer Science', 1, 3.0, 5)])
+    return storage
+
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def student(client, db):
+    client.post('/api/login', json={'username': STUDENT_NUMBER, 'password': 'secret', 'user_type': 'student'})
+    return db.get_student_by_number(STUDENT_NUMBER)
+
+
+def _apply(client, key, residence='Muthathe Residence'):
+    return client.post('/api/applications', json={'residences': [{'residence_name': residence, 'block': ''}]},
+                       headers={'Idempotency-Key': key})
+
+
+def test_a_retried_request_replays_the_first_response(client, db, student):
+    key = str(uuid.uuid4())
+    first = _apply(client, key)
+    assert first.status_code == 201 and first.get_json()['application_ids']
+    applied = len(db.get_student_applications(student['id']))
+
+    retry = _apply(client, key)
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.status_code == first.status_code and retry.get_json() == first.get_json()
+    assert len(db.get_student_applications(student['id'])) == applied
+
+
+def test_a_key_reused_with_a_different_request_is_refused(client, student):
+    key = str(uuid.uuid4())
+    _apply(client, key, 'Muthathe Residence')
+    response = _apply(client, key, 'Grand Royale')
+    assert response.status_code == 422
+    assert 'Idempotent-Replayed' not in response.headers
+
+
+def test_an_application_by_id_is_searchable_by_residence_name(client, db, student):
+    app_module._build_search_index()
+    residence = db.find_residence('Simeka Heights', '')
+    response = client.post('/api/applications', json={'residences': [{'residence_id': residence['id']}]},
+                           headers={'Idempotency-Key': str(uuid.uuid4())})
+    assert response.status_code == 201
+    hits = app_module.search_index.search('simeka heights')
+    assert [hit['id'] for hit in hits] == [student['id']]
+    assert hits[0]['residences'] == sorted(a['residence_name'] for a in db.get_student_applications(student['id']))
+
+
+def test_failed_image_derivative_is_logged_and_the_original_served(client, monkeypatch, caplog):
+    def broken(*args):
+        raise OSError("cannot identify image file")
+
+    monkeypatch.setattr(app_module.image_pipeline, 'respond', broken)
+    with caplog.at_level(logging.ERROR, logger='app'):
+        response = client.get('/Assets/Royale.png?w=320', headers={'Accept': 'image/webp'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    record = next(r for r in caplog.records if r.message == "image derivative error")
+    assert record.file == 'Royale.png' and 'cannot identify' in record.error
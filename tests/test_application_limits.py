@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from memory_storage import MemoryStorage
+from sqlite_storage import SQLiteStorage
+from storage import Storage
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request):
+    storage = MemoryStorage() if request.param == 'memory' else SQLiteStorage(':memory:')
+    storage.bulk_upsert_students([('24000001', 'x', 'Dakalo', 'Makhavhu', 'd@example.com', '', '', 'male', '',
+                                   'Engineering', 2, 3.1, 5)])
+    storage.bulk_upsert_residences(
+        [{'residence_name': 'DBSA Male', 'block': f"M-{i}", 'on_campus': True, 'residence_type': 'male',
+          'available_rooms': 3} for i in range(1, 7)]
+        + [{'residence_name': name, 'available_rooms': 10} for name in ('Grand Royale', 'Simeka Heights', 'F3')])
+    return storage
+
+
+def _on_campus(storage, student_id):
+    return sum(1 for a in storage.get_student_applications(student_id) if a['on_campus'])
+
+
+def test_on_campus_limit_spans_submits_and_off_campus_is_unlimited(storage):
+    student = storage.get_student_by_number('24000001')
+    ok, error, _ = storage.create_applications_with_validation(student['id'], [
+        {'residence_name': 'DBSA Male', 'block': 'M-1'}, {'residence_name': 'Grand Royale'}])
+    assert ok, error
+    ok, error, _ = storage.create_applications_with_validation(student['id'], [
+        {'residence_name': 'DBSA Male', 'block': 'M-2'}, {'residence_name': 'DBSA Male', 'block': 'M-3'}])
+    assert not ok and 'limit exceeded' in error
+    ok, error, _ = storage.create_applications_with_validation(student['id'], [
+        {'residence_name': 'DBSA Male', 'block': 'M-2'}, {'residence_name': 'Simeka Heights'}, {'residence_name': 'F3'}])
+    assert ok, error
+    assert _on_campus(storage, student['id']) == Storage.ON_CAMPUS_LIMIT
+    assert len(storage.get_student_applications(student['id'])) == 5
+
+
+def test_concurrent_submits_cannot_exceed_the_limit(storage):
+    student = storage.get_student_by_number('24000001')
+    start = threading.Barrier(6)
+    results = []
+
+    def submit(block):
+        start.wait()
+        results.append(storage.create_applications_with_validation(
+            student['id'], [{'residence_name': 'DBSA Male', 'block': block}])[0])
+
+    threads = [threading.Thread(target=submit, args=(f"M-{i}",)) for i in range(1, 7)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == Storage.ON_CAMPUS_LIMIT
+    assert _on_campus(storage, student['id']) == Storage.ON_CAMPUS_LIMIT
@@ -0,0 +1,54 @@
+import gzip
+
+import pytest
+from flask import Flask
+
+from assets import IMMUTABLE, REVALIDATE, install
+
+CSS = b'body { margin: 0; }\n' + b''.join(b'.row-%d { padding: %dpx; }\n' % (i, i) for i in range(60))
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'site.css').write_bytes(CSS)
+    app = Flask(__name__)
+    app.add_url_rule('/page', 'page', lambda: 'from flask')
+    manifest = install(app, root=str(tmp_path))
+    return app.test_client(), manifest
+
+
+def test_a_fingerprinted_url_is_served_immutable(site):
+    client, manifest = site
+    url = manifest.asset_url('css/site.css')
+    assert url != '/css/site.css' and url.startswith('/css/site.') and url.endswith('.css')
+    response = client.get(url)
+    assert response.status_code == 200 and response.data == CSS
+    assert response.headers['Cache-Control'] == IMMUTABLE
+    assert response.mimetype == 'text/css'
+
+
+def test_the_plain_path_revalidates_and_a_matching_etag_gets_304(site):
+    client, manifest = site
+    response = client.get('/css/site.css')
+    assert response.headers['Cache-Control'] == REVALIDATE
+    etag = response.headers['ETag']
+    revalidated = client.get('/css/site.css', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+    assert client.get(manifest.asset_url('css/site.css'), headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/css/site.css', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_text_assets_are_compressed_per_accept_encoding(site):
+    client, manifest = site
+    response = client.get(manifest.asset_url('css/site.css'), headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip' and response.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.data) == CSS
+    assert 'Content-Encoding' not in client.get(manifest.asset_url('css/site.css')).headers
+
+
+def test_other_paths_reach_flask(site):
+    client, _ = site
+    assert client.get('/page').data == b'from flask'
+    assert client.get('/css/missing.css').status_code == 404
@@ -0,0 +1,70 @@
+import gzip
+
+from compression import CompressionMiddleware, accepted_encodings
+
+BODY = b'{"rows": [' + b','.join(b'{"id": %d, "status": "Pending"}' % i for i in range(200)) + b']}'
+
+
+def call(app, accept='gzip'):
+    """Run a WSGI app; returns (status, headers, body as the client receives it, data sent via write())."""
+    response, sent = {}, []
+
+    def start_response(status, headers, exc_info=None):
+        response.update(status=status, headers=dict(headers))
+        return sent.append
+
+    chunks = list(CompressionMiddleware(app)({'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': accept},
+                                            start_response))
+    return response['status'], response['headers'], b''.join(sent) + b''.join(chunks)
+
+
+def legacy_app(environ, start_response):
+    write = start_response('200 OK', [('Content-Type', 'application/json')])
+    write(BODY[:100])
+    write(BODY[100:])
+    return []
+
+
+def mixed_app(environ, start_response):
+    write = start_response('200 OK', [('Content-Type', 'application/json')])
+    write(BODY[:100])
+    return [BODY[100:]]
+
+
+def streaming_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'application/json')])
+    return (BODY[i:i + 500] for i in range(0, len(BODY), 500))
+
+
+def test_write_callable_is_compressed_with_the_body():
+    for app in (legacy_app, mixed_app):
+        status, headers, body = call(app)
+        assert headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(body) == BODY
+
+
+def test_write_callable_passes_through_uncompressed():
+    for app in (legacy_app, mixed_app):
+        status, headers, body = call(app, accept='identity')
+        assert 'Content-Encoding' not in headers
+        assert body == BODY
+
+
+def test_streamed_body_is_compressed_chunk_by_chunk():
+    status, headers, body = call(streaming_app)
+    assert headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in headers
+    assert gzip.decompress(body) == BODY
+
+
+def test_small_bodies_are_left_alone():
+    def small(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'application/json'), ('Content-Length', '2')])
+        return [b'{}']
+
+    assert call(small)[2] == b'{}'
+
+
+def test_accepted_encodings_skips_q0():
+    assert accepted_encodings('gzip;q=0, br') == {'br'}
+    assert accepted_encodings('GZIP, deflate;q=0.000') == {'gzip'}
+    assert accepted_encodings(None) == set()
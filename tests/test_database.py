@@ -0,0 +1,158 @@
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+from database import Database, statement_intent
+
+
+@pytest.mark.parametrize('query', [
+    'SELECT 1',
+    '\n        SELECT a.id FROM applications a WHERE a.id = %s',
+    'show replica status',
+])
+def test_plain_reads_may_use_a_replica(query):
+    assert statement_intent(query) == 'read'
+
+
+@pytest.mark.parametrize('query', [
+    'UPDATE applications SET status=%s WHERE id=%s',
+    'INSERT INTO students (student_number) SELECT %s',
+    'SELECT id FROM applications WHERE id = %s FOR UPDATE',
+    'SELECT id FROM applications WHERE id = %s LOCK IN SHARE MODE',
+    'ALTER TABLE students ADD UNIQUE KEY uq_student_number (student_number)',
+])
+def test_writes_and_locking_reads_go_to_the_primary(query):
+    assert statement_intent(query) == 'write'
+
+
+class _LimitCursor:
+    """Answers the counter SELECT from `counts` (None: no row yet) and records every statement."""
+
+    def __init__(self, counts):
+        self.counts = list(counts)
+        self.statements = []
+        self.lastrowid = 0
+        self._row = None
+
+    def execute(self, query, params=()):
+        self.statements.append(' '.join(query.split()))
+        if 'FROM student_application_limits' in query:
+            count = self.counts.pop(0)
+            self._row = None if count is None else (count,)
+        self.lastrowid += 1
+
+    def fetchone(self):
+        return self._row
+
+    def close(self):
+        pass
+
+
+class _LimitConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.committed = False
+
+    def cursor(self):
+        return self._cursor
+
+    def start_transaction(self):
+        pass
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _submit(monkeypatch, counts, on_campus=1):
+    db = Database()
+    cursor = _LimitCursor(counts)
+    monkeypatch.setattr(db, 'get_connection', lambda intent: _LimitConnection(cursor))
+    return db._insert_applications(7, 2026, [1], on_campus), cursor.statements
+
+
+def test_the_limit_counter_is_seeded_only_on_the_first_submit(monkeypatch):
+    (ok, _, _), statements = _submit(monkeypatch, [None, 0])
+    assert ok
+    assert [s.split()[0] for s in statements[:3]] == ['SELECT', 'INSERT', 'SELECT']
+    assert 'COUNT(*)' in statements[1]
+
+    (ok, _, _), statements = _submit(monkeypatch, [1])
+    assert ok
+    assert statements[0].startswith('SELECT on_campus_count') and statements[0].endswith('FOR UPDATE')
+    assert not any('COUNT(*)' in s for s in statements)
+
+
+def test_a_submit_over_the_limit_is_refused_before_inserting(monkeypatch):
+    (ok, error, _), statements = _submit(monkeypatch, [2])
+    assert not ok and 'limit exceeded' in error
+    assert statements == [statements[0]]
+
+
+class _DemandCursor:
+    """Answers every SELECT with `rows` and records (statement, params)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, query, params=()):
+        self.statements.append((' '.join(query.split()), list(params)))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def _demand_inserts(cursor):
+    """The residence_demand rows written, as {(cycle, residence_id, dimension, value): applicants}."""
+    written = {}
+    for statement, params in cursor.statements:
+        if statement.startswith('INSERT INTO residence_demand'):
+            for start in range(0, len(params), 5):
+                cycle, residence_id, dimension, value, applicants = params[start:start + 5]
+                written[(cycle, residence_id, dimension, value)] = applicants
+    return written
+
+
+def _demand_db(monkeypatch, rows):
+    db = Database()
+    cursor = _DemandCursor(rows)
+    monkeypatch.setattr(db, 'get_connection', lambda intent: _LimitConnection(cursor))
+    return db, cursor
+
+
+def test_demand_counters_are_keyed_on_the_application_cycle(monkeypatch):
+    from datetime import datetime
+    # id, student_id, residence_id, intake_cycle, gender, year, gpa, distance, choice rank
+    db, cursor = _demand_db(monkeypatch, [(1, 7, 3, 2025, 'Male', 2, 3.1, 12, 1),
+                                          (2, 8, 3, 2026, 'Female', 1, 2.2, 3, 1),
+                                          (3, 9, 3, 2026, 'Female', 1, 2.4, 4, 2)])
+    submitted = datetime(2025, 8, 1, 10, 30)
+    assert db.record_application_events([(1, 'submitted', submitted), (2, 'submitted', submitted),
+                                         (3, 'submitted', submitted)])
+    written = _demand_inserts(cursor)
+    assert written[(2025, 3, 'total', 'all')] == 1
+    assert written[(2026, 3, 'total', 'all')] == 2
+    assert written[(2026, 3, 'gender', 'female')] == 2
+    assert (2025, 3, 'gender', 'female') not in written
+
+
+def test_demand_rebuild_and_reads_touch_only_one_cycle(monkeypatch):
+    db, cursor = _demand_db(monkeypatch, [(3, 'Male', 2, 3.1, 12, 1), (4, 'Female', 1, 2.2, 3, 1)])
+    assert db.rebuild_demand_aggregates(2025)
+    assert ('DELETE FROM residence_demand WHERE intake_cycle = %s', [2025]) in cursor.statements
+    assert {key[0] for key in _demand_inserts(cursor)} == {2025}
+
+    monkeypatch.setenv('INTAKE_CYCLE', '2026')
+    db, cursor = _demand_db(monkeypatch, [])
+    assert db.get_demand_rows() == []
+    statement, params = cursor.statements[0]
+    assert 'd.intake_cycle = %s' in statement and params == [2026]
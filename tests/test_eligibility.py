@@ -0,0 +1,89 @@
+import logging
+
+import pytest
+
+from eligibility import ANY_GENDER, ANY_YEAR, check_eligibility, compile_rule
+
+
+def residence(restrictions, residence_type='mixed'):
+    return {'residence_name': 'Test', 'block': 'A', 'residence_type': residence_type, 'restrictions': restrictions}
+
+
+def student(gender='male', year=1, program='Computer Science'):
+    return {'gender': gender, 'year_of_study': year, 'program': program}
+
+
+def eligible(restrictions, residence_type='mixed', **kwargs):
+    return check_eligibility(student(**kwargs), residence(restrictions, residence_type))[0]
+
+
+@pytest.mark.parametrize('text', ['first year only', '1st years only', 'year 1 only'])
+def test_first_year_only(text):
+    assert eligible(text, year=1)
+    assert not eligible(text, year=2)
+
+
+@pytest.mark.parametrize('text', ['no first years', 'first years excluded', 'not for first years', 'except 1st years'])
+def test_negated_year_excludes_it(text):
+    assert compile_rule('mixed', text).year_mask == ANY_YEAR & ~0b10
+    assert not eligible(text, year=1)
+    assert eligible(text, year=3)
+
+
+def test_seniors():
+    assert not eligible('seniors only', year=1)
+    assert eligible('seniors only', year=2)
+    assert eligible('no seniors', year=1)
+    assert not eligible('no seniors', year=4)
+
+
+@pytest.mark.parametrize('text', ['female only', 'females only', 'ladies only', 'no males', 'males excluded'])
+def test_gender_words_restrict_gender(text):
+    rule = compile_rule('mixed', text)
+    assert rule.gender_mask == 0b10
+    assert not rule.programs
+    assert eligible(text, gender='female')
+    assert not eligible(text, gender='male')
+
+
+def test_gender_restriction_reason_quotes_the_rule():
+    ok, reason = check_eligibility(student(gender='male'), residence('female only'))
+    assert not ok and 'female only' in reason
+    ok, reason = check_eligibility(student(gender='male'), residence('', 'female'))
+    assert not ok and 'female residence' in reason
+
+
+def test_not_for_postgraduates():
+    assert eligible('not for postgraduates', program='Nursing')
+    assert not eligible('not for postgraduates', program='MSc Computer Science')
+    assert not eligible('undergraduates only', program='PhD Physics')
+    assert eligible('postgraduates only', program='Honours in Law')
+    assert not eligible('postgraduates only', program='Law')
+
+
+def test_programs():
+    assert eligible('nursing only', program='Nursing Science')
+    assert not eligible('nursing only', program='Law')
+    assert not eligible('no nursing students', program='Nursing')
+    assert eligible('nursing excluded', program='Law')
+
+
+def test_combined_clause():
+    text = 'female first years only'
+    assert eligible(text, gender='female', year=1)
+    assert not eligible(text, gender='female', year=2)
+    assert not eligible(text, gender='male', year=1)
+
+
+def test_unknown_attributes_never_exclude():
+    assert eligible('no first years; nursing only', gender='other', year=None, program=None)
+
+
+@pytest.mark.parametrize('text', ['non-smokers only', 'quiet hours after 10pm'])
+def test_unparseable_text_is_logged_and_does_not_filter(text, caplog):
+    compile_rule.cache_clear()
+    with caplog.at_level(logging.WARNING, logger='eligibility'):
+        rule = compile_rule('mixed', text)
+    assert (rule.gender_mask, rule.year_mask, rule.programs, rule.excluded_programs) == \
+        (ANY_GENDER, ANY_YEAR, frozenset(), frozenset())
+    assert any(r.clause == text for r in caplog.records)
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from events import ApplicationEventLog
+from resilience import DatabaseUnavailable
+
+
+class StuckDatabase:
+    """record_application_events waits until released, like a database that has stopped answering."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.written = []
+
+    def record_application_events(self, batch):
+        self.release.wait(5)
+        self.written.extend(batch)
+        return True
+
+
+class DownDatabase:
+    def record_application_events(self, batch):
+        raise DatabaseUnavailable('database down')
+
+
+def test_record_never_blocks_when_the_queue_is_full():
+    db = StuckDatabase()
+    events = ApplicationEventLog(db, flush_interval=0.01, max_pending=3)
+    started = time.perf_counter()
+    for app_id in range(50):
+        events.record('approved', app_id)
+    assert time.perf_counter() - started < 0.5
+    assert events.dropped >= 50 - 2 * 3  # at most one drained batch plus a full queue got through
+    db.release.set()
+    events.flush()
+    assert len(db.written) + events.dropped == 50
+
+
+def test_events_are_kept_while_the_database_is_down():
+    events = ApplicationEventLog(DownDatabase(), max_pending=10)
+    for app_id in range(4):
+        events.record('submitted', app_id)
+    events.flush()
+    assert events._queue.qsize() == 4
+    assert events.dropped == 0
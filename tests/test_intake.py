@@ -0,0 +1,88 @@
+from datetime import date, datetime
+
+import pytest
+
+import intake
+from intake import archive_closed_cycles, closed_cycles, cycle_for, partition_name
+
+
+@pytest.mark.parametrize('when, cycle', [
+    (date(2025, 1, 15), 2025),
+    (date(2025, 6, 30), 2025),
+    (date(2025, 7, 1), 2026),
+    (datetime(2025, 12, 31, 23, 59), 2026),
+])
+def test_applications_from_the_start_month_are_for_next_year(when, cycle):
+    assert cycle_for(when) == cycle
+
+
+def test_current_cycle_can_be_pinned(monkeypatch):
+    monkeypatch.setenv('INTAKE_CYCLE', '2031')
+    assert intake.current_cycle() == 2031
+
+
+def _partitions(*cycles):
+    return [{'name': partition_name(c) if c else 'pmax', 'cycle': c, 'rows': 10} for c in cycles]
+
+
+def test_closed_cycles_keep_the_previous_year_live():
+    partitions = _partitions(2024, 2022, 2023, 2025, 2026, None)
+    assert closed_cycles(partitions, 2026) == [2022, 2023, 2024]
+    assert closed_cycles(partitions, 2026, keep=0) == [2022, 2023, 2024, 2025]
+    assert closed_cycles(_partitions(2025, 2026, None), 2026) == []
+
+
+class _FakeDatabase:
+    """Partitions and live rows per cycle; archive_application_batch moves up to batch_size of them."""
+
+    def __init__(self, rows, fail_cycle=None):
+        self.rows = dict(rows)
+        self.archived = {}
+        self.fail_cycle = fail_cycle
+        self.ensured = []
+        self.dropped = []
+
+    def get_application_partitions(self, table='applications'):
+        return _partitions(*self.rows, None)
+
+    def ensure_cycle_partition(self, cycle, table='applications'):
+        self.ensured.append((table, cycle))
+        return True
+
+    def archive_application_batch(self, cycle, batch_size):
+        if cycle == self.fail_cycle:
+            return None
+        count = min(batch_size, self.rows[cycle])
+        self.rows[cycle] -= count
+        self.archived[cycle] = self.archived.get(cycle, 0) + count
+        return count
+
+    def drop_cycle_partition(self, cycle):
+        if self.rows[cycle]:
+            return False
+        self.dropped.append(cycle)
+        return True
+
+
+def test_archive_moves_closed_cycles_in_batches_and_drops_their_partitions(monkeypatch):
+    monkeypatch.setenv('INTAKE_CYCLE', '2026')
+    db = _FakeDatabase({2023: 7, 2024: 5, 2025: 3, 2026: 4})
+    assert archive_closed_cycles(db, batch_size=5) == {2023: 7, 2024: 5}
+    assert db.rows == {2023: 0, 2024: 0, 2025: 3, 2026: 4}
+    assert db.dropped == [2023, 2024]
+    assert db.ensured == [('applications', 2027), ('applications_archive', 2023), ('applications_archive', 2024)]
+
+
+def test_a_failed_batch_stops_before_dropping_the_partition(monkeypatch):
+    monkeypatch.setenv('INTAKE_CYCLE', '2026')
+    db = _FakeDatabase({2023: 7, 2024: 5, 2026: 4}, fail_cycle=2024)
+    assert archive_closed_cycles(db, batch_size=5) == {2023: 7, 2024: 0}
+    assert db.dropped == [2023]
+    assert db.rows[2024] == 5
+
+
+def test_a_dry_run_changes_nothing(monkeypatch):
+    monkeypatch.setenv('INTAKE_CYCLE', '2026')
+    db = _FakeDatabase({2023: 7, 2026: 4})
+    assert archive_closed_cycles(db, dry_run=True) == {}
+    assert db.rows == {2023: 7, 2026: 4} and not db.ensured and not db.dropped
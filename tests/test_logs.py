@@ -0,0 +1,55 @@
+import io
+import json
+import logging
+import types
+
+import pytest
+
+import logs
+from logs import DroppingQueueHandler, JSONFormatter, _ContextFilter, _Writer
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test-logs')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    yield logger
+    logger.handlers.clear()
+
+
+def test_a_full_queue_drops_and_counts_records_without_blocking(logger):
+    handler = DroppingQueueHandler(maxsize=2)
+    logger.addHandler(handler)
+    for i in range(5):
+        logger.info("application %s created", i, extra={'application_id': i})
+    assert handler.dropped == 3
+    queued = [handler.queue.get_nowait() for _ in range(2)]
+    assert [(r.msg, r.args) for r in queued] == [('application 0 created', None), ('application 1 created', None)]
+
+
+def test_the_writer_reports_the_dropped_records(logger):
+    handler = DroppingQueueHandler(maxsize=2)
+    logger.addHandler(handler)
+    for i in range(4):
+        logger.info("event %s", i, extra={'n': i})
+    stream = io.StringIO()
+    writer = _Writer(handler, stream, JSONFormatter())
+    handler.queue.put(None)  # queue is drained, then the writer stops
+    writer.run()
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(line['msg'], line.get('n')) for line in lines[:2]] == [('event 0', 0), ('event 1', 1)]
+    assert lines[2]['msg'] == 'log records dropped: queue full' and lines[2]['dropped'] == 2
+    assert lines[2]['level'] == 'WARNING'
+
+
+def test_sampled_records_are_discarded_before_the_queue(logger, monkeypatch):
+    handler = DroppingQueueHandler(maxsize=10)
+    handler.addFilter(_ContextFilter())
+    logger.addHandler(handler)
+    monkeypatch.setattr(logs, 'random', types.SimpleNamespace(random=lambda: 0.5))
+    logger.info("kept", extra={'sample': 0.6})
+    logger.info("discarded", extra={'sample': 0.4})
+    logger.warning("always kept")
+    assert [handler.queue.get_nowait().msg for _ in range(handler.queue.qsize())] == ['kept', 'always kept']
+    assert handler.dropped == 0
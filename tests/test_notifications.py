@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+pytest.importorskip('jinja2')
+
+from notifications import Notifier
+
+
+@pytest.fixture
+def idle(monkeypatch):
+    """A Notifier with no sender threads, so queued mail stays in the outboxes."""
+    monkeypatch.setattr(Notifier, '_ensure_threads', lambda self: None)
+    return Notifier(smtp=None, digest_window=0, max_pending=2)
+
+
+def test_transactional_mail_is_dropped_rather_than_blocking(idle):
+    done = threading.Event()
+
+    def request():
+        for _ in range(3):
+            idle.notify('20000001@mvula.univen.ac.za', 'password_reset', {'otp': '123456'}, digest=False)
+        done.set()
+
+    threading.Thread(target=request, daemon=True).start()
+    assert done.wait(5)
+    assert idle.stats['dropped'] == 1
+    assert idle._urgent.qsize() == 2
+
+
+def test_senders_take_transactional_mail_before_campaign_mail(idle):
+    idle._enqueue('a@example.com', 'Reminder', '<p>1</p>', 'campaign')
+    idle._enqueue('b@example.com', 'Reminder', '<p>2</p>', 'campaign')
+    idle._enqueue('c@example.com', 'Your code', '<p>3</p>')
+    assert [to for to, *_ in idle._drain(block=False)] == ['c@example.com', 'a@example.com', 'b@example.com']
+
+
+class _Recipients:
+    def __init__(self, students):
+        self.rows = [{'student_id': i, 'email': f"{i}@example.com", 'first_name': 'Student', 'last_name': str(i),
+                      'residence_name': 'DBSA Male', 'block': 'M-4', 'status': 'Pending'} for i in range(1, students + 1)]
+
+    def get_campaign_recipients(self, statuses, after, limit):
+        return [row for row in self.rows if row['student_id'] > after][:limit]
+
+
+def test_a_campaign_larger_than_the_outbox_is_throttled_and_completes(monkeypatch):
+    monkeypatch.delenv('SMTP_HOST', raising=False)  # log the reminders instead of sending them
+    notifier = Notifier(smtp=None, digest_window=0, max_pending=2)
+    campaign_id = notifier.start_campaign(_Recipients(25), ['Pending'])
+    for thread in threading.enumerate():
+        if thread.name == f"campaign-{campaign_id}":
+            thread.join(10)
+    notifier.flush()
+    progress = notifier.campaigns[campaign_id]
+    assert (progress['queued'], progress['sent'], progress['failed']) == (25, 25, 0)
+    assert progress['status'] == 'completed'
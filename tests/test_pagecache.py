@@ -0,0 +1,52 @@
+import pytest
+from flask import Flask, session
+
+from pagecache import install
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / 'templates').mkdir()
+    app = Flask(__name__, root_path=str(tmp_path))
+    app.secret_key = 'test'
+    cache = install(app)
+    renders = []
+
+    @app.route('/')
+    @cache.page
+    def landing():
+        renders.append('landing')
+        return '<h1>Welcome</h1>' * 50
+
+    @app.route('/dashboard')
+    @cache.page
+    def dashboard():
+        renders.append('dashboard')
+        return f"<h1>Hello {session.get('user_id', 'guest')}</h1>"
+
+    @app.route('/login', methods=['POST'])
+    def login():
+        session['user_id'] = 'student-7'
+        return 'ok'
+
+    return app.test_client(), cache, renders
+
+
+def test_an_anonymous_page_is_rendered_once(site):
+    client, cache, renders = site
+    first = client.get('/')
+    second = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert renders == ['landing']
+    assert second.headers['Content-Encoding'] == 'gzip' and second.headers['ETag'] == first.headers['ETag']
+    assert client.get('/', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    client.get('/?fresh=1')
+    assert renders == ['landing', 'landing']
+
+
+def test_a_view_that_reads_the_session_is_never_served_from_the_cache(site):
+    client, cache, renders = site
+    assert b'guest' in client.get('/dashboard').data
+    client.post('/login')
+    assert b'student-7' in client.get('/dashboard').data
+    assert renders == ['dashboard', 'dashboard']
+    assert '/dashboard' not in cache._pages and '/dashboard' in cache._session_bound
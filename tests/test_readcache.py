@@ -0,0 +1,141 @@
+import pytest
+
+from memory_storage import MemoryStorage
+from readcache import CachedStorage, ReadCache
+from storage import populate
+
+
+@pytest.fixture
+def storage():
+    storage = MemoryStorage()
+    populate(storage, students=20, choices=2, accepted_share=0)
+    return storage
+
+
+@pytest.fixture
+def cached(storage):
+    return CachedStorage(storage, ReadCache(max_entries=100, ttl=60))
+
+
+def first_application(storage):
+    return storage.get_all_applications()[0]
+
+
+def test_repeated_read_is_a_hit(cached, storage):
+    app = first_application(storage)
+    assert cached.get_application_with_details(app['id'])['status'] == 'Pending'
+    cached.get_application_with_details(app['id'])
+    counts = cached.cache.stats()['methods']['get_application_with_details']
+    assert (counts['hits'], counts['misses']) == (1, 1)
+
+
+def test_returned_rows_are_copies(cached, storage):
+    app = first_application(storage)
+    cached.get_application_with_details(app['id'])['status'] = 'Tampered'
+    assert cached.get_application_with_details(app['id'])['status'] == 'Pending'
+
+
+def test_nested_results_are_copied_all_the_way_down(cached, storage):
+    app = first_application(storage)
+    student_id = cached.get_application_with_details(app['id'])['student_id']
+    summary = cached.get_student_summary(student_id)
+    summary['applications'][0]['status'] = 'Tampered'
+    summary['applications'].clear()
+    summary['student']['first_name'] = 'Tampered'
+    again = cached.get_student_summary(student_id)
+    assert again['applications'] and all(a['status'] == 'Pending' for a in again['applications'])
+    assert again['student']['first_name'] != 'Tampered'
+
+
+def test_status_update_invalidates_details_and_student_list(cached, storage):
+    app = first_application(storage)
+    student_id = cached.get_application_with_details(app['id'])['student_id']
+    cached.get_student_applications(student_id)
+    assert cached.update_application_status(app['id'], 'Approved')
+    assert cached.get_application_with_details(app['id'])['status'] == 'Approved'
+    statuses = {row['id']: row['status'] for row in cached.get_student_applications(student_id)}
+    assert statuses[app['id']] == 'Approved'
+
+
+def test_password_update_invalidates_student(cached, storage):
+    student = cached.get_student_by_id(1)
+    assert cached.update_student_password(1, 'new-password')
+    assert cached.get_student_by_id(1)['password'] != student['password']
+
+
+def test_student_summary_is_cached_and_invalidated_by_writes(cached, storage):
+    app = first_application(storage)
+    student_id = cached.get_application_with_details(app['id'])['student_id']
+
+    def statuses():
+        return {a['id']: a['status'] for a in cached.get_student_summary(student_id)['applications']}
+
+    assert statuses()[app['id']] == 'Pending'
+    statuses()
+    counts = cached.cache.stats()['methods']['get_student_summary']
+    assert (counts['hits'], counts['misses']) == (1, 1)
+
+    assert cached.update_application_status(app['id'], 'Approved')
+    assert statuses()[app['id']] == 'Approved'
+    cached.bulk_upsert_students([])
+    statuses()
+    assert cached.cache.stats()['methods']['get_student_summary']['misses'] == 3
+
+
+def test_residence_upsert_invalidates_residences(cached, storage):
+    residence = cached.get_residence_by_id(1)
+    cached.bulk_upsert_residences([{**residence, 'available_rooms': residence['available_rooms'] + 5}],
+                                  update_existing=True)
+    assert cached.get_residence_by_id(1)['available_rooms'] == residence['available_rooms'] + 5
+
+
+def test_fresh_read_bypasses_the_cache(cached, storage):
+    app = first_application(storage)
+    cached.get_application_with_details(app['id'])
+    # A write the cache never saw, as made by another worker without a shared tier
+    storage.update_application_status(app['id'], 'Approved')
+    assert cached.get_application_with_details(app['id'])['status'] == 'Pending'
+    assert cached.get_application_with_details(app['id'], fresh=True)['status'] == 'Approved'
+
+
+def test_load_racing_an_invalidation_is_not_stored():
+    cache = ReadCache(max_entries=10, ttl=60)
+
+    def load():
+        cache.invalidate('student:1')  # a write commits while the read is in flight
+        return {'id': 1}
+
+    cache.get_or_load('get_student_by_id', ('student', 1), load, lambda row: ('student:1',))
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['stale_skips'] == 1
+
+
+def test_lru_evicts_oldest():
+    cache = ReadCache(max_entries=2, ttl=60)
+    for i in range(3):
+        cache.get_or_load('m', ('k', i), lambda i=i: i, lambda value: ())
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 1
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_shared_tier_encoding_round_trips_row_types(monkeypatch, use_orjson):
+    import readcache
+    from datetime import date, datetime
+    from decimal import Decimal
+
+    if use_orjson and not readcache.HAVE_ORJSON:
+        pytest.skip('orjson not installed')
+    monkeypatch.setattr(readcache, 'HAVE_ORJSON', use_orjson)
+    row = {'id': 7, 'apply_date': datetime(2026, 3, 1, 9, 30, 5), 'birthday': date(2004, 5, 6),
+           'gpa': Decimal('3.45'), 'block': None, 'on_campus': 1}
+    entry = readcache._loads(readcache._dumps({'start': 3, 'tags': ['application:7'], 'value': [row]}))
+    assert entry == {'start': 3, 'tags': ['application:7'], 'value': [row]}
+    assert type(entry['value'][0]['apply_date']) is datetime
+
+
+def test_shared_tier_refuses_unknown_types():
+    import readcache
+
+    with pytest.raises(TypeError):
+        readcache._dumps({'value': object()})
@@ -0,0 +1,38 @@
+import pytest
+
+from memory_storage import MemoryStorage
+from sqlite_storage import SQLiteStorage
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request):
+    return MemoryStorage() if request.param == 'memory' else SQLiteStorage(':memory:')
+
+
+def test_upsert_is_keyed_by_name_and_block(storage):
+    first = storage.bulk_upsert_residences([{'residence_name': 'Grand Royale'}, {'residence_name': 'F3', 'block': 'A'}])
+    again = storage.bulk_upsert_residences([{'residence_name': 'grand royale ', 'block': None},
+                                            {'residence_name': 'F3', 'block': 'a'}])
+    assert again == first
+    assert len(storage.get_residences()) == 2
+
+
+def test_invalid_entries_keep_their_position_as_none(storage):
+    ids = storage.bulk_upsert_residences([
+        {'residence_name': 'Simeka Heights', 'available_rooms': 'ten'},
+        {'residence_name': '  '},
+        'Maphula Residence',
+        {'residence_name': 'Maphula Residence', 'available_rooms': '12'},
+        {'residence_name': 'Emlanjeni Residence', 'available_rooms': -1},
+    ])
+    assert ids[:3] == [None, None, None] and ids[4] is None
+    assert storage.get_residence_by_id(ids[3])['available_rooms'] == 12
+    assert storage.bulk_upsert_residences([{'residence_name': ''}]) == [None]
+
+
+def test_update_existing_refreshes_capacity(storage):
+    [rid] = storage.bulk_upsert_residences([{'residence_name': 'Muthathe Residence', 'available_rooms': 10}])
+    storage.bulk_upsert_residences([{'residence_name': 'Muthathe Residence', 'available_rooms': 99}])
+    assert storage.get_residence_by_id(rid)['available_rooms'] == 10
+    storage.bulk_upsert_residences([{'residence_name': 'Muthathe Residence', 'available_rooms': 99}], update_existing=True)
+    assert storage.get_residence_by_id(rid)['available_rooms'] == 99
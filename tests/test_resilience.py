@@ -0,0 +1,61 @@
+import pytest
+
+import resilience
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, DatabaseUnavailable
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time for the breaker, with the backoff jitter pinned to its upper bound."""
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, 'time', lambda: now[0])
+    monkeypatch.setattr(resilience.random, 'uniform', lambda low, high: high)
+    return now
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure('connection refused')
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker('Test', failure_threshold=3)
+    assert not breaker.record_failure('refused') and not breaker.record_failure('refused')
+    breaker.before_call()
+    assert breaker.record_failure('refused')
+    assert breaker.state == OPEN
+    with pytest.raises(DatabaseUnavailable) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == pytest.approx(0.5)
+
+
+def test_a_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker('Test', failure_threshold=2)
+    breaker.record_failure('refused')
+    breaker.record_success()
+    assert not breaker.record_failure('refused')
+    assert breaker.state == CLOSED
+
+
+def test_one_probe_after_the_delay_and_its_success_closes(clock):
+    breaker = CircuitBreaker('Test', base_delay=1.0)
+    _open(breaker)
+    clock[0] += 1.0
+    breaker.before_call()  # the probe
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(DatabaseUnavailable):
+        breaker.before_call()  # everyone else still fails fast
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_a_failed_probe_reopens_with_a_longer_delay(clock):
+    breaker = CircuitBreaker('Test', base_delay=1.0, max_delay=3.0)
+    _open(breaker)
+    for expected in (2.0, 3.0, 3.0):
+        clock[0] += breaker.retry_after()
+        breaker.before_call()
+        assert breaker.record_failure('still refused')
+        assert breaker.state == OPEN
+        assert breaker.retry_after() == pytest.approx(expected)
@@ -0,0 +1,49 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import rowset
+from rowset import FastJSONProvider, RowSet
+
+COLUMNS = ('id', 'status', 'apply_date', 'gpa', 'room_number')
+ROWS = [(i, 'Pending', datetime(2025, 1, 6, 8, i), Decimal('3.25'), None if i % 2 else f"M-{i}") for i in range(5)]
+
+
+@pytest.fixture(params=[True, False], ids=['orjson', 'stdlib'])
+def app(request, monkeypatch):
+    if request.param and not rowset.HAVE_ORJSON:
+        pytest.skip('orjson not installed')
+    monkeypatch.setattr(rowset, 'HAVE_ORJSON', request.param)
+    monkeypatch.setattr(rowset, 'STREAM_BATCH', 2)
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    return app
+
+
+def test_rows_read_back_as_dicts():
+    rows = RowSet(COLUMNS, ROWS)
+    assert len(rows) == 5 and rows[1] == dict(zip(COLUMNS, ROWS[1]))
+    assert list(rows)[4]['id'] == 4 and rows.column('id') == [0, 1, 2, 3, 4]
+    assert isinstance(rows[1:3], RowSet) and len(rows[1:3]) == 2
+
+
+@pytest.mark.parametrize('rows', [ROWS, ROWS[:2], []], ids=['batches', 'one batch', 'empty'])
+def test_the_stream_is_the_json_of_the_row_list(app, rows):
+    expected = DefaultJSONProvider(app).dumps([dict(zip(COLUMNS, row)) for row in rows])
+    with app.app_context():
+        response = app.json.response(RowSet(COLUMNS, rows))
+    assert response.is_streamed and response.mimetype == 'application/json'
+    body = response.get_data()
+    assert json.loads(body) == json.loads(expected)
+    assert body.endswith(b']\n')
+
+
+def test_other_values_keep_flask_conventions(app):
+    value = {'b': date(2025, 1, 6), 'a': Decimal('1.50')}
+    encoded = app.json.dumps(value)
+    assert json.loads(encoded) == json.loads(DefaultJSONProvider(app).dumps(value))
+    assert encoded.index('"a"') < encoded.index('"b"')
@@ -0,0 +1,50 @@
+import builtins
+import os
+import subprocess
+import sys
+
+import pytest
+
+import startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(startup, '_imports', {})
+    monkeypatch.setattr(startup, '_stages', [])
+    yield startup
+    builtins.__import__ = startup._original_import
+    startup._enabled = False
+
+
+def test_without_the_flag_nothing_is_timed(fresh, monkeypatch, capsys):
+    monkeypatch.delenv('STARTUP_REPORT', raising=False)
+    fresh.begin()
+    assert builtins.__import__ is fresh._original_import
+    fresh.mark('ready')
+    fresh.finish()
+    assert not fresh._stages and capsys.readouterr().out == ''
+
+
+def test_the_report_lists_imports_and_stages(fresh, monkeypatch, capsys):
+    monkeypatch.setenv('STARTUP_REPORT', '1')
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+    fresh.begin()
+    import colorsys  # noqa: F401
+    fresh.mark('app object created')
+    fresh.finish()
+    assert builtins.__import__ is fresh._original_import
+    assert 'colorsys' in fresh._imports
+    out = capsys.readouterr().out
+    assert out.startswith('⏱️ Startup') and 'app object created' in out
+
+
+def test_importing_the_app_leaves_the_heavy_modules_for_first_use():
+    code = ("import sys, app; "
+            "print(sorted(m for m in ('reportlab', 'smtplib', 'email.mime.text') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=120,
+                            env=dict(os.environ, DB_BACKEND='memory', STARTUP_REPORT='0'))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == '[]'
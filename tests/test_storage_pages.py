@@ -0,0 +1,47 @@
+import pytest
+
+from memory_storage import MemoryStorage
+from sqlite_storage import SQLiteStorage
+from storage import populate
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request):
+    storage = MemoryStorage() if request.param == 'memory' else SQLiteStorage(':memory:')
+    populate(storage, students=40, choices=2, accepted_share=0.25)
+    return storage
+
+
+def test_application_pages_walk_every_row_once(storage):
+    seen, before = [], None
+    while True:
+        page = list(storage.get_applications_page(7, before))
+        seen.extend(row['id'] for row in page)
+        if len(page) < 7:
+            break
+        before = page[-1]['id']
+    assert seen == sorted((row['id'] for row in storage.get_all_applications()), reverse=True)
+
+
+def test_application_page_filters(storage):
+    accepted = list(storage.get_applications_page(200, status='Accepted'))
+    assert accepted and all(row['status'] == 'Accepted' for row in accepted)
+    assert len(accepted) == storage.count_applications_by_status()['Accepted']
+    mine = list(storage.get_applications_page(200, student_ids=[1, 2]))
+    assert mine and {row['student_id'] for row in mine} <= {1, 2}
+    assert list(storage.get_applications_page(200, student_ids=[])) == []
+
+
+def test_student_pages_leave_out_password(storage):
+    page = list(storage.get_students_page(5))
+    assert [row['id'] for row in page] == [40, 39, 38, 37, 36]
+    assert 'password' not in page[0]
+    assert [row['id'] for row in storage.get_students_page(5, before_id=36)] == [35, 34, 33, 32, 31]
+
+
+def test_student_facets_and_program_filter(storage):
+    facets = storage.get_student_facets()
+    assert facets['total'] == 40
+    program = facets['programs'][0]
+    rows = list(storage.get_students_page(100, program=program))
+    assert rows and all(row['program'] == program for row in rows)
@@ -0,0 +1,87 @@
+import csv
+
+import pytest
+from werkzeug.security import check_password_hash
+
+from memory_storage import MemoryStorage
+from sqlite_storage import SQLiteStorage
+from student_import import import_students
+
+HEADER = ['Student Number', 'First Name', 'Last Name', 'Gender', 'ID Number', 'Program', 'Year of Study', 'GPA']
+ROWS = [
+    ['24000001', 'Dakalo', 'Makhavhu', 'M', '9001015002081', 'Engineering', '2', '3.1'],
+    ['24000002', 'Katlego', 'Mamphekgo', 'F', '', 'Nursing', '1', '3.85'],
+    ['', 'No', 'Number', 'M', '', 'Law', '1', '2.5'],
+    ['24000003', 'Thabo', 'Masuku', 'male', '', 'Computer Science', 'x', '3.9'],
+    ['24000001', 'Dakalo', 'Makhavhu', 'M', '9001015002081', 'Computer Science', '3', '3.4'],
+]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request):
+    return MemoryStorage() if request.param == 'memory' else SQLiteStorage(':memory:')
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'students.csv'
+    with open(path, 'w', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(HEADER)
+        writer.writerows(ROWS)
+    return str(path)
+
+
+def test_batches_are_upserted_and_rows_without_a_number_skipped(storage, source):
+    batches = []
+    stats = import_students(source, batch_size=2, workers=1, db=storage, progress=batches.append)
+    assert stats['completed'] and stats['error'] is None
+    assert (stats['rows_read'], stats['imported'], stats['skipped']) == (5, 4, 1)
+    assert [b['rows_read'] for b in batches] == [2, 4, 5]
+
+    student = storage.get_student_by_number('24000002')
+    assert student['gender'] == 'female' and student['email'] == '24000002@mvula.univen.ac.za'
+    assert check_password_hash(student['password'], '24000002')  # no ID number: the student number
+    assert storage.get_student_by_number('24000003')['year_of_study'] is None
+
+
+def test_a_repeated_student_number_updates_one_student(storage, source):
+    import_students(source, batch_size=2, workers=1, db=storage)
+    assert len(storage.get_all_students()) == 3
+    student = storage.get_student_by_number('24000001')
+    assert (student['program'], student['year_of_study']) == ('Computer Science', 3)
+    assert check_password_hash(student['password'], '9001015002081')
+
+
+class FailingOnce:
+    """Storage whose second batch write fails, like a dropped connection mid-import."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.batches = 0
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def bulk_upsert_students(self, rows):
+        self.batches += 1
+        return None if self.batches == 2 else self.storage.bulk_upsert_students(rows)
+
+
+def test_an_interrupted_import_resumes_after_the_last_committed_batch(storage, source, tmp_path):
+    checkpoint = str(tmp_path / 'students.checkpoint.json')
+    stopped = import_students(source, batch_size=2, workers=1, db=FailingOnce(storage), checkpoint_path=checkpoint)
+    assert not stopped['completed'] and 'row 3' in stopped['error']
+    assert stopped['rows_read'] == 2 and storage.get_student_by_number('24000003') is None
+
+    resumed = import_students(source, batch_size=2, workers=1, db=storage, checkpoint_path=checkpoint)
+    assert resumed['completed'] and resumed['resumed_from'] == 2
+    assert (resumed['rows_read'], resumed['imported']) == (5, 2)
+    assert len(storage.get_all_students()) == 3
+
+
+def test_refuses_without_a_unique_student_number(storage, source, monkeypatch):
+    monkeypatch.setattr(storage, 'student_number_is_unique', lambda: False)
+    stats = import_students(source, db=storage)
+    assert not stats['completed'] and '--migrate' in stats['error']
+    assert not len(storage.get_all_students())